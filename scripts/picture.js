@@ -0,0 +1,29 @@
+'use strict';
+const fs = require('fs');
+const path = require('path');
+
+// tools/optimize_images.py 在原图旁生成 <原文件名>.avif / <原文件名>.webp（如 foo.png.webp），
+// 这里把文章中指向资源文件夹、且存在这些版本的 <img> 包进 <picture>，支持的浏览器下载更小的文件，
+// 其余浏览器仍然使用原图。没有生成过的图片保持原样。
+const VARIANTS = [['avif', 'image/avif'], ['webp', 'image/webp']];
+
+// 在图片标题（hexo-injects.js 中的 image-caption）之后执行，<picture> 包在 <figure> 里面
+hexo.extend.filter.register('after_post_render', function (data) {
+  if (!data.asset_dir || !data.path) return data;
+  const prefix = (hexo.config.root || '/') + data.path;
+  data.content = data.content.replace(/<img [^>]*src="([^"]+)"[^>]*>/g, (img, src) => {
+    let rel;
+    try {
+      rel = decodeURI(src);
+    } catch (e) {
+      return img;
+    }
+    if (!rel.startsWith(prefix)) return img;
+    rel = rel.slice(prefix.length);
+    const sources = VARIANTS
+      .filter(([ext]) => fs.existsSync(path.join(data.asset_dir, `${rel}.${ext}`)))
+      .map(([ext, type]) => `<source srcset="${src}.${ext}" type="${type}">`);
+    return sources.length ? `<picture>${sources.join('')}${img}</picture>` : img;
+  });
+  return data;
+}, 20);
@@ -0,0 +1,81 @@
+'use strict';
+const crypto = require('crypto');
+
+// 字数统计由 tools/wordcount.py 预先算好，写在 source/_data/wordcount.json（文章源文件 -> [cjk, words, 内容哈希]），
+// 这里注册 NexT 的 symbols_count_time 调用的 hexo-word-counter helper（symbolsCount / symbolsTime /
+// symbolsCountTotal / symbolsTimeTotal），生成时不需要该插件，也不再对每篇文章的正文做统计。
+// 内容哈希与文章当前的源文件不一致（改过还没重新跑脚本）或数据文件里没有的文章，按同样的规则现场统计正文。
+// 字数 = cjk + words；阅读时间按 hexo-word-counter 的公式 symbols / (awl * wpm) 分钟，
+// 其中 words 按 awl 个字符计入 symbols，awl、wpm、suffix 取 _config.yml 的 symbols_count_time。
+// 是否显示由 NexT 检查 _config.yml 中的 symbols_count_time 决定，这里不改动站点配置。
+
+const config = Object.assign({
+  awl: 4,
+  wpm: 275,
+  suffix: 'mins.'
+}, hexo.config.symbols_count_time);
+
+// 与 tools/wordcount.py 的 CJK_CHARS、WORD_RE、MARKUP_RE 保持一致
+const CJK_CHARS = '\\u3040-\\u30ff\\u3400-\\u4dbf\\u4e00-\\u9fff\\uf900-\\ufaff\\uac00-\\ud7af';
+const CJK_RE = new RegExp(`[${CJK_CHARS}]`, 'g');
+const WORD_RE = new RegExp(`(?:(?![${CJK_CHARS}])[\\p{L}\\p{N}_])+`, 'gu');
+const MARKUP_RE = /<!--[\s\S]*?-->|<[^>\n]+>|\]\([^)\n]*\)|\{%[\s\S]*?%\}/g;
+
+function countText(text) {
+  text = String(text || '').replace(MARKUP_RE, ' ');
+  return [(text.match(CJK_RE) || []).length, (text.match(WORD_RE) || []).length];
+}
+
+// 与 tools/wordcount.py 的 raw_digest 一致：Hexo 读入的源文件（已去掉 BOM、换行统一为 \n）的 sha1 前 16 位
+function digest(raw) {
+  return crypto.createHash('sha1').update(raw).digest('hex').slice(0, 16);
+}
+
+// NexT 传入文章对象，按 post.source 查数据文件；传入的是字符串（正文）时只能现场统计
+function lookup(ctx, post) {
+  if (!post || typeof post !== 'object') return countText(post);
+  const data = ctx.site.data && ctx.site.data.wordcount;
+  const entry = data && data[post.source];
+  if (entry && typeof post.raw === 'string' && entry[2] === digest(post.raw)) return entry;
+  return countText(post._content !== undefined ? post._content : post.content);
+}
+
+function formatCount(count) {
+  if (count > 9999) return Math.round(count / 1000) + 'k';
+  if (count > 999) return Math.round(count / 100) / 10 + 'k';
+  return count;
+}
+
+function formatTime([cjk, words], awl, wpm, suffix) {
+  const minutes = Math.round((cjk + words * awl) / (awl * wpm)) || 1;
+  const hours = Math.floor(minutes / 60);
+  return hours < 1 ? `${minutes} ${suffix}` : `${hours}:${String(minutes % 60).padStart(2, '0')}`;
+}
+
+function siteCounts(site) {
+  const totals = [0, 0];
+  site.posts.forEach(post => {
+    const [cjk, words] = lookup({ site }, post);
+    totals[0] += cjk;
+    totals[1] += words;
+  });
+  return totals;
+}
+
+hexo.extend.helper.register('symbolsCount', function (content) {
+  const [cjk, words] = lookup(this, content);
+  return formatCount(cjk + words);
+});
+
+hexo.extend.helper.register('symbolsTime', function (content, awl = config.awl, wpm = config.wpm, suffix = config.suffix) {
+  return formatTime(lookup(this, content), awl, wpm, suffix);
+});
+
+hexo.extend.helper.register('symbolsCountTotal', function (site) {
+  const [cjk, words] = siteCounts(site);
+  return formatCount(cjk + words);
+});
+
+hexo.extend.helper.register('symbolsTimeTotal', function (site, awl = config.awl, wpm = config.wpm, suffix = config.suffix) {
+  return formatTime(siteCounts(site), awl, wpm, suffix);
+});
@@ -7,12 +7,21 @@
     python add_postname_from_redirects.py          # 预览（dry-run）
     python add_postname_from_redirects.py --apply  # 实际写入
     python add_postname_from_redirects.py --yes --apply  # 跳过确认
+    python add_postname_from_redirects.py --jobs 8       # 并发读取文章
+    python add_postname_from_redirects.py --plan-out plan.json   # 只写出计划
+    python add_postname_from_redirects.py --apply-plan plan.json # 执行计划，不重新扫描
+    python add_postname_from_redirects.py --stats --profile      # 输出统计报告与 cProfile 结果
+    python add_postname_from_redirects.py --since --apply        # 只处理上次 --apply 以来变化的文章
+    python add_postname_from_redirects.py --stream --jobs 8      # 流式处理，内存占用与文章总数无关
 
 脚本会：
  - 解析 `_redirects` 中形如 `/YYYY/MM/DD/ID/*    posts/<new_id>/:splat` 的行
  - 在 `source/_posts` 下递归查找所有 `.md` 文件，读取 front-matter 的 `date` 字段
  - 在匹配的文章 front-matter 中添加或更新 `id: <new_id>` 字段
 
+只有重定向中出现的旧 id 会被索引，文章逐篇扫描、不在内存中保留全部解析结果。`--stream` 时文件列表与
+目录缓存也不整体载入：边遍历边处理（资源文件夹中的 md 不会被当作文章），缓存按路径查询、分批写回。
+
 注：脚本输出信息使用 `print`，用中文注释和提示，运行时会打印及时反馈。
 """
 
@@ -22,13 +31,15 @@ from pathlib import Path
 import sys
 from typing import Dict, List, Optional, Tuple
 
-FM_BLOCK_RE = re.compile(r"^---\s*\r?\n(.*?)\r?\n---\s*\r?\n",
-                         re.DOTALL | re.MULTILINE)
-# 提取 date 与 id 的 front-matter 行
-DATE_LINE_RE = re.compile(r"^\s*date\s*:\s*(.+)$",
-                          re.IGNORECASE | re.MULTILINE)
-ID_LINE_RE = re.compile(r"^\s*id\s*:\s*(.+)$",
-                        re.IGNORECASE | re.MULTILINE)
+import incremental
+import instrument
+from front_matter import (FM_BLOCK_RE, PostCatalog, StaleFileError, edit_front_matter,
+                          patch_header, walk_posts, yaml_scalar)
+from parallel import add_jobs_argument
+from plans import PlanError, read_plan, write_plan
+
+PLAN_TOOL = 'add_postname_from_redirects'
+
 # 匹配形如: /2015/02/22/1/*        posts/new-arrival/:splat
 REDIRECT_RE = re.compile(
     r"^/(\d{4})/(\d{2})/(\d{2})/([^/]+)/\*\s+posts/([^/:\s]+)")
@@ -58,70 +69,89 @@ def extract_front_matter(text: str) -> Optional[re.Match]:
     return FM_BLOCK_RE.match(text)
 
 
-def extract_date_from_fm(fm_text: str) -> Optional[str]:
-    m = DATE_LINE_RE.search(fm_text)
-    if not m:
-        return None
-    date_field = m.group(1).strip().strip('\"\'')
-    # 提取第一个 YYYY-MM-DD
-    dm = re.search(r"(\d{4}-\d{2}-\d{2})", date_field)
-    if dm:
-        return dm.group(1)
-    return None
-
-
-def extract_id_from_fm(fm_text: str) -> Optional[str]:
-    m = ID_LINE_RE.search(fm_text)
-    if not m:
-        return None
-    id_field = m.group(1).strip().strip('\"\'')
-    # 直接返回 id 字符串（不做额外格式要求）
-    return id_field
-
-
-def safe_yaml_value(val: str) -> str:
-    # 简单的 YAML 值安全化：若值中包含空格或特殊字符，使用单引号并转义'
-    if re.search(r"[\s:'\\]", val):
-        return "'" + val.replace("'", "''") + "'"
-    return val
-
-
 def update_front_matter_text(full_text: str, key: str, value: str) -> Tuple[str, bool]:
     """在 full_text 的 front-matter 中添加或更新 key: value。返回 (new_text, changed)。
-    仅修改 front-matter 的内容。
+    仅修改 front-matter 的内容。full_text 也可以只是文件头部（两行 `---` 及其间内容）。
     """
     m = extract_front_matter(full_text)
     if not m:
         return (full_text, False)
-    fm_content = m.group(1)
-    key_re = re.compile(r"^\s*" + re.escape(key) +
-                        r"\s*:\s*(.+)$", re.IGNORECASE | re.MULTILINE)
-    km = key_re.search(fm_content)
-    safe_val = safe_yaml_value(value)
-    if km:
-        existing_raw = km.group(1).strip()
-        # 移除可能的引号以便比较
-        existing_unquoted = existing_raw.strip('\"\'')
-        if existing_unquoted == value:
-            return (full_text, False)
-        # 替换该行
-        new_fm = key_re.sub(f"{key}: {safe_val}", fm_content, count=1)
-    else:
-        # 在 fm 内容末尾添加一行（保持与原 fm 的换行风格）
-        if fm_content and not fm_content.endswith('\n'):
-            fm_content = fm_content + '\n'
-        new_fm = fm_content + f"{key}: {safe_val}\n"
-
-    # 用新 fm 替换原文中的相应区块
-    start, end = m.start(1), m.end(1)
-    new_text = full_text[:start] + new_fm + full_text[end:]
-    return (new_text, True)
+    header = full_text[:m.end()]
+    new_header, changed = edit_front_matter(header, {key: yaml_scalar(value)})
+    return (new_header + full_text[m.end():], changed)
+
+
+class PostRef:
+    """匹配到重定向的文章。扫描大量文章时只保留这几个字段。"""
+    __slots__ = ('path', 'old', 'body_offset', 'stat')
+
+    def __init__(self, path: Path, old: Optional[str], body_offset: int, stat: Tuple[int, int]):
+        self.path = path
+        self.old = old
+        self.body_offset = body_offset
+        self.stat = stat
+
+
+def post_ref(p, info, key: str) -> PostRef:
+    old = info.get(key)
+    return PostRef(Path(p), old if isinstance(old, str) and old else None, info.body_offset,
+                   (info.mtime_ns, info.size))
 
 
 def find_posts(posts_dir: Path) -> List[Path]:
     return sorted(posts_dir.rglob('*.md'))
 
 
+def apply_changes(changes, posts_dir: Path, key: str) -> None:
+    """写入变更。changes 为 (path, new_id, old, sha1, body_offset, stat) 列表，sha1 与 stat
+    （扫描时的 (mtime_ns, size)）至少有一个；生成计划后内容发生变化的文件会被跳过。"""
+    applied = 0
+    with instrument.phase('write'):
+        for p, new_id, old, sha1, body_offset, stat in changes:
+            try:
+                changed = patch_header(
+                    p, sha1, body_offset,
+                    lambda header: update_front_matter_text(header, key, new_id), stat)
+                if not changed:
+                    print(f"跳过（无变化）：{p.relative_to(posts_dir)}")
+                    continue
+                applied += 1
+                if old:
+                    print(
+                        f"更新：{p.relative_to(posts_dir)} {key}: {old} -> {new_id}")
+                else:
+                    print(
+                        f"添加：{p.relative_to(posts_dir)} {key}: {new_id}")
+            except StaleFileError:
+                print(f"跳过（内容已变化）：{p.relative_to(posts_dir)}")
+            except Exception as e:
+                print(f"写入失败：{p.relative_to(posts_dir)}，原因：{e}")
+
+    print(f"\n完成：已写入 {applied} 个文件（目标 {len(changes)}）。")
+
+
+def run_plan_file(args) -> None:
+    try:
+        posts_dir, entries = read_plan(args.apply_plan, PLAN_TOOL)
+    except PlanError as e:
+        print(f"错误：{e}")
+        sys.exit(2)
+    if not entries:
+        print("没有需要写入的变更。")
+        return
+    # 一个计划只针对一个键
+    key = entries[0]['key']
+    changes = [(posts_dir / e['path'], e['new'], e['old'], e['sha1'], e['body_offset'], None)
+               for e in entries]
+    print(f"读取计划：{args.apply_plan}，共 {len(changes)} 条变更。")
+    if not args.yes:
+        ans = input('确认要执行以上写入操作吗？输入 y 确认：')
+        if ans.lower() != 'y':
+            print('取消。')
+            return
+    apply_changes(changes, posts_dir, key)
+
+
 def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('--posts-dir', '-d', default=None,
@@ -132,7 +162,23 @@ def main(argv=None):
     parser.add_argument('--yes', action='store_true', help='在 --apply 时跳过确认')
     parser.add_argument('--key', default=KEY_NAME_DEFAULT,
                         help='要写入 front-matter 的键名，默认 postname')
+    parser.add_argument('--stream', action='store_true',
+                        help='流式处理：边遍历边解析，目录缓存按需查询、分批写回')
+    parser.add_argument('--plan-out', default=None, help='把计划写入 JSON 文件，不执行写入')
+    parser.add_argument('--apply-plan', default=None, help='执行 --plan-out 写出的计划文件')
+    add_jobs_argument(parser)
+    incremental.add_arguments(parser)
+    instrument.add_arguments(parser)
     args = parser.parse_args(argv)
+    with instrument.session(args, PLAN_TOOL):
+        run(args)
+
+
+def run(args):
+
+    if args.apply_plan:
+        run_plan_file(args)
+        return
 
     script_dir = Path(__file__).resolve().parent
     repo_root = script_dir.parent
@@ -150,83 +196,115 @@ def main(argv=None):
         sys.exit(2)
 
     print(f"读取重定向：{redirects_file}")
-    entries = parse_redirects(redirects_file)
+    with instrument.phase('redirects'):
+        entries = parse_redirects(redirects_file)
     print(f"解析到 {len(entries)} 条可用重定向条目（格式 /.../ID/* -> posts/<postname>）。")
 
-    md_files = find_posts(posts_dir)
-    print(f"在 {posts_dir} 下找到 {len(md_files)} 个 Markdown 文件，开始匹配...")
-
-    # 建立按 id 索引： id_str -> list of files
-    id_index: Dict[str, List[Path]] = {}
-    for p in md_files:
-        try:
-            txt = p.read_text(encoding='utf-8')
-        except Exception as e:
-            print(f"读取文件失败，跳过：{p}，原因：{e}")
-            continue
-        m = extract_front_matter(txt)
-        if not m:
-            continue
-        fm = m.group(1)
-        idv = extract_id_from_fm(fm)
-        if not idv:
-            continue
-        id_index.setdefault(idv, []).append(p)
-
-    planned: List[Tuple[Path, str]] = []  # (file, new_id)
-    skipped = 0
-    for old_id, new_id in entries:
-        candidates = id_index.get(old_id, [])
-        if not candidates:
-            print(f"未找到与 id 匹配的文章：{old_id} -> {new_id}，跳过。")
-            skipped += 1
-            continue
-        if len(candidates) > 1:
-            print(
-                f"警告：存在多个具有相同 id ({old_id}) 的文章，无法唯一匹配重定向到 {new_id}，跳过。")
-            for c in candidates:
-                print(f"  候选：{c.relative_to(posts_dir)}")
-            skipped += 1
-            continue
-        planned.append((candidates[0], new_id))
-
-    print(f"\n匹配完成：将更新 {len(planned)} 个文件，跳过 {skipped} 条不可解析的重定向。\n")
-
-    # 预览变更
-    # (path, new_id, old_value_or_None)
-    changes: List[Tuple[Path, str, Optional[str]]] = []
-    for p, new_id in planned:
-        txt = p.read_text(encoding='utf-8')
-        m = extract_front_matter(txt)
-        if not m:
-            print(f"跳过（没有 front-matter）：{p.relative_to(posts_dir)}")
-            continue
-        fm = m.group(1)
-        # 查找现有键
-        key_re = re.compile(r"^\s*" + re.escape(args.key) +
-                            r"\s*:\s*(.+)$", re.IGNORECASE | re.MULTILINE)
-        km = key_re.search(fm)
-        old = None
-        if km:
-            old = km.group(1).strip().strip('\"\'')
-        if old == new_id:
-            print(
-                f"无需修改：{p.relative_to(posts_dir)} 已有 {args.key}: {new_id}")
-            continue
-        changes.append((p, new_id, old))
+    since = incremental.resolve_since(args.since, PLAN_TOOL, args.since_state)
+    if since and incremental.touches(posts_dir, since, redirects_file):
+        # 重定向本身变了，新条目可能对应任何一篇文章
+        print(f"{redirects_file.name} 自 {since} 以来有变化，处理全部文章。")
+        since = None
+    with instrument.phase('scan'):
+        if since:
+            try:
+                md_files = sorted(incremental.changed_posts(posts_dir, since))
+            except ValueError as e:
+                print(f"错误：{e}")
+                sys.exit(2)
+        else:
+            # --stream 时边遍历边处理，不生成完整的文件列表
+            md_files = walk_posts(posts_dir) if args.stream else find_posts(posts_dir)
+
+    with PostCatalog(preload=not args.stream) as catalog:
+        if not since:
+            catalog.prune(posts_dir)
+
+        # 只为重定向中出现的旧 id 建索引：旧 id -> 匹配到的文章，内存占用与重定向条目数成正比，与文章总数无关
+        wanted = {old_id for old_id, _ in entries}
+        id_index: Dict[str, List[PostRef]] = {}
+        scanned = 0
+        with instrument.phase('parse'):
+            for p, info, err in catalog.iter_scan(md_files, args.jobs):
+                scanned += 1
+                if err is not None:
+                    print(f"读取文件失败，跳过：{p}，原因：{err}")
+                    continue
+                if not info.has_fm or info.id not in wanted:
+                    continue
+                id_index.setdefault(info.id, []).append(post_ref(p, info, args.key))
+        if since and id_index:
+            # 变化的文章里出现的 id 也可能被未变化的文章使用：重复 id 的判断要看全部文章。
+            # 未变化文章的头部都在 catalog 中，这一遍只有 stat
+            with instrument.phase('ids'):
+                all_files = walk_posts(posts_dir) if args.stream else find_posts(posts_dir)
+                full_index: Dict[str, List[PostRef]] = {}
+                for p, info, err in catalog.iter_scan(all_files, args.jobs):
+                    if err is None and info.has_fm and info.id in id_index:
+                        full_index.setdefault(info.id, []).append(post_ref(p, info, args.key))
+                id_index = full_index
+        if since:
+            print(f"在 {posts_dir} 下扫描了 {scanned} 个自 {since} 以来变化的 Markdown 文件。")
+        else:
+            print(f"在 {posts_dir} 下扫描了 {scanned} 个 Markdown 文件。")
+
+        planned: List[Tuple[PostRef, str]] = []  # (文章, new_id)
+        skipped = 0
+        with instrument.phase('plan'):
+            for old_id, new_id in entries:
+                candidates = id_index.get(old_id, [])
+                if not candidates and since:
+                    # 增量模式下只扫描了变化的文章，其余条目不在本次范围内
+                    continue
+                if not candidates:
+                    print(f"未找到与 id 匹配的文章：{old_id} -> {new_id}，跳过。")
+                    skipped += 1
+                    continue
+                if len(candidates) > 1:
+                    print(
+                        f"警告：存在多个具有相同 id ({old_id}) 的文章，无法唯一匹配重定向到 {new_id}，跳过。")
+                    for c in candidates:
+                        print(f"  候选：{c.path.relative_to(posts_dir)}")
+                    skipped += 1
+                    continue
+                planned.append((candidates[0], new_id))
+
+        print(f"\n匹配完成：将更新 {len(planned)} 个文件，跳过 {skipped} 条不可解析的重定向。\n")
+
+        # 预览变更。头部信息在扫描时已记录，直接写入时按扫描时的 mtime + size 校验文件未被改动，
+        # 每个文件只在 patch_header 中完整读取一次；只有写出计划文件时才需要内容哈希
+        # (path, new_id, old_value_or_None, sha1, body_offset, stat)
+        changes: List[Tuple[Path, str, Optional[str], Optional[str], int, Tuple[int, int]]] = []
+        for ref, new_id in planned:
+            if ref.old == new_id:
+                print(
+                    f"无需修改：{ref.path.relative_to(posts_dir)} 已有 {args.key}: {new_id}")
+                continue
+            sha1 = catalog.content_hash(ref.path) if args.plan_out else None
+            changes.append((ref.path, new_id, ref.old, sha1, ref.body_offset, ref.stat))
 
     if not changes:
         print("没有需要写入的变更。")
+        if args.apply and args.since is not None:
+            incremental.record(PLAN_TOOL, posts_dir, args.since_state)
         return
 
     print('将要应用的变更：')
-    for p, new_id, old in changes:
+    for p, new_id, old, _, _, _ in changes:
         rel = p.relative_to(posts_dir)
         if old:
             print(f"  {rel}: {args.key}: {old} -> {new_id}")
         else:
             print(f"  {rel}: 添加 {args.key}: {new_id}")
 
+    if args.plan_out:
+        write_plan(args.plan_out, PLAN_TOOL, posts_dir, [
+            {'path': p.relative_to(posts_dir).as_posix(), 'key': args.key, 'new': new_id,
+             'old': old, 'sha1': sha1, 'body_offset': body_offset}
+            for p, new_id, old, sha1, body_offset, _ in changes])
+        print(f"\n计划已写入 {args.plan_out}，使用 --apply-plan 执行。")
+        return
+
     if not args.apply:
         print('\n这是预览（dry-run）。要实际写入请使用 --apply 参数。')
         return
@@ -238,27 +316,9 @@ def main(argv=None):
             return
 
     # 实际写入
-    applied = 0
-    for p, new_id, old in changes:
-        try:
-            txt = p.read_text(encoding='utf-8')
-            new_txt, changed = update_front_matter_text(
-                txt, args.key, new_id)
-            if not changed:
-                print(f"跳过（无变化）：{p.relative_to(posts_dir)}")
-                continue
-            p.write_text(new_txt, encoding='utf-8')
-            applied += 1
-            if old:
-                print(
-                    f"更新：{p.relative_to(posts_dir)} {args.key}: {old} -> {new_id}")
-            else:
-                print(
-                    f"添加：{p.relative_to(posts_dir)} {args.key}: {new_id}")
-        except Exception as e:
-            print(f"写入失败：{p.relative_to(posts_dir)}，原因：{e}")
-
-    print(f"\n完成：已写入 {applied} 个文件（目标 {len(changes)}）。")
+    apply_changes(changes, posts_dir, args.key)
+    if args.since is not None:
+        incremental.record(PLAN_TOOL, posts_dir, args.since_state)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文章工具的语料规模基准测试。
+
+先在临时目录生成一个合成仓库：
+ - N 篇标题为中日文字符的文章，一部分已在 YYYY/MM/ 下，其余在 posts 根目录（给 rename 工具留活）
+ - 每篇文章带同名资源文件夹和几张“图片”
+ - 与文章旧数字 id 对应的 `_redirects`
+ - 用 git fast-import 生成的 M 个提交，其中包含修改与重命名
+然后分阶段计时三个工具的核心流程（scan、parse、git、plan、write），结果写成 JSON，
+并可与保存的基线比较，超过阈值的阶段标记为回退。
+
+用法：
+    python tools/benchmark.py --posts 2000 --commits 5000
+    python tools/benchmark.py --save-baseline            # 把本次结果存为基线
+    python tools/benchmark.py --baseline base.json       # 与指定基线比较
+    python tools/benchmark.py --keep /tmp/corpus         # 保留生成的语料，方便手动跑工具
+"""
+
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import add_postname_from_redirects as add_ids
+import rename_posts_by_date as rename
+import update_posts_updated as update
+from front_matter import PostCatalog
+from move_journal import MoveJournal
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / '.cache' / 'bench_baseline.json'
+CJK_CHARS = ('春夏秋冬花鸟风月山川日月星辰雪雨云雾之的是在有和与我你他她它们这那'
+             '桜空海夢恋歌旅路猫犬本読書電脳記録日記折腾效率攻略完成')
+TAGS = ['记录', '日记', 'macOS', '折腾', '效率', 'Python', 'Galgame', '读书']
+# 最小的合法 PNG 头，后面用随机字节填充到指定大小
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+
+
+def cjk_title(rng: random.Random) -> str:
+    return ''.join(rng.choice(CJK_CHARS) for _ in range(rng.randint(4, 12)))
+
+
+def post_text(rng: random.Random, title: str, date: str, old_id: int, images: List[str],
+              paragraphs: int) -> str:
+    tags = rng.sample(TAGS, 2)
+    lines = [
+        '---',
+        f'title: {title}',
+        f'date: {date}',
+        f'id: {old_id}',
+        'tags:',
+        *[f'  - {t}' for t in tags],
+        'categories:',
+        f'  - {rng.choice(TAGS)}',
+        '---',
+        '',
+    ]
+    for i in range(paragraphs):
+        lines.append(''.join(rng.choice(CJK_CHARS) for _ in range(rng.randint(40, 200))))
+        lines.append('')
+        if i < len(images):
+            lines.append(f'![]({images[i]})')
+            lines.append('')
+    return '\n'.join(lines)
+
+
+class Corpus:
+    def __init__(self, root: Path):
+        self.root = root
+        self.posts_dir = root / 'source' / '_posts'
+        self.redirects = root / 'source' / '_redirects'
+
+
+def _data_cmd(payload: bytes) -> bytes:
+    return b'data %d\n' % len(payload) + payload + b'\n'
+
+
+def generate(root: Path, posts: int, commits: int, images: int, image_size: int,
+             seed: int = 0) -> Corpus:
+    """在 root 下生成合成仓库，返回 Corpus。"""
+    rng = random.Random(seed)
+    corpus = Corpus(root)
+    root.mkdir(parents=True, exist_ok=True)
+    subprocess.check_call(['git', 'init', '-q'], cwd=root)
+    subprocess.check_call(['git', 'symbolic-ref', 'HEAD', 'refs/heads/master'], cwd=root)
+    subprocess.check_call(['git', 'config', 'user.name', 'bench'], cwd=root)
+    subprocess.check_call(['git', 'config', 'user.email', 'bench@example.com'], cwd=root)
+
+    # 每篇文章：(当前相对路径, 标题, 日期, 旧 id, slug)
+    entries = []
+    used = set()
+    for n in range(1, posts + 1):
+        title = cjk_title(rng)
+        while title in used:
+            title = cjk_title(rng)
+        used.add(title)
+        year = rng.randint(2015, 2025)
+        month = rng.randint(1, 12)
+        day = rng.randint(1, 28)
+        date = f'{year}-{month:02d}-{day:02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00'
+        # 三分之一的文章已按年月归档
+        if rng.random() < 1 / 3:
+            rel = f'source/_posts/{year}/{month:02d}/{title}.md'
+        else:
+            rel = f'source/_posts/{title}.md'
+        entries.append([rel, title, date, n, f'post-{n}'])
+
+    ts = 1420070400  # 2015-01-01
+    out = io.BytesIO()
+
+    def commit(message: str, ops: List[bytes]) -> None:
+        nonlocal ts
+        ts += rng.randint(600, 86400)
+        msg = message.encode('utf-8')
+        out.write(b'commit refs/heads/master\n')
+        out.write(b'committer bench <bench@example.com> %d +0800\n' % ts)
+        out.write(_data_cmd(msg))
+        for op in ops:
+            out.write(op)
+
+    def modify(path: str, payload: bytes) -> bytes:
+        return b'M 100644 inline ' + path.encode('utf-8') + b'\n' + _data_cmd(payload)
+
+    # 第一个提交：全部文章、资源文件夹与 _redirects
+    ops = []
+    texts = {}
+    for e in entries:
+        rel, title, date, old_id, slug = e
+        imgs = [f'img-{i}.png' for i in range(images)]
+        text = post_text(rng, title, date, old_id, imgs, paragraphs=rng.randint(3, 20))
+        texts[rel] = text
+        ops.append(modify(rel, text.encode('utf-8')))
+        res_dir = rel[:-3]
+        for img in imgs:
+            ops.append(modify(f'{res_dir}/{img}', PNG_MAGIC + rng.randbytes(image_size)))
+    redirects = ['# synthetic redirects']
+    for rel, title, date, old_id, slug in entries:
+        y, m, d = date[0:4], date[5:7], date[8:10]
+        redirects.append(f'/{y}/{m}/{d}/{old_id}/*\tposts/{slug}/:splat')
+    ops.append(modify('source/_redirects', ('\n'.join(redirects) + '\n').encode('utf-8')))
+    commit('initial import', ops)
+
+    # 其余提交：大部分修改正文，约十分之一是重命名
+    for c in range(1, commits):
+        e = rng.choice(entries)
+        rel = e[0]
+        if rng.random() < 0.1:
+            new_title = cjk_title(rng)
+            while new_title in used:
+                new_title = cjk_title(rng)
+            used.add(new_title)
+            new_rel = str(Path(rel).with_name(new_title + '.md'))
+            rename_ops = [b'R "' + rel.encode('utf-8') + b'" "' + new_rel.encode('utf-8') + b'"\n']
+            if images:
+                rename_ops.append(b'R "' + rel[:-3].encode('utf-8') + b'" "' + new_rel[:-3].encode('utf-8') + b'"\n')
+            texts[new_rel] = texts.pop(rel)
+            e[0] = new_rel
+            commit(f'rename {Path(rel).stem} -> {new_title}', rename_ops)
+        else:
+            texts[rel] += '\n' + ''.join(rng.choice(CJK_CHARS) for _ in range(rng.randint(10, 80))) + '\n'
+            commit(f'edit {Path(rel).stem}\n\nrevision {c}', [modify(rel, texts[rel].encode('utf-8'))])
+
+    subprocess.run(['git', 'fast-import', '--quiet'], cwd=root, input=out.getvalue(), check=True)
+    subprocess.check_call(['git', 'checkout', '-q', '-f', 'master'], cwd=root)
+    return corpus
+
+
+class Timer:
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def run(self, name: str, func: Callable, *args, **kwargs):
+        # 工具函数会打印大量进度，计时时丢弃
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            self.phases[name] = time.perf_counter() - start
+        print(f"  {name:<24} {self.phases[name] * 1000:10.1f} ms")
+        return result
+
+
+def run_phases(corpus: Corpus, jobs: int, git_sample: int) -> Dict[str, float]:
+    timer = Timer()
+    posts_dir = corpus.posts_dir
+    repo_root = str(corpus.root)
+    db = corpus.root / '.bench-catalog.sqlite3'
+
+    # scan：找出全部 md 文件
+    md_files = timer.run('scan', add_ids.find_posts, posts_dir)
+
+    # parse：冷缓存与热缓存
+    def parse():
+        with PostCatalog(db) as catalog:
+            catalog.scan(md_files, jobs)
+    timer.run('parse.cold', parse)
+    timer.run('parse.warm', parse)
+
+    # git：单次历史索引，以及交互模式 v / m 操作的抽样（走常驻的 git 进程）
+    history = timer.run('git.index', update.build_history_index, repo_root, ['source/_posts'])
+    history_cache = str(corpus.root / '.bench-history.json')
+    update.load_history(repo_root, ['source/_posts'], history_cache)
+    timer.run('git.index.cached', update.load_history, repo_root, ['source/_posts'], history_cache)
+    sample = [(p, history.get(p.relative_to(corpus.root).as_posix(), [])) for p in md_files[:git_sample]]
+
+    def actions():
+        for p, commits in sample:
+            for c in commits[:2]:
+                update.show_commit_diff(repo_root, c['hash'], os.path.join(repo_root, c['path']), c['old_path'])
+                update.show_commit_full(repo_root, c['hash'])
+    timer.run(f'git.actions_x{len(sample)}', actions)
+
+    # plan：rename 的目标路径与 redirects 的 id 匹配
+    def plan_rename():
+        with PostCatalog(db) as catalog:
+            top = sorted(p for p in posts_dir.iterdir() if p.is_file() and p.suffix == '.md')
+            planned = []
+            for md in top:
+                new_md, new_res = rename.compute_new_names(md, posts_dir, catalog)
+                orig_res = md.with_name(md.stem)
+                planned.append((md, new_md, orig_res if orig_res.is_dir() else None, new_res))
+            return planned
+    planned = timer.run('plan.rename', plan_rename)
+
+    def plan_ids():
+        entries = add_ids.parse_redirects(corpus.redirects)
+        with PostCatalog(db) as catalog:
+            id_index: Dict[str, List[Path]] = {}
+            for p, info, err in catalog.scan(md_files, jobs):
+                if info is not None and info.id:
+                    id_index.setdefault(info.id, []).append(p)
+            changes = []
+            for old_id, new_id in entries:
+                cands = id_index.get(old_id, [])
+                if len(cands) == 1:
+                    info = catalog.get(cands[0])
+                    changes.append((cands[0], new_id, info.id, None, info.body_offset,
+                                    (info.mtime_ns, info.size)))
+            return changes
+    changes = timer.run('plan.ids', plan_ids)
+
+    # write：写入 id、写入 updated、执行移动
+    timer.run('write.ids', add_ids.apply_changes, changes, posts_dir, 'id')
+
+    def write_updated():
+        history_now = update.build_history_index(repo_root, ['source/_posts'])
+        for p in md_files:
+            rel = os.path.relpath(p, repo_root).replace(os.sep, '/')
+            commits = history_now.get(rel, [])
+            chosen = update.select_commit(repo_root, commits, ['latest'])
+            update.process_file_auto(repo_root, str(p), commits, chosen)
+    timer.run('write.updated', write_updated)
+
+    journal = MoveJournal(corpus.root / '.bench-journal.jsonl')
+    timer.run('write.rename', rename.apply_plan, planned, journal, posts_dir)
+
+    return timer.phases
+
+
+def compare(result: Dict, baseline: Dict, threshold: float) -> bool:
+    """打印与基线的对比，返回是否存在回退。"""
+    regressed = False
+    base_phases = baseline.get('phases', {})
+    print(f"\n与基线比较（阈值 +{threshold:.0%}）：")
+    for name, sec in result['phases'].items():
+        base = base_phases.get(name)
+        if not base:
+            print(f"  {name:<24} {'(基线无此阶段)':>10}")
+            continue
+        ratio = sec / base
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  <-- 回退'
+            regressed = True
+        print(f"  {name:<24} {base * 1000:10.1f} -> {sec * 1000:10.1f} ms  x{ratio:.2f}{flag}")
+    if baseline.get('params') != result['params']:
+        print('  注意：基线的语料参数与本次不同，比较仅供参考。')
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1000, help='文章数量')
+    parser.add_argument('--commits', type=int, default=2000, help='提交数量')
+    parser.add_argument('--images', type=int, default=3, help='每篇文章的图片数量')
+    parser.add_argument('--image-size', type=int, default=2048, help='每张图片的字节数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='传给工具的并发数')
+    parser.add_argument('--git-sample', type=int, default=20, help='模拟交互操作（v / m）的文章抽样数量')
+    parser.add_argument('--keep', default=None, help='在此目录生成语料并保留')
+    parser.add_argument('--out', default=None, help='把结果写入 JSON 文件')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='用于比较的基线文件')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定回退的相对阈值')
+    args = parser.parse_args(argv)
+
+    params = {k: getattr(args, k) for k in ('posts', 'commits', 'images', 'image_size', 'seed', 'jobs')}
+    tmp = None
+    if args.keep:
+        root = Path(args.keep).resolve()
+        if root.exists() and any(root.iterdir()):
+            print(f"错误：目录非空：{root}")
+            sys.exit(2)
+    else:
+        tmp = tempfile.mkdtemp(prefix='posts-bench-')
+        root = Path(tmp)
+
+    try:
+        print(f"生成语料：{args.posts} 篇文章，{args.commits} 个提交 -> {root}")
+        start = time.perf_counter()
+        corpus = generate(root, args.posts, args.commits, args.images, args.image_size, args.seed)
+        print(f"  生成耗时 {time.perf_counter() - start:.1f} s\n")
+        print('阶段计时：')
+        phases = run_phases(corpus, args.jobs, args.git_sample)
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    result = {
+        'params': params,
+        'python': sys.version.split()[0],
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'phases': phases,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2) + '\n', encoding='utf-8')
+
+    baseline_path = Path(args.baseline)
+    regressed = False
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(result, indent=2) + '\n', encoding='utf-8')
+        print(f"\n基线已保存到 {baseline_path}")
+    elif baseline_path.exists():
+        regressed = compare(result, json.loads(baseline_path.read_text(encoding='utf-8')), args.threshold)
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查文章正文中的资源引用与资源文件夹内容是否一致。
+
+ - 孤儿文件：资源文件夹里没有被正文引用的文件（按大小列出，可用 --prune 删除）
+ - 缺失引用：正文引用了、但资源文件夹（或站点 source 目录）中不存在的文件
+
+用法：
+    python tools/check_assets.py               # 报告孤儿文件与缺失引用
+    python tools/check_assets.py --prune       # 预览要删除的孤儿文件
+    python tools/check_assets.py --prune --apply
+
+支持选项：
+    --posts-dir 路径  指定 posts 目录，默认相对于项目：<root>/source/_posts
+    --prune           删除孤儿文件（与 --apply 一起使用，否则只做预览）
+    --apply           执行删除
+    --jobs N          并发解析正文的进程数，0 表示按 CPU 核心数
+    --stats [文件]    结束时输出 JSON 统计报告
+    --profile [文件]  用 cProfile 记录本次运行并导出结果
+
+识别的引用写法（每个文件用一个预编译的组合正则扫描一遍）：
+    ![alt](img.png)  [text](file.pdf)  [id]: img.png  <img src="img.png">  <a href="...">
+    {% asset_img img.png %}  {% asset_link file.pdf %}  {% asset_path img.png %}
+相对路径先相对资源文件夹、再相对 md 所在目录解析；/posts/<id>/<文件> 形式的永久链接按 id 找到文章的资源文件夹，
+不带文件部分的 /posts/<id>/ 是页面链接，交给 check_links.py 检查；其余以 / 开头的路径相对站点 source 目录解析；
+带协议的 URL、锚点和 data: 链接忽略。优化工具生成的 <原文件名>.webp / .avif 在原图被引用时不算孤儿。
+
+每篇文章提取出的引用按 path + mtime + size 缓存在 tools/.cache/asset_refs.json，未修改的文章不会重新读取。
+存在缺失引用时退出码为 1，可用于 CI；此时 --prune 不会删除任何文件，以免误删实际被引用、只是没有解析出来的文件。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import unquote
+
+import instrument
+from check_links import POST_PATH_RE
+from front_matter import DEFAULT_CACHE_DIR, PostCatalog
+from parallel import add_jobs_argument, map_ordered
+from rename_posts_by_date import find_posts
+
+REFS_CACHE = DEFAULT_CACHE_DIR / 'asset_refs.json'
+REFS_CACHE_VERSION = 1
+
+REF_RE = re.compile(
+    r"!?\[[^\]\n]*\]\(\s*<?(?P<md>[^)\s>]+)"
+    r"|\b(?:src|href)\s*=\s*[\"'](?P<html>[^\"']+)[\"']"
+    r"|\{%\s*asset_(?:img|link|path)\s+(?:\"(?P<tagq>[^\"]+)\"|(?P<tag>[^\s%]+))"
+    r"|^[ \t]{0,3}\[[^\]\n]+\]:[ \t]*<?(?P<def>[^\s>]+)",
+    re.MULTILINE)
+SKIP_RE = re.compile(r"^(?:[a-zA-Z][\w+.-]*:|//|#)")
+VARIANT_SUFFIXES = ('.webp', '.avif')
+
+
+class Ref(NamedTuple):
+    target: str
+    line: int
+    tag: bool  # asset_* 标签只相对资源文件夹解析
+
+
+def extract_refs(md_path: str) -> List[Tuple[str, int, bool]]:
+    """在工作进程中执行：提取正文中的本地资源引用，返回 (目标, 行号, 是否为标签)。"""
+    with open(md_path, encoding='utf-8') as f:
+        text = f.read()
+    refs = []
+    for m in REF_RE.finditer(text):
+        kind = m.lastgroup
+        target = m.group(kind)
+        if SKIP_RE.match(target):
+            continue
+        target = unquote(target.split('#', 1)[0].split('?', 1)[0])
+        if target:
+            refs.append((target, text.count('\n', 0, m.start()) + 1, kind in ('tag', 'tagq')))
+    return refs
+
+
+def load_refs(md_files: List[Path], jobs: int) -> Dict[Path, List[Ref]]:
+    try:
+        cache = json.loads(REFS_CACHE.read_text(encoding='utf-8'))
+        if cache.get('version') != REFS_CACHE_VERSION:
+            cache = {}
+    except (OSError, ValueError):
+        cache = {}
+    entries = cache.get('posts', {})
+    result: Dict[Path, List[Ref]] = {}
+    stale: List[Tuple[Path, os.stat_result]] = []
+    for md in md_files:
+        st = md.stat()
+        hit = entries.get(str(md))
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            result[md] = [Ref(*r) for r in hit[2]]
+            instrument.count('refs_cache_hits')
+        else:
+            stale.append((md, st))
+    with instrument.phase('parse'):
+        parsed = map_ordered(extract_refs, [str(md) for md, _ in stale], jobs, processes=True)
+    for (md, st), refs in zip(stale, parsed):
+        result[md] = [Ref(*r) for r in refs]
+        entries[str(md)] = [st.st_mtime_ns, st.st_size, refs]
+    instrument.count('files_read', len(stale))
+    if stale or len(entries) != len(md_files):
+        keep = {str(md) for md in md_files}
+        REFS_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        REFS_CACHE.write_text(json.dumps({'version': REFS_CACHE_VERSION,
+                                          'posts': {k: v for k, v in entries.items() if k in keep}},
+                                         ensure_ascii=False), encoding='utf-8')
+    return result
+
+
+def resolve(ref: Ref, md: Path, source_dir: Path, ids: Dict[str, Path]) -> Optional[List[Path]]:
+    """引用可能指向的文件，按优先顺序；页面链接不是资源引用，返回 None。"""
+    res_dir = md.with_name(md.stem)
+    if ref.target.startswith('/'):
+        m = POST_PATH_RE.match(ref.target)
+        if m:
+            post_id, rest = m.groups()
+            if not rest:
+                return None
+            if post_id in ids:
+                return [ids[post_id].with_name(ids[post_id].stem) / rest]
+        return [source_dir / ref.target.lstrip('/')]
+    if ref.tag:
+        return [res_dir / ref.target]
+    return [res_dir / ref.target, md.parent / ref.target]
+
+
+def list_folder(res_dir: Path) -> List[Path]:
+    if not res_dir.is_dir():
+        return []
+    return sorted(p for p in res_dir.rglob('*') if p.is_file())
+
+
+def check_post(md: Path, refs: List[Ref], source_dir: Path, ids: Dict[str, Path], used: Set[Path]) -> List[Ref]:
+    """解析文章的引用，找到的文件加入 used，返回缺失引用列表。"""
+    missing: List[Ref] = []
+    for ref in refs:
+        targets = resolve(ref, md, source_dir, ids)
+        if targets is None:
+            continue
+        candidates = [Path(os.path.normpath(c)) for c in targets]
+        found = next((c for c in candidates if c.is_file()), None)
+        if found is None:
+            missing.append(ref)
+        else:
+            used.add(found)
+    return missing
+
+
+def find_orphans(md: Path, used: Set[Path]) -> List[Path]:
+    """资源文件夹中没有被任何文章引用的文件。"""
+    return [p for p in list_folder(md.with_name(md.stem))
+            if p not in used and not (p.suffix.lower() in VARIANT_SUFFIXES and p.with_suffix('') in used)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts-dir', '-d', default=None,
+                        help='posts 目录路径，默认相对于项目：<root>/source/_posts')
+    parser.add_argument('--prune', action='store_true', help='删除孤儿文件')
+    parser.add_argument('--apply', action='store_true', help='执行删除（否则只做预览）')
+    add_jobs_argument(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    with instrument.session(args, 'check_assets'):
+        code = run(args)
+    sys.exit(code)
+
+
+def run(args) -> int:
+    script_dir = Path(__file__).resolve().parent
+    default_posts = script_dir.parent / 'source' / '_posts'
+    posts_dir = Path(args.posts_dir).resolve() if args.posts_dir else default_posts.resolve()
+    if not posts_dir.is_dir():
+        print(f"错误：posts 目录不存在：{posts_dir}")
+        return 2
+    source_dir = posts_dir.parent
+
+    with instrument.phase('scan'):
+        md_files = find_posts(posts_dir, recursive=True)
+    print(f"在 {posts_dir} 下找到 {len(md_files)} 篇文章。")
+    refs = load_refs(md_files, args.jobs)
+
+    # 永久链接 /posts/<id>/<文件> 需要的 id 索引
+    ids: Dict[str, Path] = {}
+    with PostCatalog() as catalog:
+        catalog.prune(posts_dir)
+        for p, info, err in catalog.scan(md_files, args.jobs):
+            if err is None and info.has_fm and info.id:
+                ids.setdefault(info.id, Path(p))
+
+    # 其他文章也可能通过永久链接引用资源，先收集所有文章的引用再判断孤儿文件
+    used: Set[Path] = set()
+    all_orphans: List[Path] = []
+    missing_count = 0
+    with instrument.phase('check'):
+        for md in md_files:
+            for ref in check_post(md, refs[md], source_dir, ids, used):
+                missing_count += 1
+                print(f"缺失：{md.relative_to(posts_dir)}:{ref.line}  {ref.target}")
+        for md in md_files:
+            all_orphans.extend(find_orphans(md, used))
+
+    sizes = {p: p.stat().st_size for p in all_orphans}
+    total = sum(sizes.values())
+    if all_orphans:
+        print("\n孤儿文件（未被引用，按大小排序）：")
+        for p in sorted(all_orphans, key=lambda p: -sizes[p]):
+            print(f"  {sizes[p]:>10}  {p.relative_to(posts_dir)}")
+    print(f"\n共 {len(all_orphans)} 个孤儿文件（{total / 1024:.1f} KB），{missing_count} 个缺失引用。")
+
+    if args.prune and all_orphans:
+        if missing_count:
+            print('存在缺失引用，拒绝删除孤儿文件：请先修正上面的缺失引用，再运行 --prune。')
+            return 1
+        if not args.apply:
+            print('这是预览（dry-run）。要实际删除孤儿文件请使用 --prune --apply 参数。')
+            return 1 if missing_count else 0
+        with instrument.phase('write'):
+            for p in all_orphans:
+                p.unlink()
+                instrument.count('deleted')
+        print(f"已删除 {len(all_orphans)} 个文件，释放 {total / 1024:.1f} KB。")
+    return 1 if missing_count else 0
+
+
+if __name__ == '__main__':
+    main()
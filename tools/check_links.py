@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查文章之间的站内链接：/posts/<id>/ 形式的链接是否指向存在的文章（及其资源文件），
+旧的 /YYYY/MM/DD/N/ 链接是否只能靠重定向访问。
+
+用法：
+    python tools/check_links.py            # 报告失效链接与依赖重定向的链接
+    python tools/check_links.py --jobs 0   # 并行扫描正文
+
+支持选项：
+    --posts-dir 路径  指定 posts 目录，默认相对于项目：<root>/source/_posts
+    --redirects 路径  _redirects 文件，默认 <root>/source/_redirects
+    --edgeone 路径    edgeone.json 文件，默认 <root>/edgeone.json
+    --site-url URL    站点地址，写成完整 URL 的站内链接也会检查，默认取 _config.yml 的 url
+    --jobs N          并发扫描正文的进程数，0 表示按 CPU 核心数
+    --stats [文件]    结束时输出 JSON 统计报告
+    --profile [文件]  用 cProfile 记录本次运行并导出结果
+
+说明：
+ - id 索引来自 PostCatalog 缓存的 front-matter，重定向索引来自 edgeone.json 与 _redirects 中的旧链接规则，
+   每次运行各建一次
+ - 每个文件用一个预编译的正则扫描一遍，只匹配 Markdown 链接、引用定义与 HTML href/src 中的站内路径
+ - 每个文件提取出的链接按内容哈希缓存在 tools/.cache/links.json，再次运行时只扫描修改过的文章
+ - 存在失效链接时退出码为 1，可用于 CI
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+import instrument
+from compile_redirects import RuleSet, read_edgeone, read_redirects
+from front_matter import DEFAULT_CACHE_DIR, PostCatalog
+from parallel import add_jobs_argument, map_ordered
+from rename_posts_by_date import find_posts
+
+LINKS_CACHE = DEFAULT_CACHE_DIR / 'links.json'
+LINKS_CACHE_VERSION = 1
+SITE_URL_RE = re.compile(r"^url:\s*(\S+)", re.MULTILINE)
+POST_PATH_RE = re.compile(r"^/posts/([^/]+)/?(.*)$")
+LEGACY_PATH_RE = re.compile(r"^/\d{4}/\d{2}/\d{2}/[^/]+")
+
+
+def link_pattern(site_urls: List[str]) -> str:
+    """匹配站内链接目标的正则源码：可选的站点前缀，加上 /posts/ 或 /YYYY/MM/DD/ 开头的路径。"""
+    hosts = '|'.join(re.escape(u.rstrip('/')) for u in site_urls)
+    prefix = f"(?:{hosts})?" if hosts else ''
+    path = prefix + r"(/(?:posts/|\d{4}/\d{2}/\d{2}/)[^\s)\"'<>]*)"
+    return (r"\]\(\s*<?" + path.replace('(/', '(?P<md>/', 1)
+            + r"|\b(?:href|src)\s*=\s*[\"']" + path.replace('(/', '(?P<html>/', 1)
+            + r"|^[ \t]{0,3}\[[^\]\n]+\]:[ \t]*<?" + path.replace('(/', '(?P<def>/', 1))
+
+
+def extract_links(item: Tuple[str, str]) -> List[Tuple[str, int]]:
+    """在工作进程中执行：返回文件中站内链接的 (路径, 行号)。"""
+    md_path, pattern = item
+    matcher = re.compile(pattern, re.MULTILINE)
+    with open(md_path, encoding='utf-8') as f:
+        text = f.read()
+    links = []
+    for m in matcher.finditer(text):
+        target = unquote(m.group(m.lastgroup).split('#', 1)[0].split('?', 1)[0])
+        links.append((target, text.count('\n', 0, m.start()) + 1))
+    return links
+
+
+def load_links(catalog: PostCatalog, md_files: List[Path], pattern: str, jobs: int) -> Dict[Path, List[Tuple[str, int]]]:
+    try:
+        cache = json.loads(LINKS_CACHE.read_text(encoding='utf-8'))
+        if cache.get('version') != LINKS_CACHE_VERSION or cache.get('pattern') != pattern:
+            cache = {}
+    except (OSError, ValueError):
+        cache = {}
+    entries: Dict[str, list] = cache.get('links', {})
+    with instrument.phase('hash'):
+        hashes = {md: catalog.content_hash(md) for md in md_files}
+    stale = sorted({h: md for md, h in hashes.items() if h not in entries}.items())
+    instrument.count('links_cache_hits', len(md_files) - len(stale))
+    with instrument.phase('parse'):
+        parsed = map_ordered(extract_links, [(str(md), pattern) for _, md in stale], jobs, processes=True)
+    for (h, _), links in zip(stale, parsed):
+        entries[h] = links
+    instrument.count('files_read', len(stale))
+    used = set(hashes.values())
+    if stale or len(entries) != len(used):
+        LINKS_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        LINKS_CACHE.write_text(json.dumps({'version': LINKS_CACHE_VERSION, 'pattern': pattern,
+                                           'links': {h: v for h, v in entries.items() if h in used}},
+                                          ensure_ascii=False), encoding='utf-8')
+    return {md: [tuple(link) for link in entries[h]] for md, h in hashes.items()}
+
+
+def check_link(target: str, ids: Dict[str, Path], redirects: RuleSet) -> Tuple[str, Optional[str]]:
+    """返回 (状态, 说明)：ok、dead（失效）或 redirect（只能靠重定向访问，说明为重定向目标）。"""
+    m = POST_PATH_RE.match(target)
+    if m:
+        post_id, rest = m.groups()
+        md = ids.get(post_id)
+        if md is None:
+            return ('dead', f"没有 id 为 {post_id} 的文章")
+        if rest and not (md.with_name(md.stem) / rest).is_file():
+            return ('dead', f"资源文件不存在：{rest}")
+        return ('ok', None)
+    if LEGACY_PATH_RE.match(target):
+        for url in (target, target.rstrip('/') + '/'):
+            dest = redirects.resolve(url)
+            if dest is not None:
+                return ('redirect', dest)
+        return ('dead', '旧链接没有对应的重定向')
+    return ('ok', None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts-dir', '-d', default=None,
+                        help='posts 目录路径，默认相对于项目：<root>/source/_posts')
+    parser.add_argument('--redirects', '-r', default=None, help='_redirects 文件，默认 <root>/source/_redirects')
+    parser.add_argument('--edgeone', default=None, help='edgeone.json 文件，默认 <root>/edgeone.json')
+    parser.add_argument('--site-url', default=None, help='站点地址，默认取 _config.yml 的 url')
+    add_jobs_argument(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    with instrument.session(args, 'check_links'):
+        code = run(args)
+    sys.exit(code)
+
+
+def run(args) -> int:
+    script_dir = Path(__file__).resolve().parent
+    repo_root = script_dir.parent
+    default_posts = repo_root / 'source' / '_posts'
+    posts_dir = Path(args.posts_dir).resolve() if args.posts_dir else default_posts.resolve()
+    redirects_file = Path(args.redirects).resolve() if args.redirects else repo_root / 'source' / '_redirects'
+    edgeone_file = Path(args.edgeone).resolve() if args.edgeone else repo_root / 'edgeone.json'
+    if not posts_dir.is_dir():
+        print(f"错误：posts 目录不存在：{posts_dir}")
+        return 2
+    site_urls = [args.site_url] if args.site_url else []
+    config_file = repo_root / '_config.yml'
+    if not site_urls and config_file.exists():
+        m = SITE_URL_RE.search(config_file.read_text(encoding='utf-8'))
+        if m:
+            site_urls = [m.group(1)]
+
+    # 重定向索引：edgeone.json 是当前生效的配置，排在前面
+    with instrument.phase('redirects'):
+        _, edgeone_rules = read_edgeone(edgeone_file)
+        _, redirect_rules, _ = read_redirects(redirects_file)
+        redirects = RuleSet(edgeone_rules + redirect_rules)
+
+    with instrument.phase('scan'):
+        md_files = find_posts(posts_dir, recursive=True)
+    print(f"在 {posts_dir} 下找到 {len(md_files)} 篇文章。")
+
+    with PostCatalog() as catalog:
+        catalog.prune(posts_dir)
+        ids: Dict[str, Path] = {}
+        with instrument.phase('parse'):
+            scanned = catalog.scan(md_files, args.jobs)
+        for p, info, err in scanned:
+            if err is not None:
+                print(f"读取文件失败，跳过：{p}，原因：{err}")
+                continue
+            if info.has_fm and info.id:
+                ids.setdefault(info.id, Path(p))
+        links = load_links(catalog, [Path(p) for p, info, err in scanned if err is None],
+                           link_pattern(site_urls), args.jobs)
+
+    counts: Dict[str, int] = {}
+    with instrument.phase('check'):
+        for md, post_links in links.items():
+            for target, line in post_links:
+                status, detail = check_link(target, ids, redirects)
+                counts[status] = counts.get(status, 0) + 1
+                rel = md.relative_to(posts_dir)
+                if status == 'dead':
+                    print(f"失效：{rel}:{line}  {target}（{detail}）")
+                elif status == 'redirect':
+                    print(f"重定向：{rel}:{line}  {target} -> {detail}")
+
+    print(f"\n共检查 {sum(counts.values())} 个站内链接：正常 {counts.get('ok', 0)}，"
+          f"依赖重定向 {counts.get('redirect', 0)}，失效 {counts.get('dead', 0)}。")
+    return 1 if counts.get('dead') else 0
+
+
+if __name__ == '__main__':
+    main()
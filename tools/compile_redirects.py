@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+根据文章 front-matter 的 `id` 与 `date` 生成旧链接的重定向规则，同时写入 `source/_redirects`（Cloudflare Pages 格式）
+和 `edgeone.json`（EdgeOne Pages 的 redirects），并校验生成的规则与期望完全等价。
+
+旧链接格式为 /YYYY/MM/DD/N/，新链接为 /posts/<id>/。N 是当年的数字 id，已经被新的 id 覆盖，中间还有删除
+文章留下的空缺，无法从 front-matter 推算，所以“旧链接 -> 文章”的对应关系以两个文件中现有的规则为准
+（两者必须一致）。目标一律按文章当前的 `id` 重新生成，`date` 用来核对旧链接中的日期；找不到对应文章的
+旧链接会被移除。
+
+用法：
+    python tools/compile_redirects.py              # 预览：规则数量、等价校验、与现有规则的差异
+    python tools/compile_redirects.py --apply      # 写入 _redirects 与 edgeone.json
+    python tools/compile_redirects.py --status 302 --apply
+
+支持选项：
+    --posts-dir 路径     指定 posts 目录，默认相对于项目：<root>/source/_posts
+    --redirects 路径     _redirects 文件，默认 <root>/source/_redirects
+    --edgeone 路径       edgeone.json 文件，默认 <root>/edgeone.json
+    --status 状态码      重定向状态码，默认 301
+    --no-compact         每篇文章都生成一条通配规则（/.../N/* -> /posts/<id>/:splat）
+    --force              即使现有规则中有旧链接的目标或状态码会被改变也写入
+    --apply              执行写入（否则只做预览）
+    --jobs N             并发读取文章的线程数，0 表示按 CPU 核心数
+    --stats [文件]       结束时输出 JSON 统计报告
+    --profile [文件]     用 cProfile 记录本次运行并导出结果
+
+压缩：两个平台都不支持映射表形式的规则，而不含通配符的静态规则可以按哈希直接匹配，通配规则只能逐条尝试
+（Cloudflare 还把通配规则限制在 100 条）。因此默认只为有资源文件夹的文章生成通配规则，其余文章生成一条
+/YYYY/MM/DD/N/ 的静态规则 —— 旧链接下本来就只有页面本身和资源文件可以访问，覆盖的有效链接不变。
+
+校验：把每个旧链接（页面及其资源文件）的期望目标放进一个字典，再用生成的规则逐一解析（静态规则查哈希表，
+通配规则按顺序匹配，规则顺序在前者优先），任何不一致都会中止写入。现有文件中的规则也会按同样方式解析，
+目标或状态码发生变化的旧链接会列出来，需要 --force 才会覆盖。_redirects 中没有写状态码的规则按 Cloudflare
+的默认值 302 比较；edgeone.json 的 rewrites 是原地返回内容（记为 200），改为 redirects 同样算作目标改变。
+
+两个文件中不属于旧链接的规则（以及 edgeone.json 的 rewrites 之外的其他键、_redirects 开头的注释）原样保留；
+edgeone.json 中旧链接的 rewrites 规则会统一改为 redirects。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import instrument
+from front_matter import PostCatalog
+from parallel import add_jobs_argument
+from rename_posts_by_date import find_posts
+
+LEGACY_SOURCE_RE = re.compile(r"^/\d{4}/\d{2}/\d{2}/[^/\s]+/\*?$")
+DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+DEST_ID_RE = re.compile(r"^/?posts/([^/:\s]+)/")
+PLACEHOLDER_RE = re.compile(r":([A-Za-z]\w*)")
+CLOUDFLARE_DEFAULT_STATUS = 302
+REWRITE_STATUS = 200  # edgeone.json 的 rewrites：不跳转，原地返回目标的内容
+
+
+class Rule(NamedTuple):
+    source: str
+    destination: str
+    status: Optional[int]  # None：没有写明状态码，使用平台的默认值
+
+
+# 旧链接解析的结果：(目标, 状态码)
+Target = Tuple[str, Optional[int]]
+
+
+class LegacyPost(NamedTuple):
+    old_url: str   # /YYYY/MM/DD/N/
+    id: str
+    md: Path
+    assets: Tuple[str, ...]  # 资源文件夹内的文件，相对路径
+
+    @property
+    def new_url(self) -> str:
+        return f"/posts/{self.id}/"
+
+
+def legacy_ledger(rule_sets: List[Tuple[str, List[Rule]]]) -> Dict[str, str]:
+    """从现有规则中收集旧链接：/YYYY/MM/DD/N/ -> 文章 id。两个文件中的记录必须一致。"""
+    ledger: Dict[str, str] = {}
+    for name, rules in rule_sets:
+        for r in rules:
+            m = DEST_ID_RE.match(r.destination)
+            if not m:
+                raise ValueError(f"{name}：无法从目标中识别文章 id：{r.source} -> {r.destination}")
+            old_url = r.source.rstrip('*')
+            if ledger.setdefault(old_url, m.group(1)) != m.group(1):
+                raise ValueError(f"{name}：{old_url} 的目标与其他记录不一致："
+                                 f"{ledger[old_url]} / {m.group(1)}")
+    return ledger
+
+
+def legacy_posts(catalog: PostCatalog, md_files: List[Path], ledger: Dict[str, str], jobs: int,
+                 posts_dir: Path) -> List[LegacyPost]:
+    by_id: Dict[str, Tuple[Path, str]] = {}
+    for p, info, err in catalog.scan(md_files, jobs):
+        if err is not None:
+            print(f"读取文件失败，跳过：{p}，原因：{err}")
+            continue
+        if info.has_fm and info.id:
+            if info.id in by_id:
+                print(f"警告：id 重复：{info.id}，{Path(p).relative_to(posts_dir)}")
+                continue
+            by_id[info.id] = (Path(p), info.date or '')
+    posts = []
+    for old_url, post_id in sorted(ledger.items(), key=lambda kv: (kv[0][:12], kv[0].split('/')[4].zfill(8))):
+        if post_id not in by_id:
+            print(f"警告：找不到 id 为 {post_id} 的文章，{old_url} 的规则将被移除")
+            continue
+        md, date = by_id[post_id]
+        m = DATE_RE.match(date)
+        if not m or '/{}/{}/{}/'.format(*m.groups()) != old_url[:12]:
+            print(f"警告：{md.relative_to(posts_dir)} 的 date（{date}）与旧链接 {old_url} 的日期不一致")
+        res_dir = md.with_name(md.stem)
+        assets = tuple(sorted(f.relative_to(res_dir).as_posix() for f in res_dir.rglob('*') if f.is_file())) \
+            if res_dir.is_dir() else ()
+        posts.append(LegacyPost(old_url, post_id, md, assets))
+    return posts
+
+
+def expected_table(posts: List[LegacyPost]) -> Dict[str, str]:
+    """旧链接 -> 新链接。"""
+    table: Dict[str, str] = {}
+    for post in posts:
+        table[post.old_url] = post.new_url
+        for a in post.assets:
+            table[post.old_url + a] = post.new_url + a
+    return table
+
+
+def compile_rules(posts: List[LegacyPost], status: int, compact: bool) -> List[Rule]:
+    rules = []
+    for post in posts:
+        if compact and not post.assets:
+            rules.append(Rule(post.old_url, post.new_url, status))
+        else:
+            rules.append(Rule(post.old_url + '*', post.new_url + ':splat', status))
+    return rules
+
+
+class RuleSet:
+    """按平台语义解析 URL：第一条匹配的规则生效。静态规则放在哈希表里，通配规则按顺序尝试。"""
+
+    def __init__(self, rules: List[Rule]):
+        self.static: Dict[str, Tuple[int, Rule]] = {}
+        self.dynamic: List[Tuple[int, re.Pattern, Rule]] = []
+        for i, rule in enumerate(rules):
+            if '*' in rule.source or PLACEHOLDER_RE.search(rule.source):
+                pattern = PLACEHOLDER_RE.sub(r"(?P<\1>[^/]+)", re.escape(rule.source).replace(r'\*', '(?P<splat>.*)'))
+                self.dynamic.append((i, re.compile(pattern.replace(r'\:', ':') + '$'), rule))
+            else:
+                self.static.setdefault(rule.source, (i, rule))
+
+    @property
+    def counts(self) -> Tuple[int, int]:
+        return (len(self.static), len(self.dynamic))
+
+    def resolve(self, url: str) -> Optional[Target]:
+        hit = self.static.get(url)
+        for i, pattern, rule in self.dynamic:
+            if hit is not None and i > hit[0]:
+                break
+            m = pattern.match(url)
+            if m:
+                dest = rule.destination
+                for name, value in m.groupdict().items():
+                    dest = dest.replace(':' + name, value)
+                return (dest, rule.status)
+        return (hit[1].destination, hit[1].status) if hit else None
+
+
+def verify(table: Dict[str, str], rules: RuleSet, status: int) -> List[Tuple[str, Target, Optional[Target]]]:
+    """返回 (旧链接, 期望的 (目标, 状态码), 实际的 (目标, 状态码)) 中不一致的部分。"""
+    return [(url, (want, status), got) for url, want in table.items()
+            for got in [rules.resolve(url)] if got != (want, status)]
+
+
+def describe(target: Target) -> str:
+    dest, status = target
+    if status == REWRITE_STATUS:
+        return f"{dest}（rewrite）"
+    return f"{dest}（{status if status is not None else '默认状态码'}）"
+
+
+# ---- _redirects ----
+
+def read_redirects(path: Path) -> Tuple[List[str], List[Rule], List[str]]:
+    """返回 (开头的注释行, 旧链接规则, 其他规则行)。"""
+    header: List[str] = []
+    legacy: List[Rule] = []
+    other: List[str] = []
+    if not path.exists():
+        return (header, legacy, other)
+    for ln in path.read_text(encoding='utf-8').splitlines():
+        parts = ln.split()
+        if not parts or parts[0].startswith('#'):
+            if not legacy and not other:
+                header.append(ln)
+            continue
+        if len(parts) >= 2 and LEGACY_SOURCE_RE.match(parts[0]):
+            legacy.append(Rule(parts[0], parts[1], int(parts[2]) if len(parts) > 2 else CLOUDFLARE_DEFAULT_STATUS))
+        else:
+            other.append(ln)
+    while header and not header[-1].strip():
+        header.pop()
+    return (header, legacy, other)
+
+
+def format_redirects(header: List[str], rules: List[Rule], other: List[str]) -> str:
+    # 按 tabstop=4 用制表符对齐目标列，与文件的 vim modeline 一致
+    width = (max((len(r.source) for r in rules), default=0) // 4 + 1) * 4
+    lines = header + ['']
+    for r in rules:
+        tabs = '\t' * ((width - len(r.source) // 4 * 4) // 4)
+        lines.append(f"{r.source}{tabs}{r.destination}\t{r.status}")
+    if other:
+        lines += [''] + other
+    return '\n'.join(lines) + '\n'
+
+
+# ---- edgeone.json ----
+
+def read_edgeone(path: Path) -> Tuple[dict, List[Rule]]:
+    config = json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
+    legacy = []
+    for key in ('redirects', 'rewrites'):
+        for item in config.get(key, []):
+            if LEGACY_SOURCE_RE.match(item.get('source', '')):
+                status = item.get('statusCode') if key == 'redirects' else REWRITE_STATUS
+                legacy.append(Rule(item['source'], item['destination'], status))
+    return (config, legacy)
+
+
+def update_edgeone(config: dict, rules: List[Rule]) -> dict:
+    generated = [{'source': r.source, 'destination': r.destination, 'statusCode': r.status} for r in rules]
+    new = dict(config)
+    redirects = config.get('redirects', [])
+    first = next((i for i, item in enumerate(redirects) if LEGACY_SOURCE_RE.match(item.get('source', ''))),
+                 len(redirects))
+    kept = [item for item in redirects if not LEGACY_SOURCE_RE.match(item.get('source', ''))]
+    new['redirects'] = kept[:first] + generated + kept[first:]
+    if 'rewrites' in config:
+        new['rewrites'] = [item for item in config['rewrites'] if not LEGACY_SOURCE_RE.match(item.get('source', ''))]
+    return new
+
+
+def write_text(path: Path, text: str) -> bool:
+    if path.exists() and path.read_text(encoding='utf-8') == text:
+        return False
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(text, encoding='utf-8')
+    tmp.replace(path)
+    instrument.count('writes')
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts-dir', '-d', default=None,
+                        help='posts 目录路径，默认相对于项目：<root>/source/_posts')
+    parser.add_argument('--redirects', '-r', default=None, help='_redirects 文件，默认 <root>/source/_redirects')
+    parser.add_argument('--edgeone', default=None, help='edgeone.json 文件，默认 <root>/edgeone.json')
+    parser.add_argument('--status', type=int, choices=(301, 302, 307, 308), default=301, help='重定向状态码')
+    parser.add_argument('--no-compact', dest='compact', action='store_false', help='每篇文章都生成通配规则')
+    parser.add_argument('--force', action='store_true', help='现有旧链接的目标或状态码会改变时仍然写入')
+    parser.add_argument('--apply', action='store_true', help='执行写入（否则只做预览）')
+    add_jobs_argument(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    with instrument.session(args, 'compile_redirects'):
+        run(args)
+
+
+def run(args):
+    script_dir = Path(__file__).resolve().parent
+    repo_root = script_dir.parent
+    default_posts = repo_root / 'source' / '_posts'
+    posts_dir = Path(args.posts_dir).resolve() if args.posts_dir else default_posts.resolve()
+    redirects_file = Path(args.redirects).resolve() if args.redirects else repo_root / 'source' / '_redirects'
+    edgeone_file = Path(args.edgeone).resolve() if args.edgeone else repo_root / 'edgeone.json'
+    if not posts_dir.is_dir():
+        print(f"错误：posts 目录不存在：{posts_dir}")
+        sys.exit(2)
+
+    header, old_redirects, other_lines = read_redirects(redirects_file)
+    config, old_edgeone = read_edgeone(edgeone_file)
+    existing = [(redirects_file.name, old_redirects), (edgeone_file.name, old_edgeone)]
+    try:
+        ledger = legacy_ledger(existing)
+    except ValueError as e:
+        print(f"错误：{e}")
+        sys.exit(2)
+    print(f"现有规则中记录了 {len(ledger)} 个旧链接。")
+
+    with instrument.phase('scan'):
+        md_files = find_posts(posts_dir, recursive=True)
+    with PostCatalog() as catalog:
+        catalog.prune(posts_dir)
+        with instrument.phase('parse'):
+            posts = legacy_posts(catalog, md_files, ledger, args.jobs, posts_dir)
+    print(f"在 {len(md_files)} 篇文章中找到 {len(posts)} 篇有旧链接的文章。")
+
+    with instrument.phase('plan'):
+        table = expected_table(posts)
+        rules = compile_rules(posts, args.status, args.compact)
+        compiled = RuleSet(rules)
+        static, dynamic = compiled.counts
+        print(f"生成 {len(rules)} 条规则：静态 {static} 条，通配 {dynamic} 条；覆盖 {len(table)} 个旧链接。")
+        bad = verify(table, compiled, args.status)
+    if bad:
+        for url, want, got in bad:
+            print(f"  校验失败：{url} -> {describe(got) if got else None}，期望 {describe(want)}")
+        print("错误：生成的规则与期望不一致，未写入。")
+        sys.exit(2)
+    print("等价校验通过。")
+
+    changed_targets = 0
+    for name, old_rules in existing:
+        rule_set = RuleSet(old_rules)
+        s, d = rule_set.counts
+        diffs = verify(table, rule_set, args.status)
+        print(f"\n现有 {name}：旧链接规则 {len(old_rules)} 条（静态 {s}，通配 {d}），"
+              f"与生成结果解析不同的旧链接 {len(diffs)} 个。")
+        added: Dict[str, int] = {}
+        for url, want, got in diffs:
+            if got is None:
+                page = '/'.join(url.split('/')[:5]) + '/'
+                added[page] = added.get(page, 0) + 1
+            else:
+                changed_targets += 1
+                kind = '目标改变' if got[0] != want[0] else '状态改变'
+                print(f"  {kind}：{url}：{describe(got)} -> {describe(want)}")
+        for page, n in added.items():
+            print(f"  新增：{page} 下 {n} 个链接 -> {table[page]}")
+        for src in sorted({r.source for r in old_rules if r.source.rstrip('*') not in table}):
+            print(f"  移除：{src}")
+
+    if not args.apply:
+        print('\n这是预览（dry-run）。要实际写入请使用 --apply 参数。')
+        return
+    if changed_targets and not args.force:
+        print("\n错误：有旧链接的目标或状态码会被改变，确认无误后使用 --force 写入。")
+        sys.exit(2)
+
+    with instrument.phase('write'):
+        written = []
+        if write_text(redirects_file, format_redirects(header, rules, other_lines)):
+            written.append(redirects_file.name)
+        text = json.dumps(update_edgeone(config, rules), indent=4, ensure_ascii=False)
+        if edgeone_file.exists() and edgeone_file.read_text(encoding='utf-8').endswith('\n'):
+            text += '\n'
+        if write_text(edgeone_file, text):
+            written.append(edgeone_file.name)
+    print(f"\n完成：{'、'.join(written) if written else '文件没有变化'}。")
+
+
+if __name__ == '__main__':
+    main()
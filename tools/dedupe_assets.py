@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按内容哈希查找 source/_posts 下资源文件夹中重复的文件（例如同一张截图出现在多篇文章里），
+并用硬链接或 reflink 替换重复副本，或者把它们合并到一个共享目录并改写文章中的引用。
+
+用法：
+    python tools/dedupe_assets.py                          # 预览重复文件
+    python tools/dedupe_assets.py --apply                  # 用 reflink（不支持时用硬链接）替换副本
+    python tools/dedupe_assets.py --apply --link hardlink  # 只用硬链接
+    python tools/dedupe_assets.py --apply --shared-dir source/images/shared --shared-url /images/shared
+                                                           # 合并到共享目录并改写引用
+
+支持选项：
+    --posts-dir 路径   指定 posts 目录，默认相对于项目：<root>/source/_posts
+    --apply            执行替换（否则只做预览）
+    --link 方式        auto（默认，先尝试 reflink）、reflink、hardlink
+    --shared-dir 目录  把每组重复文件复制为 <目录>/<哈希前 16 位><扩展名>，并改写文章中的引用
+    --shared-url URL   共享目录在站点中的路径，与 --shared-dir 一起使用
+    --min-size 字节    忽略小于该大小的文件，默认 1024
+    --jobs N           并发计算哈希的线程数，0 表示按 CPU 核心数
+    --stats [文件]     结束时输出 JSON 统计报告
+    --profile [文件]   用 cProfile 记录本次运行并导出结果
+
+说明：
+ - 哈希缓存在 tools/.cache/hashes.sqlite3，再次运行时只计算新增或修改过的文件
+ - 每组中路径排序最靠前的文件作为保留的原件，已经与原件是同一个 inode 的副本跳过
+ - 替换时先在副本旁创建临时链接，再 rename 覆盖，不会出现副本丢失的中间状态
+ - 硬链接意味着修改其中一个文件会影响所有副本；reflink（写时复制）没有这个问题，但需要文件系统支持
+ - 共享目录模式只删除引用全部改写成功的副本；`{% asset_img %}` 等标签引用的文件保持原样
+"""
+
+from __future__ import annotations
+import argparse
+import errno
+import os
+import re
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+import instrument
+from hash_cache import HashCache
+from incremental import post_for
+from parallel import add_jobs_argument
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+TMP_SUFFIX = '.dedupe'
+
+
+class DupGroup(NamedTuple):
+    sha1: str
+    size: int
+    original: Path
+    copies: List[Path]  # 不含 original，且与 original 不是同一个 inode
+
+
+def find_assets(posts_dir: Path, min_size: int) -> List[Path]:
+    """posts_dir 下除 md 之外的所有文件（忽略隐藏文件）。"""
+    assets = []
+    for dirpath, dirnames, filenames in os.walk(posts_dir):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for fn in filenames:
+            if fn.startswith('.') or fn.lower().endswith('.md'):
+                continue
+            p = Path(dirpath) / fn
+            try:
+                if p.is_file() and not p.is_symlink() and p.stat().st_size >= min_size:
+                    assets.append(p)
+            except OSError:
+                continue
+    return sorted(assets)
+
+
+def group_duplicates(assets: List[Path], cache: HashCache, jobs: int) -> List[DupGroup]:
+    # 大小不同的文件不可能重复，只对大小有重复的文件计算哈希
+    by_size: Dict[int, List[Path]] = {}
+    for p in assets:
+        by_size.setdefault(p.stat().st_size, []).append(p)
+    candidates = [p for ps in by_size.values() if len(ps) > 1 for p in ps]
+    by_hash: Dict[str, List[Path]] = {}
+    with instrument.phase('hash'):
+        for p, rec, err in cache.hash_many(candidates, jobs):
+            if err is not None:
+                print(f"读取失败，跳过：{p}，原因：{err}")
+                continue
+            by_hash.setdefault(rec.sha1, []).append(Path(p))
+    groups = []
+    for sha1, paths in sorted(by_hash.items(), key=lambda kv: sorted(kv[1])[0]):
+        if len(paths) < 2:
+            continue
+        paths.sort()
+        original = paths[0]
+        st = original.stat()
+        copies = [p for p in paths[1:]
+                  if not (p.stat().st_ino == st.st_ino and p.stat().st_dev == st.st_dev)]
+        if copies:
+            groups.append(DupGroup(sha1, st.st_size, original, copies))
+    return groups
+
+
+def reflink(src: Path, dst: Path) -> None:
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def link_file(original: Path, copy: Path, mode: str) -> str:
+    """用指向 original 的链接原子地替换 copy，返回实际使用的方式。"""
+    tmp = copy.with_name(copy.name + TMP_SUFFIX)
+    if tmp.exists():
+        tmp.unlink()
+    used = None
+    if mode in ('auto', 'reflink'):
+        try:
+            reflink(original, tmp)
+            used = 'reflink'
+        except (OSError, ImportError) as e:
+            if tmp.exists():
+                tmp.unlink()
+            if mode == 'reflink':
+                raise OSError(getattr(e, 'errno', errno.EOPNOTSUPP), f"不支持 reflink：{e}") from e
+    if used is None:
+        os.link(original, tmp)
+        used = 'hardlink'
+    os.replace(tmp, copy)
+    return used
+
+
+def reference_re(names: List[str]) -> re.Pattern:
+    """匹配 Markdown 链接 / 图片的目标，以及 HTML 的 src / href 属性值。"""
+    alt = '|'.join(re.escape(n) for n in sorted(set(names), key=len, reverse=True))
+    return re.compile(r"(\]\(\s*<?|\b(?:src|href)\s*=\s*[\"'])(?:\./)?(?:" + alt + r")(?=[\s)>\"'])")
+
+
+def rewrite_references(md: Path, asset: Path, url: str) -> bool:
+    """把 md 中指向 asset 的引用改为 url。返回 True 表示引用全部改写，asset 可以删除。"""
+    res_dir = md.with_name(md.stem)
+    rel = asset.relative_to(res_dir).as_posix()
+    names = [rel, f"{res_dir.name}/{rel}"]
+    # newline=''：保留文章原有的换行符（CRLF 文章不会被整篇改写为 LF）
+    with open(md, encoding='utf-8', newline='') as f:
+        text = f.read()
+    new_text, n = reference_re(names).subn(lambda m: m.group(1) + url, text)
+    if n == 0:
+        return False
+    with open(md, 'w', encoding='utf-8', newline='') as f:
+        f.write(new_text)
+    instrument.count('writes')
+    # 还有其他形式的引用（例如 asset_img 标签）时保留文件
+    return asset.name not in new_text
+
+
+def share_group(group: DupGroup, shared_dir: Path, shared_url: str, posts_dir: Path) -> int:
+    """把一组重复文件合并到共享目录，返回删除的副本数。"""
+    target = shared_dir / f"{group.sha1[:16]}{group.original.suffix.lower()}"
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(group.original, target)
+    url = f"{shared_url.rstrip('/')}/{target.name}"
+    removed = 0
+    for asset in [group.original] + group.copies:
+        md = post_for(asset, posts_dir)
+        if md is None or md == asset:
+            print(f"  保留（不在文章资源文件夹中）：{asset.relative_to(posts_dir)}")
+            continue
+        if rewrite_references(md, asset, url):
+            asset.unlink()
+            removed += 1
+            print(f"  改写：{md.relative_to(posts_dir)} -> {url}，删除 {asset.relative_to(posts_dir)}")
+        else:
+            print(f"  保留（未找到可改写的引用）：{asset.relative_to(posts_dir)}")
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts-dir', '-d', default=None,
+                        help='posts 目录路径，默认相对于项目：<root>/source/_posts')
+    parser.add_argument('--apply', action='store_true', help='执行替换（否则只做预览）')
+    parser.add_argument('--link', choices=('auto', 'reflink', 'hardlink'), default='auto',
+                        help='替换副本的方式，默认 auto（先尝试 reflink）')
+    parser.add_argument('--shared-dir', default=None, help='合并到的共享目录，并改写文章中的引用')
+    parser.add_argument('--shared-url', default=None, help='共享目录在站点中的 URL 路径')
+    parser.add_argument('--min-size', type=int, default=1024, help='忽略小于该字节数的文件')
+    add_jobs_argument(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    with instrument.session(args, 'dedupe_assets'):
+        run(args)
+
+
+def run(args):
+    script_dir = Path(__file__).resolve().parent
+    default_posts = script_dir.parent / 'source' / '_posts'
+    posts_dir = Path(args.posts_dir).resolve() if args.posts_dir else default_posts.resolve()
+    if not posts_dir.is_dir():
+        print(f"错误：posts 目录不存在：{posts_dir}")
+        sys.exit(2)
+    if bool(args.shared_dir) != bool(args.shared_url):
+        print("错误：--shared-dir 与 --shared-url 需要同时指定")
+        sys.exit(2)
+
+    with instrument.phase('scan'):
+        assets = find_assets(posts_dir, args.min_size)
+    print(f"在 {posts_dir} 下找到 {len(assets)} 个资源文件。")
+
+    with HashCache() as cache:
+        cache.prune(posts_dir)
+        groups = group_duplicates(assets, cache, args.jobs)
+
+        copies = sum(len(g.copies) for g in groups)
+        saved = sum(g.size * len(g.copies) for g in groups)
+        print(f"发现 {len(groups)} 组重复文件，共 {copies} 个副本，可节省 {saved / 1024 / 1024:.1f} MB。\n")
+        for g in groups:
+            print(f"{g.sha1[:12]}  {g.size} 字节  原件：{g.original.relative_to(posts_dir)}")
+            for c in g.copies:
+                print(f"    副本：{c.relative_to(posts_dir)}")
+
+        if not groups:
+            return
+        if not args.apply:
+            print('\n这是预览（dry-run）。要实际替换请使用 --apply 参数。')
+            return
+
+        counts: Dict[str, int] = {}
+        with instrument.phase('write'):
+            if args.shared_dir:
+                shared_dir = Path(args.shared_dir).resolve()
+                print()
+                for g in groups:
+                    counts['removed'] = counts.get('removed', 0) + share_group(g, shared_dir, args.shared_url, posts_dir)
+                    for p in [g.original] + g.copies:
+                        cache.forget(p)
+            else:
+                for g in groups:
+                    for c in g.copies:
+                        try:
+                            used = link_file(g.original, c, args.link)
+                        except OSError as e:
+                            print(f"替换失败：{c.relative_to(posts_dir)}，原因：{e}")
+                            counts['failed'] = counts.get('failed', 0) + 1
+                            continue
+                        counts[used] = counts.get(used, 0) + 1
+                        instrument.count('links')
+                        cache.forget(c)
+
+    summary = '，'.join(f"{k} {v}" for k, v in sorted(counts.items())) or '无'
+    print(f"\n完成：{summary}。")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量修改文章 front-matter 的命令行工具。
+
+用法：
+    python tools/fm.py set updated='2020-01-01 10:00:00' id=new-arrival --where id=1
+    python tools/fm.py set draft=false --where 'date^=2015' --apply
+    python tools/fm.py unset draft --where draft --apply
+
+筛选条件 --where 可以重复，全部满足才会修改：
+    key=value    值相等（列表字段则为包含该值）
+    key!=value   值不相等
+    key^=prefix  值以 prefix 开头
+    key          存在该键
+    !key         不存在该键
+
+筛选基于 PostCatalog 缓存的头部，不满足条件的文章不会被读取；命中的文章只读取一次、写入一次，
+所有键的修改在同一次写入中完成，保留原有键顺序、注释与换行符。默认只预览，--apply 才写入。
+筛选与写入是一条流水线，不会先收集全部匹配的文章；--stream 时文件列表与目录缓存也不整体载入。
+
+支持选项：
+    --posts-dir 路径  指定 posts 目录，默认相对于项目：<root>/source/_posts
+    --apply           执行写入（否则只做预览）
+    --raw             值原样写入，不做 YAML 引号处理
+    --stream          流式处理：边遍历边处理（资源文件夹中的 md 不当作文章），目录缓存按需查询、分批写回
+    --jobs N          并发读取与写入的线程数，0 表示按 CPU 核心数
+    --stats [文件]    结束时输出 JSON 统计报告
+    --profile [文件]  用 cProfile 记录本次运行并导出结果
+"""
+
+from __future__ import annotations
+import argparse
+import re
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import instrument
+from front_matter import (PostCatalog, PostInfo, StaleFileError, edit_front_matter, patch_header, walk_posts,
+                          yaml_scalar)
+from parallel import add_jobs_argument, imap_ordered
+
+WHERE_RE = re.compile(r"^(!?)([A-Za-z_][\w-]*)(?:(=|!=|\^=)(.*))?$")
+
+
+def parse_assignments(items: List[str], raw: bool) -> Dict[str, Optional[str]]:
+    edits: Dict[str, Optional[str]] = {}
+    for item in items:
+        key, sep, value = item.partition('=')
+        if not sep or not re.match(r"^[A-Za-z_][\w-]*$", key):
+            raise ValueError(f"无法解析赋值：{item}（应为 key=value）")
+        edits[key] = value if raw else yaml_scalar(value)
+    return edits
+
+
+def parse_where(expr: str) -> Callable[[PostInfo], bool]:
+    m = WHERE_RE.match(expr)
+    if not m or (m.group(1) and m.group(3)):
+        raise ValueError(f"无法解析筛选条件：{expr}")
+    negate, key, op, value = m.groups()
+    if op is None:
+        if negate:
+            return lambda info: info.get(key) is None
+        return lambda info: info.get(key) is not None
+
+    def values(info: PostInfo) -> List[str]:
+        v = info.get(key)
+        if v is None:
+            return []
+        return v if isinstance(v, list) else [v]
+
+    if op == '=':
+        return lambda info: value in values(info)
+    if op == '!=':
+        return lambda info: value not in values(info)
+    return lambda info: any(v.startswith(value) for v in values(info))
+
+
+def select_posts(catalog: PostCatalog, posts_dir: Path, filters, jobs: int, stream: bool = False) -> Iterator[PostInfo]:
+    """逐个产出满足全部筛选条件的文章。"""
+    md_files = walk_posts(posts_dir) if stream else sorted(posts_dir.rglob('*.md'))
+    for p, info, err in catalog.iter_scan(md_files, jobs):
+        if err is not None:
+            print(f"读取文件失败，跳过：{p}，原因：{err}")
+            continue
+        if not info.has_fm:
+            continue
+        if all(f(info) for f in filters):
+            yield info
+
+
+def apply_edits(info: PostInfo, edits: Dict[str, Optional[str]], write: bool) -> Tuple[str, Optional[str]]:
+    """返回 (状态, 说明)。写入时只读一次文件、写一次文件。"""
+    if not write:
+        with open(info.path, 'rb') as f:
+            header = f.read(info.body_offset).decode('utf-8')
+        instrument.count('bytes_read', len(header))
+        _, changed = edit_front_matter(header, edits)
+        return ('would-change' if changed else 'unchanged', None)
+    try:
+        changed = patch_header(info.path, None, info.body_offset,
+                               lambda header: edit_front_matter(header, edits), (info.mtime_ns, info.size))
+    except StaleFileError as e:
+        return ('stale', str(e))
+    except (OSError, UnicodeDecodeError) as e:
+        return ('failed', str(e))
+    return ('changed' if changed else 'unchanged', None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量修改文章 front-matter')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('set', '设置键值，key=value'), ('unset', '删除键')):
+        sp = sub.add_parser(name, help=help_text)
+        sp.add_argument('items', nargs='+', help='key=value' if name == 'set' else 'key')
+        sp.add_argument('--where', '-w', action='append', default=[], help='筛选条件，可重复')
+        sp.add_argument('--posts-dir', '-d', default=None,
+                        help='posts 目录路径，默认相对于项目：<root>/source/_posts')
+        sp.add_argument('--apply', action='store_true', help='执行写入（否则只做预览）')
+        sp.add_argument('--raw', action='store_true', help='值原样写入，不加引号')
+        sp.add_argument('--stream', action='store_true', help='流式处理，内存占用与文章总数无关')
+        add_jobs_argument(sp)
+        instrument.add_arguments(sp)
+    args = parser.parse_args(argv)
+    with instrument.session(args, 'fm'):
+        run(args)
+
+
+def run(args):
+    script_dir = Path(__file__).resolve().parent
+    default_posts = script_dir.parent / 'source' / '_posts'
+    posts_dir = Path(args.posts_dir).resolve() if args.posts_dir else default_posts.resolve()
+    if not posts_dir.is_dir():
+        print(f"错误：posts 目录不存在：{posts_dir}")
+        sys.exit(2)
+
+    try:
+        if args.command == 'set':
+            edits = parse_assignments(args.items, args.raw)
+        else:
+            edits = {key: None for key in args.items}
+        filters = [parse_where(w) for w in args.where]
+    except ValueError as e:
+        print(f"错误：{e}")
+        sys.exit(2)
+
+    # 筛选与修改连成一条流水线，匹配到的文章边扫描边处理
+    counts: Dict[str, int] = {}
+    with PostCatalog(preload=not args.stream) as catalog:
+        catalog.prune(posts_dir)
+        with instrument.phase('write' if args.apply else 'plan'):
+            selected = select_posts(catalog, posts_dir, filters, args.jobs, args.stream)
+            for info, (status, detail) in imap_ordered(lambda info: (info, apply_edits(info, edits, args.apply)),
+                                                       selected, args.jobs):
+                counts[status] = counts.get(status, 0) + 1
+                rel = Path(info.path).relative_to(posts_dir)
+                if status in ('changed', 'would-change'):
+                    print(f"  {'修改' if args.apply else '将修改'}：{rel}")
+                elif status in ('stale', 'failed'):
+                    print(f"  跳过：{rel}，原因：{detail}")
+
+    summary = '，'.join(f"{k} {v}" for k, v in sorted(counts.items())) or '无'
+    print(f"\n匹配到 {sum(counts.values())} 篇文章。完成：{summary}。")
+    if not args.apply:
+        print('这是预览（dry-run）。要实际写入请使用 --apply 参数。')
+
+
+if __name__ == '__main__':
+    main()
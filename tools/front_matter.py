@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+三个文章工具共用的 front-matter 解析与缓存。
+
+ - 统一的正则：`FM_BLOCK_RE`、`DATE_LINE_RE`、`ID_LINE_RE`
+ - `find_front_matter`：定位文件头部以 `---` 包裹的 front-matter
+ - `parse_front_matter`：把 front-matter 解析成简单的 dict（只支持顶层标量和列表）
+ - `read_header`：只流式读取文件开头直到 front-matter 结束分隔行，正文在需要写回时才读取
+ - `patch_header`：按计划时记录的内容哈希（或 catalog 中的 mtime + size）与正文偏移原地替换头部，
+   文件已被修改时快速失败
+ - `edit_front_matter`：一次应用多个键的增改删，保留原有顺序、注释与换行符；`yaml_scalar` 格式化值
+ - `walk_posts`：惰性遍历文章（跳过资源文件夹），不需要先把全部路径放进列表
+ - `PostCatalog`：基于 SQLite 的磁盘目录，以 path + mtime + size 为键缓存每篇文章解析后的
+   title、date、id、updated、tags、categories 以及内容哈希。只有 stat 发生变化的文件才会被重新读取，
+   并且只读取头部；内容哈希在第一次被请求时才计算。`PostCatalog(preload=False)` 与 `iter_scan`
+   组成流式模式：按路径逐条查询缓存、分批写回，内存占用与文章总数无关。
+
+缓存默认位于 tools/.cache/catalog.sqlite3，删除该文件即可强制全部重新解析。
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import instrument
+from parallel import imap_ordered
+
+# 与 find_front_matter / read_header 一样，允许开头有 BOM 和空行
+FM_BLOCK_RE = re.compile(r"^\ufeff?\s*---\s*\r?\n(.*?)\r?\n---\s*\r?\n",
+                         re.DOTALL | re.MULTILINE)
+DATE_LINE_RE = re.compile(r"^\s*date\s*:\s*(.+)$",
+                          re.IGNORECASE | re.MULTILINE)
+ID_LINE_RE = re.compile(r"^\s*id\s*:\s*(.+)$",
+                        re.IGNORECASE | re.MULTILINE)
+DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+# 顶层 `key: value` 行与块状列表项 `  - value`（YAML 也允许列表项不缩进：`- value`）
+KEY_LINE_RE = re.compile(r"^([A-Za-z_][\w-]*)\s*:\s*(.*)$")
+LIST_ITEM_RE = re.compile(r"^\s*-(?:\s+|$)(.*)$")
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / '.cache'
+CATALOG_VERSION = 3
+# front-matter 超过这个字节数仍未结束，就当作没有 front-matter
+HEADER_LIMIT = 64 * 1024
+HASH_CHUNK = 1024 * 1024
+BOM = b'\xef\xbb\xbf'
+# 流式模式下积累这么多条新解析的记录就写回一次
+FLUSH_EVERY = 1000
+
+
+def _opening_line(lines: List[str]) -> int:
+    """开头的 `---` 所在的行号：跳过 BOM 与空行。"""
+    for i, ln in enumerate(lines):
+        if ln.lstrip('\ufeff').strip():
+            return i
+    return len(lines)
+
+
+def find_front_matter(text):
+    # Return (start_idx, end_idx, front_matter_text)
+    # start_idx and end_idx are indices in text where the '---' lines start and end (inclusive of separators)
+    m = re.match(r"\ufeff?\s*---\s*\n", text)
+    if not m:
+        return None
+    # find the next line that is /^---\s*$/
+    lines = text.splitlines(keepends=True)
+    # the opening '---' comes after an optional BOM and blank lines
+    opening = _opening_line(lines)
+    end_line = None
+    for i in range(opening + 1, len(lines)):
+        if re.match(r"^---\s*$", lines[i]):
+            end_line = i
+            break
+    if end_line is None:
+        return None
+    # compute char indices
+    fm_text = ''.join(lines[0:end_line+1])
+    # start index is 0 (we only support fm at top)
+    return (0, len(fm_text), fm_text)
+
+
+class FrontMatterHeader(NamedTuple):
+    path: str
+    raw: str          # 完整的头部文本，包括首尾两行 `---`（以及之前的 BOM 与空行）
+    content: str      # 两行 `---` 之间的内容，相当于 FM_BLOCK_RE 的 group(1)
+    body_offset: int  # 正文在文件中的起始字节偏移
+
+    def read_body(self) -> str:
+        """读取 front-matter 之后的正文。只有真正需要写回文件时才调用。"""
+        with open(self.path, 'rb') as f:
+            f.seek(self.body_offset)
+            data = f.read()
+        instrument.count('bytes_read', len(data))
+        return data.decode('utf-8')
+
+
+def read_header(path, limit: int = HEADER_LIMIT) -> Optional[FrontMatterHeader]:
+    """逐行读取文件开头直到 front-matter 的结束分隔行，只解码这部分字节。
+    开头的 BOM 和空行会被跳过，但保留在 raw 中，body_offset 始终是文件中的真实偏移。
+    没有 front-matter（或超过 limit 字节仍未结束）时返回 None。
+    """
+    with open(path, 'rb') as f:
+        lines: List[bytes] = []
+        total = 0
+        opening = None
+        while total <= limit:
+            line = f.readline(limit)
+            if not line:
+                return None
+            lines.append(line)
+            total += len(line)
+            if opening is None:
+                text = line[len(BOM):] if total == len(line) and line.startswith(BOM) else line
+                if not text.strip():
+                    continue
+                if text.strip() != b'---':
+                    return None
+                opening = len(lines) - 1
+            elif line.rstrip() == b'---':
+                break
+        else:
+            return None
+    instrument.count('files_read')
+    instrument.count('bytes_read', total)
+    raw = b''.join(lines).decode('utf-8')
+    content = b''.join(lines[opening + 1:-1]).decode('utf-8')
+    if content.endswith('\n'):
+        content = content[:-2] if content.endswith('\r\n') else content[:-1]
+    return FrontMatterHeader(os.path.abspath(path), raw, content, total)
+
+
+def file_sha1(path) -> str:
+    h = hashlib.sha1()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+            size += len(chunk)
+    instrument.count('files_hashed')
+    instrument.count('bytes_read', size)
+    return h.hexdigest()
+
+
+class StaleFileError(Exception):
+    """文件内容与生成计划时记录的哈希不一致。"""
+
+
+def patch_header(path, expected_sha1: Optional[str], body_offset: int,
+                 edit: Callable[[str], Tuple[str, bool]],
+                 expected_stat: Optional[Tuple[int, int]] = None) -> bool:
+    """只读取一次文件：校验内容哈希后，把 [0, body_offset) 的头部交给 edit 修改并原地写回，正文字节原样保留。
+    edit 接收头部文本，返回 (new_header, changed)。返回值表示是否写入了文件。
+    文件在计划之后被修改过时抛出 StaleFileError，不做任何写入。expected_sha1 为 None 时只检查头部位置；
+    同一次运行中计划并写入时可以改为传入 catalog 记录的 (mtime_ns, size)，不必为了哈希再读一遍文件。
+    """
+    with open(path, 'rb') as f:
+        if expected_stat is not None:
+            st = os.fstat(f.fileno())
+            if (st.st_mtime_ns, st.st_size) != tuple(expected_stat):
+                raise StaleFileError(f"文件在生成计划后被修改：{path}")
+        data = f.read()
+    instrument.count('bytes_read', len(data))
+    if expected_sha1 is None:
+        # 没有哈希时（例如 body_offset 刚从 catalog 取得）至少确认偏移处仍是头部结尾
+        head = data[len(BOM):] if data.startswith(BOM) else data
+        if data[:body_offset].rstrip()[-3:] != b'---' or not head.lstrip().startswith(b'---'):
+            raise StaleFileError(f"文件头部已变化：{path}")
+    elif hashlib.sha1(data).hexdigest() != expected_sha1:
+        raise StaleFileError(f"文件在生成计划后被修改：{path}")
+    new_header, changed = edit(data[:body_offset].decode('utf-8'))
+    if not changed:
+        return False
+    header_bytes = new_header.encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(header_bytes)
+        f.write(memoryview(data)[body_offset:])
+    instrument.count('writes')
+    instrument.count('bytes_written', len(header_bytes) + len(data) - body_offset)
+    return True
+
+
+# 插入新键时放在哪个键之后；不在表中的键追加到末尾
+INSERT_AFTER = {'updated': 'date'}
+PLAIN_SCALAR_RE = re.compile(r"^(?:\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?|[^\s:'\"\\#\[\]{},&*!|>%@`-][^:'\"\\#]*?)$")
+
+
+def yaml_scalar(val: str) -> str:
+    """把字符串写成 YAML 标量：普通文本与日期原样输出，含特殊字符时用单引号包裹。"""
+    if val and PLAIN_SCALAR_RE.match(val) and val == val.strip():
+        return val
+    return "'" + val.replace("'", "''") + "'"
+
+
+def edit_front_matter(raw: str, edits: Dict[str, Optional[str]]) -> Tuple[str, bool]:
+    """一次处理多个键的修改。raw 为包括首尾 `---` 的头部文本，edits 为 键 -> 已格式化的 YAML 值，
+    值为 None 表示删除该键。返回 (new_raw, changed)。
+
+    头部按行切分成 token：顶层的 `key: value` 行连同其后缩进的续行（列表项、多行值）为一个字段，
+    其余行（注释、空行、分隔行）原样保留。键名不区分大小写，保留原有写法、顺序、注释和换行符。
+    """
+    lines = raw.splitlines(keepends=True)
+    opening = _opening_line(lines)
+    if len(lines) - opening < 2:
+        return (raw, False)
+    # 新增的行沿用文件自己的换行符
+    eol = '\r\n' if lines[opening].endswith('\r\n') else '\n'
+    # fields: 小写键名 -> (起始行, 结束行)，按出现顺序
+    fields: Dict[str, Tuple[int, int]] = {}
+    close = len(lines) - 1
+    i = opening + 1
+    while i < close:
+        km = KEY_LINE_RE.match(lines[i].rstrip('\r\n'))
+        if not km:
+            i += 1
+            continue
+        j = i + 1
+        while j < close and lines[j].strip() and (lines[j][0] in ' \t' or LIST_ITEM_RE.match(lines[j])):
+            j += 1
+        fields.setdefault(km.group(1).lower(), (i, j))
+        i = j
+
+    replace: Dict[int, Tuple[int, List[str]]] = {}  # 起始行 -> (结束行, 新行)
+    insert: Dict[int, List[str]] = {}               # 插入到该行之前
+    for key, value in edits.items():
+        span = fields.get(key.lower())
+        if span is not None:
+            start, end = span
+            name, current = KEY_LINE_RE.match(lines[start].rstrip('\r\n')).groups()
+            if value is None:
+                replace[start] = (end, [])
+            elif end - start > 1 or unquote(current) != unquote(value):
+                replace[start] = (end, [f"{name}: {value}{eol}"])
+            continue
+        if value is None:
+            continue
+        anchor = INSERT_AFTER.get(key.lower())
+        if anchor is None:
+            pos = close
+        elif anchor in fields:
+            pos = fields[anchor][1]
+        else:
+            pos = opening + 1
+        insert.setdefault(pos, []).append(f"{key}: {value}{eol}")
+    if not replace and not insert:
+        return (raw, False)
+
+    out: List[str] = []
+    i = 0
+    while i < len(lines):
+        out.extend(insert.get(i, ()))
+        if i in replace:
+            end, new_lines = replace[i]
+            out.extend(new_lines)
+            i = end
+            continue
+        out.append(lines[i])
+        i += 1
+    new_raw = ''.join(out)
+    return (new_raw, new_raw != raw)
+
+
+def unquote(val: str) -> str:
+    return val.strip().strip('\"\'')
+
+
+def extract_date(date_field: Optional[str]) -> Optional[str]:
+    """从 date 字段值中提取第一个 YYYY-MM-DD。"""
+    if not date_field:
+        return None
+    dm = DATE_RE.search(date_field)
+    if dm:
+        return dm.group(1)
+    return None
+
+
+def parse_front_matter(fm_text: str) -> Dict[str, object]:
+    """把 front-matter 内容（不含 `---` 分隔行）解析为 dict。
+    值为字符串或字符串列表，不支持嵌套映射，足够应付文章头部的常见写法。
+    """
+    fields: Dict[str, object] = {}
+    current: Optional[str] = None
+    for ln in fm_text.splitlines():
+        if not ln.strip() or ln.lstrip().startswith('#'):
+            continue
+        lm = LIST_ITEM_RE.match(ln)
+        if lm and current is not None:
+            items = fields.get(current)
+            if not isinstance(items, list):
+                items = []
+                fields[current] = items
+            items.append(unquote(lm.group(1)))
+            continue
+        km = KEY_LINE_RE.match(ln)
+        if not km:
+            continue
+        key, raw = km.group(1), km.group(2).strip()
+        current = key
+        if raw.startswith('[') and raw.endswith(']'):
+            fields[key] = [unquote(v) for v in raw[1:-1].split(',') if v.strip()]
+        elif raw:
+            fields[key] = unquote(raw)
+        else:
+            fields[key] = []
+    return fields
+
+
+class PostInfo(NamedTuple):
+    path: str
+    mtime_ns: int
+    size: int
+    sha1: Optional[str]   # 内容哈希，未计算时为 None，见 PostCatalog.content_hash
+    has_fm: bool
+    fields: Dict[str, object]
+    body_offset: int      # 正文起始字节偏移，没有 front-matter 时为 0
+
+    @property
+    def title(self) -> Optional[str]:
+        return self._scalar('title')
+
+    @property
+    def date(self) -> Optional[str]:
+        return self._scalar('date')
+
+    @property
+    def id(self) -> Optional[str]:
+        return self._scalar('id')
+
+    @property
+    def updated(self) -> Optional[str]:
+        return self._scalar('updated')
+
+    @property
+    def tags(self) -> List[str]:
+        return self._list('tags')
+
+    @property
+    def categories(self) -> List[str]:
+        return self._list('categories')
+
+    def get(self, key: str) -> Optional[object]:
+        """按键名取值，键名大小写不敏感（与原先的 IGNORECASE 正则一致）。"""
+        if key in self.fields:
+            return self.fields[key]
+        lower = key.lower()
+        for k, v in self.fields.items():
+            if k.lower() == lower:
+                return v
+        return None
+
+    def _scalar(self, key: str) -> Optional[str]:
+        v = self.get(key)
+        if isinstance(v, str) and v:
+            return v
+        return None
+
+    def _list(self, key: str) -> List[str]:
+        v = self.get(key)
+        if isinstance(v, list):
+            return v
+        if isinstance(v, str) and v:
+            return [v]
+        return []
+
+
+def walk_posts(posts_dir) -> Iterator[Path]:
+    """逐个产出 posts_dir 下的文章。与某个 md 同名的目录是它的资源文件夹，不再向下遍历。
+    每个目录内按名字排序，整体顺序是确定的，但不等于对全部路径排序。
+    """
+    for dirpath, dirnames, filenames in os.walk(posts_dir):
+        mds = sorted(fn for fn in filenames if fn.lower().endswith('.md'))
+        stems = {Path(fn).stem for fn in mds}
+        dirnames[:] = sorted(d for d in dirnames if d not in stems)
+        for fn in mds:
+            yield Path(dirpath) / fn
+
+
+def parse_post(path: str, st: os.stat_result) -> PostInfo:
+    header = read_header(path)
+    if header is None:
+        return PostInfo(path, st.st_mtime_ns, st.st_size, None, False, {}, 0)
+    with instrument.timed('parse_seconds'):
+        fields = parse_front_matter(header.content)
+    return PostInfo(path, st.st_mtime_ns, st.st_size, None, True, fields, header.body_offset)
+
+
+class PostCatalog:
+    """front-matter 的持久化目录。
+
+    用法：
+        with PostCatalog() as catalog:
+            info = catalog.get(path)
+
+    get() 只在 (mtime, size) 与缓存不一致时才读取并解析文件头部；结果在 close() 时一次性写回。
+
+    preload=False 时不把整张表读进内存，每个路径单独按主键查询，新解析的记录每 FLUSH_EVERY 条写回一次，
+    配合 iter_scan 处理文章数量很大的目录。
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, preload: bool = True):
+        self.db_path = Path(db_path) if db_path else DEFAULT_CACHE_DIR / 'catalog.sqlite3'
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        (version,) = self.conn.execute("PRAGMA user_version").fetchone()
+        if version != CATALOG_VERSION:
+            # 表结构有变化，旧缓存直接丢弃
+            self.conn.execute("DROP TABLE IF EXISTS posts")
+            self.conn.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            " path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER,"
+            " sha1 TEXT, has_fm INTEGER, fields TEXT, body_offset INTEGER)")
+        self.preload = preload
+        self._rows: Dict[str, PostInfo] = {}
+        if preload:
+            for row in self.conn.execute(
+                    "SELECT path, mtime_ns, size, sha1, has_fm, fields, body_offset FROM posts"):
+                self._rows[row[0]] = self._row_info(row)
+        self._dirty: Dict[str, PostInfo] = {}
+
+    def __enter__(self) -> 'PostCatalog':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @staticmethod
+    def _row_info(row) -> PostInfo:
+        path, mtime_ns, size, sha1, has_fm, fields, body_offset = row
+        return PostInfo(path, mtime_ns, size, sha1, bool(has_fm), json.loads(fields), body_offset)
+
+    def _cached(self, key: str) -> Optional[PostInfo]:
+        # 不预加载时查询数据库，只能在主线程中调用
+        if self.preload or key in self._rows:
+            return self._rows.get(key)
+        if key in self._dirty:
+            return self._dirty[key]
+        row = self.conn.execute(
+            "SELECT path, mtime_ns, size, sha1, has_fm, fields, body_offset FROM posts WHERE path = ?",
+            (key,)).fetchone()
+        return self._row_info(row) if row else None
+
+    @staticmethod
+    def _validate(key: str, cached: Optional[PostInfo]) -> Tuple[PostInfo, bool]:
+        # 返回 (info, 是否新解析)。不访问数据库，可以在工作线程中调用
+        st = os.stat(key)
+        if cached and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+            return (cached, False)
+        return (parse_post(key, st), True)
+
+    def _lookup(self, key: str) -> Tuple[PostInfo, bool]:
+        return self._validate(key, self._cached(key))
+
+    def _store(self, info: PostInfo) -> None:
+        if self.preload:
+            self._rows[info.path] = info
+        self._dirty[info.path] = info
+        if not self.preload and len(self._dirty) >= FLUSH_EVERY:
+            self.flush()
+
+    def get(self, path) -> PostInfo:
+        """返回文件的 PostInfo。读取或解码失败时抛出 OSError / UnicodeDecodeError。"""
+        info, fresh = self._lookup(os.path.abspath(path))
+        if fresh:
+            self._store(info)
+        return info
+
+    def content_hash(self, path) -> str:
+        """返回文件内容的 sha1，同一 stat 下只计算一次。"""
+        info = self.get(path)
+        if info.sha1 is None:
+            info = info._replace(sha1=file_sha1(info.path))
+            self._store(info)
+        return info.sha1
+
+    def scan(self, paths: Iterable, jobs: int = 1) -> List[Tuple[str, Optional[PostInfo], Optional[Exception]]]:
+        """对每个路径调用 get()，返回 (path, info, error) 列表，出错的文件 info 为 None。
+        jobs > 1 时 stat 与头部解析在线程池中进行，结果顺序与 paths 一致。
+        """
+        return list(self.iter_scan(paths, jobs))
+
+    def iter_scan(self, paths: Iterable, jobs: int = 1) -> Iterator[Tuple[str, Optional[PostInfo], Optional[Exception]]]:
+        """scan() 的生成器版本：paths 可以是生成器（例如 walk_posts），结果按输入顺序逐个产出。"""
+        def items():
+            # 在主线程中取缓存记录，工作线程只做 stat 与解析
+            for p in paths:
+                key = os.path.abspath(p)
+                yield (p, key, self._cached(key))
+
+        def work(item):
+            p, key, cached = item
+            try:
+                return (p,) + self._validate(key, cached) + (None,)
+            except (OSError, UnicodeDecodeError) as e:
+                return (p, None, False, e)
+
+        for p, info, fresh, err in imap_ordered(work, items(), jobs):
+            if fresh:
+                self._store(info)
+            elif info is not None:
+                instrument.count('catalog_hits')
+            instrument.count('files_scanned')
+            yield (p, info, err)
+
+    def forget(self, path) -> None:
+        key = os.path.abspath(path)
+        self._rows.pop(key, None)
+        self._dirty.pop(key, None)
+        self.conn.execute("DELETE FROM posts WHERE path = ?", (key,))
+
+    def prune(self, root) -> int:
+        """删除 root 之下已不存在的文件的记录，返回删除条数。"""
+        prefix = os.path.join(os.path.abspath(root), '')
+        if self.preload:
+            keys: Iterable[str] = list(self._rows)
+        else:
+            keys = (row[0] for row in self.conn.execute(
+                "SELECT path FROM posts WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)))
+        gone = [k for k in keys if k.startswith(prefix) and not os.path.exists(k)]
+        for k in gone:
+            self.forget(k)
+        return len(gone)
+
+    def flush(self) -> None:
+        if self._dirty:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(i.path, i.mtime_ns, i.size, i.sha1, int(i.has_fm),
+                  json.dumps(i.fields, ensure_ascii=False), i.body_offset)
+                 for i in self._dirty.values()])
+            self._dirty.clear()
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻的 git 子进程，避免每次查询都重新启动 git。
+
+ - `git cat-file --batch`：按 `<rev>:<path>` 或提交哈希读取 blob / commit 对象
+ - `git diff-tree --stdin -p -M --root`：按提交输出补丁。请求之后写入一行非哈希的
+   哨兵，diff-tree 会把它原样回显并刷新输出，据此判断一次请求的输出在哪里结束。
+   pathspec 只能在启动时指定，所以按路径组合保留最近用过的几个进程
+   （交互模式下同一篇文章的多次 v 操作复用同一个进程）
+ - `remote_url(name)`：`git remote get-url` 的结果（已应用 url.<base>.insteadOf），每个远程只查询一次；
+   不指定远程时依次取当前分支的上游远程、origin、第一个远程
+
+`get_pool(repo_root)` 返回当前进程共享的 `GitPool`，进程退出时关闭子进程。
+在进程池的 worker 里调用时，每个 worker 各自持有一组子进程。
+"""
+
+from __future__ import annotations
+import atexit
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import instrument
+
+SENTINEL = b'--git-pool-end-of-request--'
+DIFF_PROCESSES = 4
+DIFF_ARGS = ['diff-tree', '--stdin', '-p', '-M', '--root', '--no-commit-id']
+
+
+class CommitInfo(NamedTuple):
+    hash: str
+    parents: Tuple[str, ...]
+    committer_date: str  # 与 `git log --format=%ci` 相同
+    subject: str
+    body: str
+
+
+class GitPoolError(Exception):
+    """常驻 git 进程意外退出或输出无法解析。"""
+
+
+def _format_git_date(stamp: str, tz: str) -> str:
+    sign = -1 if tz.startswith('-') else 1
+    offset = timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5])) * sign
+    dt = datetime.fromtimestamp(int(stamp), timezone(offset))
+    return dt.strftime('%Y-%m-%d %H:%M:%S ') + tz
+
+
+def parse_commit(oid: str, data: bytes) -> CommitInfo:
+    text = data.decode('utf-8', errors='replace')
+    head, _, message = text.partition('\n\n')
+    parents: List[str] = []
+    date = ''
+    for line in head.split('\n'):
+        if line.startswith(' '):
+            # 多行头部（gpgsig、mergetag）的续行
+            continue
+        key, _, value = line.partition(' ')
+        if key == 'parent':
+            parents.append(value)
+        elif key == 'committer':
+            stamp, tz = value.rsplit(' ', 2)[-2:]
+            date = _format_git_date(stamp, tz)
+    subject, _, body = message.strip('\n').partition('\n\n')
+    return CommitInfo(oid, tuple(parents), date, ' '.join(subject.split('\n')), body.strip('\n'))
+
+
+def filter_patch(patch: str, paths) -> str:
+    """只保留 patch 中涉及 paths（新旧路径任一匹配）的文件段。"""
+    wanted = set(paths)
+    out: List[str] = []
+    keep = False
+    for line in patch.splitlines(keepends=True):
+        if line.startswith('diff --git '):
+            names = line[len('diff --git '):].rstrip('\n')
+            # "a/<old> b/<new>"，路径里含空格时按 " b/" 切分
+            old, sep, new = names.partition(' b/')
+            keep = bool(sep) and (old[2:] in wanted or new in wanted)
+        if keep:
+            out.append(line)
+    return ''.join(out)
+
+
+class _Batch:
+    """一个常驻的 git 子进程，stdin / stdout 都是二进制管道。"""
+
+    def __init__(self, repo_root: str, args: List[str]):
+        self.cmd = ['git', '-c', 'core.quotePath=false'] + args
+        self.repo_root = repo_root
+        self.proc: Optional[subprocess.Popen] = None
+
+    def ensure(self) -> subprocess.Popen:
+        if self.proc is None or self.proc.poll() is not None:
+            self.proc = subprocess.Popen(self.cmd, cwd=self.repo_root, stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            instrument.count('git_processes')
+        return self.proc
+
+    def send(self, line: bytes) -> None:
+        proc = self.ensure()
+        try:
+            proc.stdin.write(line + b'\n')
+            proc.stdin.flush()
+        except BrokenPipeError as e:
+            self.proc = None
+            raise GitPoolError(f"git 进程已退出：{' '.join(self.cmd)}") from e
+
+    def readline(self) -> bytes:
+        line = self.proc.stdout.readline()
+        if not line:
+            self.proc = None
+            raise GitPoolError(f"git 进程已退出：{' '.join(self.cmd)}")
+        return line
+
+    def close(self) -> None:
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.stdin.close()
+            self.proc.wait()
+        self.proc = None
+
+
+class GitPool:
+    def __init__(self, repo_root: str):
+        self.repo_root = repo_root
+        # fork 出来的子进程不能复用父进程的管道
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._cat = _Batch(repo_root, ['cat-file', '--batch'])
+        self._diffs: 'OrderedDict[Tuple[str, ...], _Batch]' = OrderedDict()
+        self._remotes: Dict[Optional[str], Optional[str]] = {}
+
+    def cat(self, spec: str) -> Optional[Tuple[str, str, bytes]]:
+        """读取一个对象，返回 (oid, type, data)；对象不存在时返回 None。"""
+        if '\n' in spec:
+            return None
+        with self._lock, instrument.timed('git_seconds'):
+            instrument.count('git_requests')
+            self._cat.send(spec.encode('utf-8'))
+            header = self._cat.readline().rstrip(b'\n').rsplit(b' ', 2)
+            # "<spec> missing" 或 "<spec> ambiguous"，spec 本身可能含有空格
+            if header[-1] in (b'missing', b'ambiguous') or len(header) != 3 or not header[2].isdigit():
+                return None
+            oid, kind, size = header[0].decode(), header[1].decode(), int(header[2])
+            data = self._cat.proc.stdout.read(size)
+            self._cat.proc.stdout.read(1)  # 结尾的换行
+        return (oid, kind, data)
+
+    def blob_text(self, rev: str, rel_path: str) -> Optional[str]:
+        obj = self.cat(f'{rev}:{rel_path}')
+        if obj is None or obj[1] != 'blob':
+            return None
+        return obj[2].decode('utf-8', errors='replace')
+
+    def commit(self, rev: str) -> Optional[CommitInfo]:
+        obj = self.cat(rev)
+        if obj is None or obj[1] != 'commit':
+            return None
+        return parse_commit(obj[0], obj[2])
+
+    def _diff_batch(self, paths: Tuple[str, ...]) -> _Batch:
+        batch = self._diffs.pop(paths, None)
+        if batch is None:
+            batch = _Batch(self.repo_root, DIFF_ARGS + (['--'] + list(paths) if paths else []))
+            if len(self._diffs) >= DIFF_PROCESSES:
+                self._diffs.popitem(last=False)[1].close()
+        self._diffs[paths] = batch
+        return batch
+
+    def patch(self, commit_hash: str, paths=()) -> str:
+        """提交相对第一个父提交的补丁（根提交相对空树），给出 paths 时只包含这些路径。"""
+        with self._lock, instrument.timed('git_seconds'):
+            instrument.count('git_requests')
+            batch = self._diff_batch(tuple(sorted(set(paths))))
+            batch.send(commit_hash.encode('ascii', errors='replace'))
+            batch.send(SENTINEL)
+            lines = []
+            while True:
+                line = batch.readline()
+                if line.rstrip(b'\n') == SENTINEL:
+                    break
+                lines.append(line)
+        return b''.join(lines).decode('utf-8', errors='replace')
+
+    def file_patch(self, commit_hash: str, paths) -> str:
+        # pathspec 会匹配目录前缀，这里再按完整路径过滤一次
+        return filter_patch(self.patch(commit_hash, paths), paths)
+
+    def _git_text(self, *args: str) -> Optional[str]:
+        try:
+            out = instrument.check_output(['git', *args], cwd=self.repo_root, stderr=subprocess.DEVNULL)
+        except subprocess.CalledProcessError:
+            return None
+        return out.decode('utf-8', errors='replace').strip() or None
+
+    def default_remote(self) -> Optional[str]:
+        """当前分支的上游远程；没有上游时取 origin，没有 origin 时取第一个远程。"""
+        upstream = self._git_text('rev-parse', '--abbrev-ref', '--symbolic-full-name', '@{upstream}')
+        remotes = (self._git_text('remote') or '').split()
+        if upstream:
+            for name in remotes:
+                if upstream.startswith(name + '/'):
+                    return name
+        if 'origin' in remotes:
+            return 'origin'
+        return remotes[0] if remotes else None
+
+    def remote_url(self, name: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            if name not in self._remotes:
+                remote = name or self.default_remote()
+                self._remotes[name] = self._git_text('remote', 'get-url', remote) if remote else None
+            return self._remotes[name]
+
+    def close(self) -> None:
+        with self._lock:
+            self._cat.close()
+            for batch in self._diffs.values():
+                batch.close()
+            self._diffs.clear()
+
+
+_pools: Dict[str, GitPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(repo_root: str) -> GitPool:
+    with _pools_lock:
+        pool = _pools.get(repo_root)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[repo_root] = GitPool(repo_root)
+        return pool
+
+
+@atexit.register
+def close_all() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            if pool.pid == os.getpid():
+                pool.close()
+        _pools.clear()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任意文件（图片等资源）的内容哈希缓存。
+
+与 `PostCatalog` 相同的思路：SQLite 表以 path + mtime + size 为键保存 sha1，stat 没变的文件
+不再读取。`hash_many` 在线程池中并行计算，结果按输入顺序返回。
+
+缓存默认位于 tools/.cache/hashes.sqlite3，删除该文件即可强制全部重新计算。
+"""
+
+from __future__ import annotations
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import instrument
+from front_matter import DEFAULT_CACHE_DIR, file_sha1
+from parallel import map_ordered
+
+HASH_CACHE_VERSION = 1
+
+
+class FileHash(NamedTuple):
+    path: str
+    mtime_ns: int
+    size: int
+    sha1: str
+
+
+class HashCache:
+    """用法：
+        with HashCache() as cache:
+            sha1 = cache.hash(path)
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path else DEFAULT_CACHE_DIR / 'hashes.sqlite3'
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        (version,) = self.conn.execute("PRAGMA user_version").fetchone()
+        if version != HASH_CACHE_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS hashes")
+            self.conn.execute(f"PRAGMA user_version = {HASH_CACHE_VERSION}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, sha1 TEXT)")
+        self._rows: Dict[str, FileHash] = {
+            row[0]: FileHash(*row)
+            for row in self.conn.execute("SELECT path, mtime_ns, size, sha1 FROM hashes")}
+        self._dirty: Dict[str, FileHash] = {}
+
+    def __enter__(self) -> 'HashCache':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _lookup(self, key: str) -> Tuple[FileHash, bool]:
+        # 返回 (记录, 是否新计算)。只读取 self._rows，可以在工作线程中调用
+        st = os.stat(key)
+        cached = self._rows.get(key)
+        if cached and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+            return (cached, False)
+        return (FileHash(key, st.st_mtime_ns, st.st_size, file_sha1(key)), True)
+
+    def _store(self, rec: FileHash) -> None:
+        self._rows[rec.path] = rec
+        self._dirty[rec.path] = rec
+
+    def get(self, path) -> FileHash:
+        rec, fresh = self._lookup(os.path.abspath(path))
+        if fresh:
+            self._store(rec)
+        return rec
+
+    def hash(self, path) -> str:
+        return self.get(path).sha1
+
+    def hash_many(self, paths: Iterable, jobs: int = 1) -> List[Tuple[str, Optional[FileHash], Optional[Exception]]]:
+        """返回 (path, 记录, error) 列表，顺序与 paths 一致；出错的文件记录为 None。"""
+        paths = list(paths)
+
+        def work(p):
+            try:
+                return self._lookup(os.path.abspath(p)) + (None,)
+            except OSError as e:
+                return (None, False, e)
+
+        results = []
+        for p, (rec, fresh, err) in zip(paths, map_ordered(work, paths, jobs)):
+            if fresh:
+                self._store(rec)
+            elif rec is not None:
+                instrument.count('hash_cache_hits')
+            results.append((p, rec, err))
+        return results
+
+    def forget(self, path) -> None:
+        key = os.path.abspath(path)
+        self._rows.pop(key, None)
+        self._dirty.pop(key, None)
+        self.conn.execute("DELETE FROM hashes WHERE path = ?", (key,))
+
+    def prune(self, root) -> int:
+        """删除 root 之下已不存在的文件的记录，返回删除条数。"""
+        prefix = os.path.join(os.path.abspath(root), '')
+        gone = [k for k in self._rows if k.startswith(prefix) and not os.path.exists(k)]
+        for k in gone:
+            self.forget(k)
+        return len(gone)
+
+    def flush(self) -> None:
+        if self._dirty:
+            self.conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+                                  [tuple(r) for r in self._dirty.values()])
+            self._dirty.clear()
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+`--since` 增量模式：只处理自某个提交以来变化过的文章。
+
+ - `--since REV`：处理 REV 与工作区之间有差异的文章（含未提交的修改与未跟踪的新文件）
+ - `--since`（不带参数）：从状态文件读取该工具上次成功运行时的 HEAD；没有记录时处理全部文章
+ - 资源文件夹里的文件变化时，算作同名文章变化
+ - 运行成功（实际写入）后由工具调用 `record`，把当前 HEAD 写入状态文件
+
+状态文件默认为 tools/.cache/since_state.json，内容为 {工具名: 提交哈希}。
+"""
+
+from __future__ import annotations
+import json
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Set
+
+import instrument
+from front_matter import DEFAULT_CACHE_DIR
+
+DEFAULT_STATE = DEFAULT_CACHE_DIR / 'since_state.json'
+LAST = 'last'
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument('--since', nargs='?', const=LAST, default=None, metavar='REV',
+                        help='只处理自 REV 以来变化的文章；不给 REV 时使用上次运行记录的提交')
+    parser.add_argument('--since-state', default=str(DEFAULT_STATE), help='--since 状态文件路径')
+
+
+def _git(repo_root: Path, *args: str) -> bytes:
+    return instrument.check_output(['git', '-c', 'core.quotePath=false'] + list(args),
+                                   cwd=str(repo_root), stderr=subprocess.DEVNULL)
+
+
+def repo_root_of(path: Path) -> Optional[Path]:
+    try:
+        return Path(_git(path, 'rev-parse', '--show-toplevel').decode('utf-8').strip())
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def _load_state(state_path: Path) -> dict:
+    try:
+        return json.loads(Path(state_path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def resolve_since(since: Optional[str], tool: str, state_path: Path) -> Optional[str]:
+    """把 --since 的值解析为提交；未启用或没有记录时返回 None（处理全部文章）。"""
+    if since is None:
+        return None
+    if since == LAST:
+        rev = _load_state(state_path).get(tool)
+        if not rev:
+            print(f"没有 {tool} 的运行记录，处理全部文章。")
+        return rev
+    return since
+
+
+def changed_files(repo_root: Path, since: str, under: Path) -> List[Path]:
+    """since 与工作区之间有差异的文件，加上未跟踪的文件，限定在 under 目录下。"""
+    rel = under.resolve().relative_to(repo_root.resolve()).as_posix() or '.'
+    out = _git(repo_root, 'diff', '--name-only', '--no-renames', '-z', since, '--', rel)
+    out += _git(repo_root, 'ls-files', '--others', '--exclude-standard', '-z', '--', rel)
+    names = {n for n in out.decode('utf-8', errors='replace').split('\0') if n}
+    return sorted(repo_root / n for n in names)
+
+
+def post_for(path: Path, posts_dir: Path) -> Optional[Path]:
+    """文件所属的文章：资源文件夹里的文件对应同名 md，其余 md 文件就是文章本身。"""
+    for parent in path.parents:
+        if parent == posts_dir or posts_dir not in parent.parents:
+            break
+        md = parent.with_name(parent.name + '.md')
+        if md.is_file():
+            return md
+    return path if path.suffix.lower() == '.md' else None
+
+
+def changed_posts(posts_dir: Path, since: str) -> Set[Path]:
+    """自 since 以来变化过、且仍然存在的文章路径（已 resolve）。"""
+    posts_dir = posts_dir.resolve()
+    repo_root = repo_root_of(posts_dir)
+    if repo_root is None:
+        raise ValueError(f"{posts_dir} 不在 git 仓库中")
+    try:
+        files = changed_files(repo_root, since, posts_dir)
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"无法比较 {since} 与工作区：{e}") from e
+    posts: Set[Path] = set()
+    for f in files:
+        md = post_for(f, posts_dir)
+        if md is not None and md.is_file():
+            posts.add(md)
+    instrument.count('since_changed_posts', len(posts))
+    return posts
+
+
+def touches(posts_dir: Path, since: str, path: Path) -> bool:
+    """path 自 since 以来是否变化过（用于 _redirects 这类决定是否需要全量处理的文件）。"""
+    repo_root = repo_root_of(posts_dir.resolve())
+    if repo_root is None:
+        return True
+    try:
+        rel = path.resolve().relative_to(repo_root.resolve()).as_posix()
+        out = _git(repo_root, 'diff', '--name-only', since, '--', rel)
+        out += _git(repo_root, 'ls-files', '--others', '--exclude-standard', '--', rel)
+    except (ValueError, subprocess.CalledProcessError):
+        return True
+    return bool(out.strip())
+
+
+def record(tool: str, posts_dir: Path, state_path: Path) -> None:
+    """记录当前 HEAD，下次 `--since` 不带参数时从这里开始。"""
+    repo_root = repo_root_of(posts_dir.resolve())
+    if repo_root is None:
+        return
+    try:
+        head = _git(repo_root, 'rev-parse', '--verify', 'HEAD').decode().strip()
+    except subprocess.CalledProcessError:
+        return
+    state = _load_state(state_path)
+    state[tool] = head
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps(state, indent=2) + '\n', encoding='utf-8')
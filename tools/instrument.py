@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文章工具共用的统计与性能分析。
+
+ - `count(name, n)`：累加计数器，例如 files_scanned、bytes_read、writes
+ - `timed(name)`：累计某类操作的耗时，例如 parse
+ - `phase(name)`：记录一个执行阶段（scan、plan、write ...）的耗时
+ - `check_output(cmd, ...)`：subprocess.check_output 的替代，统计 git 子进程数量与累计延迟
+ - `session(args, tool)`：包裹一次工具运行，结束时按 --stats 输出 JSON 报告，
+   按 --profile 用 cProfile 记录并导出结果
+
+计数器在线程池中也可以安全地累加。
+"""
+
+from __future__ import annotations
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+DEFAULT_PROFILE_DIR = Path(__file__).resolve().parent / '.cache'
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = defaultdict(int)
+_timers: Dict[str, float] = defaultdict(float)
+_phases: Dict[str, float] = {}
+
+
+def count(name: str, n: int = 1) -> None:
+    with _lock:
+        _counters[name] += n
+
+
+def add_time(name: str, seconds: float) -> None:
+    with _lock:
+        _timers[name] += seconds
+
+
+@contextlib.contextmanager
+def timed(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """记录一个阶段的耗时，同名阶段多次进入时累加。"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _phases[name] = _phases.get(name, 0.0) + elapsed
+
+
+def check_output(cmd, **kwargs) -> bytes:
+    """与 subprocess.check_output 相同，额外统计子进程数量与耗时（按命令名分类，如 git）。"""
+    name = Path(cmd[0]).name
+    start = time.perf_counter()
+    try:
+        return subprocess.check_output(cmd, **kwargs)
+    finally:
+        add_time(f'{name}_seconds', time.perf_counter() - start)
+        count(f'{name}_processes')
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+        _phases.clear()
+
+
+def report(tool: str, wall_time: float) -> Dict:
+    with _lock:
+        return {
+            'tool': tool,
+            'wall_seconds': round(wall_time, 6),
+            'phases': {k: round(v, 6) for k, v in _phases.items()},
+            'counters': dict(sorted(_counters.items())),
+            'timers': {k: round(v, 6) for k, v in sorted(_timers.items())},
+        }
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument('--stats', nargs='?', const='-', default=None, metavar='FILE',
+                        help='运行结束后输出 JSON 统计报告到 FILE（不给路径则输出到 stderr）')
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='FILE',
+                        help='用 cProfile 记录本次运行并导出到 FILE（默认 tools/.cache/<tool>.prof）')
+
+
+@contextlib.contextmanager
+def session(args, tool: str) -> Iterator[None]:
+    """包裹一次工具运行。未指定 --stats / --profile 时几乎没有额外开销。"""
+    stats_target: Optional[str] = getattr(args, 'stats', None)
+    profile_target: Optional[str] = getattr(args, 'profile', None)
+    profiler = cProfile.Profile() if profile_target is not None else None
+    reset()
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        wall = time.perf_counter() - start
+        if profiler:
+            out = Path(profile_target) if profile_target else DEFAULT_PROFILE_DIR / f'{tool}.prof'
+            out.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(out))
+            buf = io.StringIO()
+            pstats.Stats(profiler, stream=buf).sort_stats('cumulative').print_stats(20)
+            print(buf.getvalue(), file=sys.stderr)
+            print(f'profile written to {out}', file=sys.stderr)
+        if stats_target is not None:
+            text = json.dumps(report(tool, wall), ensure_ascii=False, indent=2)
+            if stats_target == '-':
+                print(text, file=sys.stderr)
+            else:
+                Path(stats_target).write_text(text + '\n', encoding='utf-8')
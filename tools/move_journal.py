@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+带预写日志（write-ahead journal）的批量移动，供 rename_posts_by_date.py 使用。
+
+执行流程：
+ 1. 一次性创建所有目标父目录
+ 2. 把全部移动操作写入日志并 fsync
+ 3. 逐个执行移动，开始前记录源的签名，完成后追加一条完成记录
+ 4. 全部完成后删除日志
+
+中途被打断时日志会保留下来，可以 `resume`（继续执行剩余操作）或 `rollback`（按相反顺序撤销已完成的操作，
+包括已经开始、在磁盘上可能已经完成的那一个）。
+跨文件系统的移动走“复制到目标旁的临时名 -> rename 替换 -> 删除源”，目标位置不会出现半拷贝的目录。
+
+日志为 JSON Lines：第一行 {"ops": [{"src", "dst"}, ...]}，每个操作开始前追加 {"start": 序号, "sig": 源的签名}，
+完成后追加 {"done": 序号}（回滚时为 {"undone": 序号}）。签名由源中每个文件的相对路径与大小计算。
+恢复时目标与源同时存在，只有该操作已经开始、且目标的签名与记录一致（跨文件系统移动停在删除源这一步）
+才会删除源，否则抛出 JournalError，不动任何文件。
+"""
+
+from __future__ import annotations
+import errno
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set
+
+import instrument
+
+TMP_SUFFIX = '.moving'
+
+
+class MoveOp(NamedTuple):
+    src: Path
+    dst: Path
+
+
+class JournalError(Exception):
+    """日志不存在、损坏，或者已有未完成的日志。"""
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _tmp_path(dst: Path) -> Path:
+    return dst.with_name(dst.name + TMP_SUFFIX)
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    elif path.exists() or path.is_symlink():
+        path.unlink()
+
+
+def signature(path: Path) -> str:
+    """文件或目录的签名：每个文件的相对路径与大小。rename 与复制都不会改变它。"""
+    h = hashlib.sha1()
+    if path.is_dir() and not path.is_symlink():
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                p = Path(root, name)
+                h.update(f"{p.relative_to(path).as_posix()}\0{p.lstat().st_size}\n".encode('utf-8'))
+    else:
+        h.update(f".\0{path.lstat().st_size}\n".encode('utf-8'))
+    return h.hexdigest()
+
+
+def move_path(src: Path, dst: Path) -> None:
+    """移动文件或目录。同一文件系统内直接 rename；跨文件系统时先复制到目标旁的临时名，
+    再 rename 到目标（同一文件系统内的原子操作），最后删除源。"""
+    try:
+        os.rename(src, dst)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    tmp = _tmp_path(dst)
+    if tmp.exists():
+        _remove(tmp)
+    if src.is_dir():
+        shutil.copytree(src, tmp, symlinks=True)
+    else:
+        shutil.copy2(src, tmp)
+    os.rename(tmp, dst)
+    _remove(src)
+
+
+def make_parents(ops: List[MoveOp]) -> None:
+    """一次性创建全部目标父目录，每个目录只创建一次。"""
+    parents: Set[Path] = {op.dst.parent for op in ops}
+    for parent in sorted(parents, key=lambda p: len(p.parts)):
+        parent.mkdir(parents=True, exist_ok=True)
+
+
+class MoveJournal:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load(self):
+        """返回 (ops, done_set, started)，started 为 {序号: 开始时源的签名}。"""
+        if not self.path.exists():
+            raise JournalError(f"没有找到日志：{self.path}")
+        ops: List[MoveOp] = []
+        done: Set[int] = set()
+        started: Dict[int, str] = {}
+        with open(self.path, encoding='utf-8') as f:
+            for n, ln in enumerate(f):
+                ln = ln.strip()
+                if not ln:
+                    continue
+                try:
+                    rec = json.loads(ln)
+                except ValueError:
+                    # 最后一行可能在写入时被打断，忽略
+                    continue
+                if n == 0:
+                    ops = [MoveOp(Path(o['src']), Path(o['dst'])) for o in rec['ops']]
+                elif 'start' in rec:
+                    started[rec['start']] = rec['sig']
+                elif 'done' in rec:
+                    done.add(rec['done'])
+                elif 'undone' in rec:
+                    done.discard(rec['undone'])
+                    started.pop(rec['undone'], None)
+        return (ops, done, started)
+
+    def begin(self, ops: List[MoveOp]) -> None:
+        if self.path.exists():
+            raise JournalError(f"存在未完成的日志：{self.path}，请先使用 --resume 或 --rollback")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'ops': [{'src': str(o.src), 'dst': str(o.dst)} for o in ops]},
+                               ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_dir(self.path.parent)
+
+    def _append(self, rec) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(rec) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def finish(self) -> None:
+        self.path.unlink()
+        _fsync_dir(self.path.parent)
+
+    def run(self, ops: List[MoveOp], done: Set[int] = frozenset(),
+            started: Optional[Dict[int, str]] = None) -> int:
+        """执行 ops 中尚未完成的操作，返回本次完成的数量。出错时抛出异常，日志保留以便恢复。"""
+        started = started or {}
+        count = 0
+        for i, op in enumerate(ops):
+            if i in done:
+                continue
+            tmp = _tmp_path(op.dst)
+            if tmp.exists():
+                # 上次跨文件系统复制到一半被打断
+                _remove(tmp)
+            if op.dst.exists():
+                # 目标存在时只接受一种情况：上次已经开始这个操作，目标就是当时的源。
+                # 源也还在则是跨文件系统移动停在了删除源这一步
+                if i not in started or signature(op.dst) != started[i]:
+                    raise JournalError(f"目标已存在且不是本日志移动过去的：{op.dst}，"
+                                       f"为避免覆盖或删除数据已停止，请手动处理后再继续")
+                if op.src.exists():
+                    if signature(op.src) != started[i]:
+                        raise JournalError(f"源在移动开始后被修改：{op.src}，为避免丢失数据已停止")
+                    _remove(op.src)
+            else:
+                self._append({'start': i, 'sig': signature(op.src)})
+                move_path(op.src, op.dst)
+                print(f"移动：{op.src} -> {op.dst}")
+                instrument.count('moves')
+                count += 1
+            self._append({'done': i})
+        return count
+
+    def execute(self, ops: List[MoveOp]) -> int:
+        make_parents(ops)
+        self.begin(ops)
+        count = self.run(ops)
+        self.finish()
+        return count
+
+    def resume(self) -> int:
+        ops, done, started = self.load()
+        make_parents([op for i, op in enumerate(ops) if i not in done])
+        count = self.run(ops, done, started)
+        self.finish()
+        return count
+
+    def rollback(self) -> int:
+        """按相反顺序撤销已完成的移动，返回撤销的数量。
+
+        已经开始但没有完成记录的操作可能已经在磁盘上完成，按记录的签名判断后一并撤销；
+        无法确认的操作会保留日志并抛出 JournalError，其余操作照常撤销。
+        """
+        ops, done, started = self.load()
+        count = 0
+        problems: List[str] = []
+        for i in sorted(done | set(started), reverse=True):
+            op = ops[i]
+            if i not in done:
+                sig = started[i]
+                if op.dst.exists() and op.src.exists():
+                    # 跨文件系统移动停在删除源这一步：目标是完整的副本，删除即可
+                    if signature(op.src) != sig or signature(op.dst) != sig:
+                        problems.append(f"源与目标同时存在且与记录不一致：{op.src} / {op.dst}")
+                        continue
+                    _remove(op.dst)
+                    print(f"撤销：删除 {op.dst}（源仍在原处）")
+                    count += 1
+                elif op.dst.exists():
+                    if signature(op.dst) != sig:
+                        problems.append(f"目标与移动开始时的源不一致：{op.dst}")
+                        continue
+                    op.src.parent.mkdir(parents=True, exist_ok=True)
+                    move_path(op.dst, op.src)
+                    print(f"撤销：{op.dst} -> {op.src}")
+                    count += 1
+                elif not op.src.exists():
+                    problems.append(f"源与目标都不存在：{op.src} -> {op.dst}")
+                    continue
+            elif op.dst.exists() and not op.src.exists():
+                op.src.parent.mkdir(parents=True, exist_ok=True)
+                move_path(op.dst, op.src)
+                print(f"撤销：{op.dst} -> {op.src}")
+                count += 1
+            self._append({'undone': i})
+        # 清理跨文件系统复制留下的临时目录
+        for op in ops:
+            tmp = _tmp_path(op.dst)
+            if tmp.exists():
+                _remove(tmp)
+        if problems:
+            raise JournalError(f"撤销了 {count} 个移动，以下操作无法确认，日志已保留，请手动处理：\n  "
+                               + '\n  '.join(problems))
+        self.finish()
+        return count
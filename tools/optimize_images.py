@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+为文章资源文件夹中的图片生成限制尺寸、重新编码的现代格式版本（WebP / AVIF），
+并可把原图重新压缩后替换。需要 Pillow（pip install Pillow）。
+
+用法：
+    python tools/optimize_images.py                       # 预览：统计每篇文章可节省的字节数
+    python tools/optimize_images.py --apply               # 在原图旁写入 <原文件名>.webp（如 foo.png.webp）
+    python tools/optimize_images.py --apply --formats webp,avif --max-width 1600
+    python tools/optimize_images.py --apply --replace     # 原图重新压缩后明显变小时替换原图
+
+支持选项：
+    --posts-dir 路径   指定 posts 目录，默认相对于项目：<root>/source/_posts
+    --apply            写入生成的文件（否则只做预览，编码结果仍会进入缓存）
+    --formats 列表     生成的现代格式，逗号分隔，默认 webp；Pillow 不支持的格式会被忽略
+    --max-width 像素   宽度上限，超过时等比缩小，默认 1920
+    --quality 数值     有损编码质量，默认 82
+    --replace          用同格式重新压缩（并限制尺寸）的结果替换原图，只在至少节省 --min-saving 时替换
+    --min-saving 比例  替换原图所需的最小节省比例，默认 0.1
+    --jobs N           编码使用的进程数，0 表示按 CPU 核心数
+    --stats [文件]     结束时输出 JSON 统计报告
+    --profile [文件]   用 cProfile 记录本次运行并导出结果
+
+生成的版本保留原扩展名再追加新扩展名，同一文件夹中的 foo.png 与 foo.jpg 不会互相覆盖；
+scripts/picture.js 在生成站点时把存在这些版本的 <img> 包进 <picture>，只有支持该格式的浏览器会下载它们。
+报告中的节省量按每张图片最小的版本计算，同时列出这些版本额外增加的部署体积。
+
+编码结果按“源文件内容哈希 + 参数”缓存在 tools/.cache/images/ 下，内容没变的图片不会重新编码；
+源文件哈希本身也有缓存（tools/.cache/hashes.sqlite3），未修改的文件不会重新读取。
+"""
+
+from __future__ import annotations
+import argparse
+import filecmp
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import instrument
+from front_matter import DEFAULT_CACHE_DIR
+from hash_cache import HashCache
+from incremental import post_for
+from parallel import add_jobs_argument, map_ordered
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow 是可选依赖，只有这个工具需要
+    Image = None
+    features = None
+
+SOURCE_SUFFIXES = ('.png', '.jpg', '.jpeg')
+MODERN_FORMATS = {'webp': 'WEBP', 'avif': 'AVIF'}
+SAME_FORMAT = {'.png': 'PNG', '.jpg': 'JPEG', '.jpeg': 'JPEG'}
+DEFAULT_OUTPUT_CACHE = DEFAULT_CACHE_DIR / 'images'
+
+
+class Job(NamedTuple):
+    src: str
+    sha1: str
+    # (输出名, Pillow 格式, 缓存文件路径)
+    outputs: Tuple[Tuple[str, str, str], ...]
+    max_width: int
+    quality: int
+
+
+def settings_key(fmt: str, max_width: int, quality: int) -> str:
+    return hashlib.sha1(json.dumps([fmt, max_width, quality]).encode()).hexdigest()[:8]
+
+
+def cache_path(cache_dir: Path, sha1: str, fmt: str, max_width: int, quality: int) -> Path:
+    ext = 'jpg' if fmt == 'JPEG' else fmt.lower()
+    return cache_dir / sha1[:2] / f"{sha1}-{settings_key(fmt, max_width, quality)}.{ext}"
+
+
+def encode_job(job: Job) -> Tuple[str, List[Tuple[str, int]], Optional[str]]:
+    """在工作进程中执行：打开一次源图，依次编码各个输出到缓存。返回 (src, [(输出名, 大小)], 错误)。"""
+    try:
+        with Image.open(job.src) as im:
+            im.load()
+            if im.width > job.max_width:
+                im = im.resize((job.max_width, round(im.height * job.max_width / im.width)),
+                               Image.LANCZOS)
+            results = []
+            for name, fmt, out in job.outputs:
+                frame = im
+                if fmt == 'JPEG' and frame.mode not in ('RGB', 'L'):
+                    frame = frame.convert('RGB')
+                params = {'optimize': True} if fmt in ('PNG', 'JPEG') else {}
+                if fmt != 'PNG':
+                    params['quality'] = job.quality
+                tmp = out + '.tmp'
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                frame.save(tmp, format=fmt, **params)
+                os.replace(tmp, out)
+                results.append((name, os.path.getsize(out)))
+        return (job.src, results, None)
+    except Exception as e:
+        return (job.src, [], str(e))
+
+
+def find_images(posts_dir: Path) -> List[Path]:
+    images = []
+    for dirpath, dirnames, filenames in os.walk(posts_dir):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for fn in filenames:
+            if fn.lower().endswith(SOURCE_SUFFIXES) and not fn.startswith('.'):
+                images.append(Path(dirpath) / fn)
+    return sorted(images)
+
+
+def supported_formats(names: List[str]) -> List[str]:
+    ok = []
+    for n in names:
+        if n not in MODERN_FORMATS:
+            print(f"忽略未知格式：{n}")
+        elif not features.check(n):
+            print(f"当前 Pillow 不支持 {n}，忽略")
+        else:
+            ok.append(n)
+    return ok
+
+
+def install(cached: Path, target: Path) -> bool:
+    """把缓存中的结果复制到 target，内容相同时跳过。返回是否写入。"""
+    if target.exists() and filecmp.cmp(cached, target, shallow=False):
+        return False
+    tmp = target.with_name(target.name + '.tmp')
+    shutil.copyfile(cached, tmp)
+    os.replace(tmp, target)
+    instrument.count('writes')
+    instrument.count('bytes_written', cached.stat().st_size)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts-dir', '-d', default=None,
+                        help='posts 目录路径，默认相对于项目：<root>/source/_posts')
+    parser.add_argument('--apply', action='store_true', help='写入生成的文件（否则只做预览）')
+    parser.add_argument('--formats', default='webp', help='生成的格式，逗号分隔：webp,avif')
+    parser.add_argument('--max-width', type=int, default=1920, help='宽度上限（像素）')
+    parser.add_argument('--quality', type=int, default=82, help='有损编码质量')
+    parser.add_argument('--replace', action='store_true', help='重新压缩后明显变小时替换原图')
+    parser.add_argument('--min-saving', type=float, default=0.1, help='替换原图所需的最小节省比例')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_OUTPUT_CACHE), help='编码结果缓存目录')
+    add_jobs_argument(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    with instrument.session(args, 'optimize_images'):
+        run(args)
+
+
+def run(args):
+    if Image is None:
+        print("错误：需要 Pillow，请先安装：pip install Pillow")
+        sys.exit(2)
+    script_dir = Path(__file__).resolve().parent
+    default_posts = script_dir.parent / 'source' / '_posts'
+    posts_dir = Path(args.posts_dir).resolve() if args.posts_dir else default_posts.resolve()
+    if not posts_dir.is_dir():
+        print(f"错误：posts 目录不存在：{posts_dir}")
+        sys.exit(2)
+    formats = supported_formats([f.strip().lower() for f in args.formats.split(',') if f.strip()])
+    cache_dir = Path(args.cache_dir)
+    # 替换过的原图：替换后的哈希 -> 最初的哈希。之后不再压缩它，现代格式也继续按最初的内容取缓存
+    replaced_log = cache_dir / 'replaced.json'
+    try:
+        replaced: Dict[str, str] = json.loads(replaced_log.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        replaced = {}
+
+    with instrument.phase('scan'):
+        images = find_images(posts_dir)
+    print(f"在 {posts_dir} 下找到 {len(images)} 张图片。")
+
+    with HashCache() as hashes:
+        hashes.prune(posts_dir)
+        with instrument.phase('hash'):
+            hashed = hashes.hash_many(images, args.jobs)
+
+        # 每张图片的输出：(输出名, Pillow 格式, 缓存路径, 目标路径)
+        plans: Dict[Path, List[Tuple[str, str, Path, Path]]] = {}
+        jobs: List[Job] = []
+        sources: Dict[Path, str] = {}
+        for p, rec, err in hashed:
+            if err is not None:
+                print(f"读取失败，跳过：{p}，原因：{err}")
+                continue
+            src = Path(p)
+            base = replaced.get(rec.sha1, rec.sha1)
+            outputs = [(name, MODERN_FORMATS[name], cache_path(cache_dir, base, MODERN_FORMATS[name],
+                                                                 args.max_width, args.quality),
+                        src.with_name(f"{src.name}.{name}"))
+                       for name in formats]
+            if args.replace and rec.sha1 not in replaced:
+                fmt = SAME_FORMAT[src.suffix.lower()]
+                outputs.append(('replace', fmt, cache_path(cache_dir, base, fmt, args.max_width, args.quality), src))
+            plans[src] = outputs
+            sources[src] = base
+            missing = tuple((name, fmt, str(cp)) for name, fmt, cp, _ in outputs if not cp.exists())
+            if missing:
+                jobs.append(Job(str(src), rec.sha1, missing, args.max_width, args.quality))
+            instrument.count('image_cache_hits', len(outputs) - len(missing))
+
+        print(f"需要编码 {len(jobs)} 张图片，其余命中缓存。")
+        with instrument.phase('encode'):
+            for src, results, err in map_ordered(encode_job, jobs, args.jobs, processes=True):
+                if err is not None:
+                    print(f"编码失败：{Path(src).relative_to(posts_dir)}，原因：{err}")
+                instrument.count('images_encoded', len(results))
+
+        # 汇总每篇文章的节省量，--apply 时写入
+        per_post: Dict[str, List[int]] = {}  # 文章 -> [原始字节, 优化后字节]
+        extra = 0  # 现代格式版本增加的部署体积
+        with instrument.phase('write' if args.apply else 'plan'):
+            for src, outputs in plans.items():
+                original = src.stat().st_size
+                best = original
+                for name, fmt, cp, target in outputs:
+                    if not cp.exists():
+                        continue
+                    size = cp.stat().st_size
+                    if name == 'replace':
+                        if size > original * (1 - args.min_saving):
+                            continue
+                        if args.apply and install(cp, target):
+                            replaced[hashes.get(target).sha1] = sources[src]
+                    else:
+                        extra += size
+                        if args.apply:
+                            install(cp, target)
+                    best = min(best, size)
+                md = post_for(src, posts_dir)
+                key = str(md.relative_to(posts_dir)) if md else str(src.parent.relative_to(posts_dir))
+                acc = per_post.setdefault(key, [0, 0])
+                acc[0] += original
+                acc[1] += best
+
+    if args.apply and args.replace:
+        replaced_log.parent.mkdir(parents=True, exist_ok=True)
+        replaced_log.write_text(json.dumps(replaced, indent=0, sort_keys=True) + '\n', encoding='utf-8')
+
+    total_before = sum(v[0] for v in per_post.values())
+    total_after = sum(v[1] for v in per_post.values())
+    print('\n每篇文章（按节省字节排序）：')
+    for key, (before, after) in sorted(per_post.items(), key=lambda kv: kv[1][1] - kv[1][0]):
+        if before > after:
+            print(f"  {before - after:>10} 字节  {before / 1024:8.1f} KB -> {after / 1024:8.1f} KB  {key}")
+    print(f"\n合计：{total_before / 1024 / 1024:.2f} MB -> {total_after / 1024 / 1024:.2f} MB，"
+          f"支持的浏览器节省 {(total_before - total_after) / 1024 / 1024:.2f} MB（按每张图片最小的版本计算）。")
+    if extra:
+        print(f"生成的 {', '.join(formats)} 版本与原图一起部署，额外占用 {extra / 1024 / 1024:.2f} MB。")
+    if not args.apply:
+        print('这是预览（dry-run）。要写入生成的文件请使用 --apply 参数。')
+
+
+if __name__ == '__main__':
+    main()
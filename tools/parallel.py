@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文章工具共用的并行执行辅助。
+
+ - 文件读取、front-matter 解析这类 I/O 任务使用线程池
+ - git 调用使用进程池（任务函数与参数必须可以 pickle）
+ - 结果始终按输入顺序返回，保证输出与串行执行一致
+ - `imap_ordered` 是惰性版本：按需从 items 取任务，同时在途的任务数有上限，适合流式处理大量文件
+"""
+
+from __future__ import annotations
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def resolve_jobs(jobs: int) -> int:
+    """把 --jobs 参数转为实际的并发数：0 或负数表示使用全部 CPU 核心。"""
+    if jobs is None or jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def add_jobs_argument(parser, help_text: str = '并发数，0 表示按 CPU 核心数，默认 1（串行）') -> None:
+    parser.add_argument('--jobs', '-j', type=int, default=1, help=help_text)
+
+
+def map_ordered(func: Callable[[T], R], items: Iterable[T], jobs: int = 1,
+                processes: bool = False) -> List[R]:
+    """对 items 逐个调用 func，按输入顺序返回结果列表。
+    jobs <= 1 或只有一个任务时直接串行执行，不创建任何池。
+    """
+    items = list(items)
+    jobs = resolve_jobs(jobs)
+    if jobs <= 1 or len(items) <= 1:
+        return [func(it) for it in items]
+    workers = min(jobs, len(items))
+    pool: Executor
+    if processes:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        # 进程间传输有开销，按块分发
+        chunksize = max(1, len(items) // (workers * 4))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        chunksize = 1
+    with pool:
+        return list(pool.map(func, items, chunksize=chunksize))
+
+
+def imap_ordered(func: Callable[[T], R], items: Iterable[T], jobs: int = 1,
+                 processes: bool = False, window: Optional[int] = None) -> Iterator[R]:
+    """map_ordered 的生成器版本：items 可以是生成器，按输入顺序逐个产出结果。
+    最多有 window（默认 jobs * 4）个任务同时在途，内存占用与任务总数无关。
+    """
+    jobs = resolve_jobs(jobs)
+    if jobs <= 1:
+        for it in items:
+            yield func(it)
+        return
+    window = window or jobs * 4
+    pool: Executor = ProcessPoolExecutor(max_workers=jobs) if processes else ThreadPoolExecutor(max_workers=jobs)
+    with pool:
+        pending: Deque = deque()
+        for it in items:
+            pending.append(pool.submit(func, it))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
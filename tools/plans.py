@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+可序列化的执行计划：`--plan-out plan.json` 写出，`--apply-plan plan.json` 读入执行。
+
+计划文件格式：
+    {
+      "tool": "rename_posts_by_date",   # 生成计划的工具，apply 时校验
+      "version": 1,
+      "posts_dir": "/abs/path/source/_posts",
+      "entries": [ {...}, ... ]         # 每个工具自己的条目，路径相对于 posts_dir，
+                                        # 并带有生成计划时源文件的内容哈希 "sha1"
+    }
+
+应用计划时不重新扫描语料，只对条目涉及的文件计算哈希，不一致的条目跳过。
+"""
+
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PLAN_VERSION = 1
+
+
+class PlanError(Exception):
+    """计划文件无法读取，或不是当前工具生成的。"""
+
+
+def write_plan(path, tool: str, posts_dir: Path, entries: List[Dict]) -> None:
+    data = {
+        'tool': tool,
+        'version': PLAN_VERSION,
+        'posts_dir': str(posts_dir),
+        'entries': entries,
+    }
+    Path(path).write_text(json.dumps(data, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+
+def read_plan(path, tool: str) -> Tuple[Path, List[Dict]]:
+    """读取计划文件，返回 (posts_dir, entries)。"""
+    try:
+        data = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError) as e:
+        raise PlanError(f"无法读取计划文件 {path}：{e}") from e
+    if data.get('tool') != tool:
+        raise PlanError(f"计划文件由 {data.get('tool')} 生成，不能用于 {tool}")
+    if data.get('version') != PLAN_VERSION:
+        raise PlanError(f"不支持的计划文件版本：{data.get('version')}")
+    return (Path(data['posts_dir']), data['entries'])
@@ -11,69 +11,101 @@
 
 支持选项：
     --posts-dir 路径  指定 posts 目录，默认相对于项目：<root>/source/_posts
+    --pattern 模式    目标路径模式，默认 :year/:month/:name；可用 :year :month :day :i_month
+                      :i_day :name（原文件名）:id :category（第一个分类）
+    --recursive       递归检查子目录中已有的文章（例如按新模式重新整理 YYYY/MM/ 下的文章）
     --apply           执行移动（否则只做预览）
     --yes             跳过确认（在 --apply 时有用）
+    --jobs N          并发读取与解析文件的线程数，0 表示按 CPU 核心数
+    --plan-out 文件   把计划（含每个源文件的内容哈希）写为 JSON，不执行移动
+    --apply-plan 文件 执行之前写出的计划，不重新扫描；内容哈希已变化的条目会被跳过
+    --resume          继续执行上次被打断的移动（依据日志）
+    --rollback        撤销上次被打断的移动中已完成的部分
+    --journal 文件    移动日志路径，默认 tools/.cache/rename_journal.jsonl
+    --since [REV]     只处理自 REV 以来（含未提交的修改）变化过的文章；不给 REV 时
+                      从上次 --apply 记录的提交开始（tools/.cache/since_state.json）
+    --stats [文件]    结束时输出 JSON 统计报告（各阶段耗时、读取文件数与字节数、移动次数）
+    --profile [文件]  用 cProfile 记录本次运行并导出结果
 
 脚本会：
  - 解析文件头部的 YAML front matter（以 "---" 包裹）
  - 在 date 字段中提取第一个 YYYY-MM-DD 格式日期
- - 目标路径为 posts_dir/YYYY/MM/<原文件名.md>
+ - 目标路径为 posts_dir/YYYY/MM/<原文件名.md>（由 --pattern 决定）
  - 若存在与原文件同名的文件夹（同目录，名字等于 md 文件的 stem），把该文件夹移动到同一目标目录下
- - 遇到冲突或无法解析会报告并跳过（避免覆盖）
+ - 移动前建立完整的移动图：目标重复、目标被不移动的文件占用时整篇文章跳过（避免覆盖）；
+   互相占用目标的交换与环先把其中一项移到临时名（.swap）再依次完成
+ - 移动完成后删除变空的源目录
+ - 执行移动前先一次性创建目标目录，并把所有移动写入日志；中途失败可以 --resume 或 --rollback
 """
 
 
 from __future__ import annotations
 import argparse
+import os
 import re
 from pathlib import Path
 import sys
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
-DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
-FM_BLOCK_RE = re.compile(r"^---\s*\r?\n(.*?)\r?\n---\s*\r?\n", re.DOTALL | re.MULTILINE)
-DATE_LINE_RE = re.compile(r"^\s*date\s*:\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+import incremental
+import instrument
+from front_matter import PostCatalog, PostInfo, extract_date, file_sha1, parse_post
+from parallel import add_jobs_argument, map_ordered
+from move_journal import JournalError, MoveJournal, MoveOp
+from plans import PlanError, read_plan, write_plan
 
+PLAN_TOOL = 'rename_posts_by_date'
+DEFAULT_JOURNAL = Path(__file__).resolve().parent / '.cache' / 'rename_journal.jsonl'
+DEFAULT_PATTERN = ':year/:month/:name'
+PATTERN_TOKEN_RE = re.compile(r":(year|month|day|i_month|i_day|name|id|category)\b")
+# 交换或环形移动时的临时名后缀
+SWAP_SUFFIX = '.swap'
 
-def extract_front_matter(text: str) -> Optional[str]:
-    m = FM_BLOCK_RE.match(text)
-    if m:
-        return m.group(1)
-    return None
 
+def expand_pattern(pattern: str, md_path: Path, info: PostInfo) -> Optional[str]:
+    """按 permalink 风格的模式生成文章相对 posts_dir 的路径（不含 .md）。
+    支持 :year :month :day :i_month :i_day :name :id :category；缺少所需字段时返回 None。"""
+    date = extract_date(info.date) if info.has_fm else None
+    values = {'name': md_path.stem}
+    if date:
+        values.update(year=date[0:4], month=date[5:7], day=date[8:10],
+                      i_month=str(int(date[5:7])), i_day=str(int(date[8:10])))
+    if info.id:
+        values['id'] = info.id
+    if info.categories:
+        values['category'] = info.categories[0]
+    missing = False
 
-def extract_date_from_fm(fm: str) -> Optional[str]:
-    m = DATE_LINE_RE.search(fm)
-    if not m:
+    def sub(m: re.Match) -> str:
+        nonlocal missing
+        v = values.get(m.group(1))
+        if v is None or '/' in v or '\\' in v or v in ('.', '..'):
+            missing = True
+            return ''
+        return v
+    rel = PATTERN_TOKEN_RE.sub(sub, pattern).strip('/')
+    if missing or not rel:
         return None
-    date_field = m.group(1).strip().strip('\"\'')
-    dm = DATE_RE.search(date_field)
-    if dm:
-        return dm.group(1)
-    return None
+    return rel
 
 
-def compute_new_names(md_path: Path, posts_dir: Path) -> Tuple[Optional[Path], Optional[Path]]:
+def compute_new_names(md_path: Path, posts_dir: Path,
+                      catalog: Optional[PostCatalog] = None,
+                      pattern: str = DEFAULT_PATTERN) -> Tuple[Optional[Path], Optional[Path]]:
     """返回 (new_md_path or None, new_resource_dir or None)。如果不需要移动则返回 (None, None)。
-    new_md_path 和 new_resource_dir 都位于 posts_dir/YYYY/MM/ 下。
+    默认模式下 new_md_path 和 new_resource_dir 都位于 posts_dir/YYYY/MM/ 下。
     """
     try:
-        text = md_path.read_text(encoding='utf-8')
+        info = catalog.get(md_path) if catalog is not None else parse_post(str(md_path), md_path.stat())
     except Exception:
         return (None, None)
-    fm = extract_front_matter(text)
-    if not fm:
+    rel = expand_pattern(pattern, md_path, info)
+    if not rel:
         return (None, None)
-    date = extract_date_from_fm(fm)
-    if not date:
-        return (None, None)
-    year = date[0:4]
-    month = date[5:7]
-    target_dir = posts_dir / year / month
-    new_md = target_dir / md_path.name
+    new_md = posts_dir / (rel + md_path.suffix)
+    new_res_dir = posts_dir / rel
     # resource dir: same directory entry named as original stem (folder)
     res_dir = md_path.with_name(md_path.stem)
-    new_res_dir = target_dir / md_path.stem
     need_move_file = True
     try:
         need_move_file = md_path.resolve() != new_md.resolve()
@@ -90,13 +122,246 @@ def compute_new_names(md_path: Path, posts_dir: Path) -> Tuple[Optional[Path], O
     return (new_md if need_move_file else None, new_res_dir if need_move_dir else None)
 
 
+def find_posts(posts_dir: Path, recursive: bool) -> List[Path]:
+    """posts_dir 下的文章。递归时跳过资源文件夹（与某个 md 同名的目录）里的 md 文件。"""
+    if not recursive:
+        return sorted([p for p in posts_dir.iterdir() if p.is_file() and p.suffix.lower() == '.md'])
+    posts = []
+    for dirpath, dirnames, filenames in os.walk(posts_dir):
+        stems = {Path(fn).stem for fn in filenames if fn.lower().endswith('.md')}
+        # 资源文件夹不再向下遍历
+        dirnames[:] = sorted(d for d in dirnames if d not in stems)
+        posts.extend(Path(dirpath) / fn for fn in filenames if fn.lower().endswith('.md'))
+    return sorted(posts)
+
+
+def plan_to_entries(planned, posts_dir: Path, catalog: PostCatalog) -> List[Dict]:
+    """把计划转换为可序列化的条目，只保留需要移动的文章，并记录源文件内容哈希。"""
+    entries = []
+    for md, new_md, orig_res, new_res in planned:
+        if new_md is None and new_res is None:
+            continue
+        entries.append({
+            'md': md.relative_to(posts_dir).as_posix(),
+            'sha1': catalog.content_hash(md),
+            'new_md': new_md and new_md.relative_to(posts_dir).as_posix(),
+            'res': orig_res and orig_res.relative_to(posts_dir).as_posix(),
+            'new_res': new_res and new_res.relative_to(posts_dir).as_posix(),
+        })
+    return entries
+
+
+def entries_to_plan(entries: List[Dict], posts_dir: Path):
+    """从计划文件条目还原计划，源文件缺失或内容哈希不一致的条目被跳过。"""
+    planned = []
+    for e in entries:
+        md = posts_dir / e['md']
+        try:
+            sha1 = file_sha1(md)
+        except OSError:
+            print(f"跳过（源文件不存在）：{e['md']}")
+            continue
+        if sha1 != e['sha1']:
+            print(f"跳过（内容已变化）：{e['md']}")
+            continue
+        planned.append(tuple(p and posts_dir / p for p in (e['md'], e['new_md'], e['res'], e['new_res'])))
+    return planned
+
+
+def print_plan(planned, posts_dir: Path) -> None:
+    for md, new_md, orig_res, new_res in planned:
+        if new_md is None and new_res is None:
+            print(f"跳过: {md} （无法解析 date 或已是期望位置）")
+            continue
+        print('---')
+        [md, new_md, orig_res, new_res] = [p and p.relative_to(posts_dir) 
+                                           for p in (md, new_md, orig_res, new_res)]
+        print(f"原文件: {md}  ")
+        if new_md:
+            print(f"  目标文件: {new_md}")
+        else:
+            print("  目标文件: 无变更")
+        if orig_res and new_res:
+            print(f"  资源文件夹: {orig_res} -> 目标: {new_res}")
+        elif orig_res:
+            print(f"  资源文件夹: {orig_res} -> 目标: 无变更")
+        else:
+            print("  资源文件夹: 无")
+
+
+def _swap_name(path: Path, taken: Set[Path]) -> Path:
+    n = 0
+    while True:
+        tmp = path.with_name(f"{path.name}{SWAP_SUFFIX}{n or ''}")
+        if tmp not in taken and not tmp.exists() and not tmp.is_symlink():
+            taken.add(tmp)
+            return tmp
+        n += 1
+
+
+def order_moves(moves: Dict[Path, Path]) -> List[MoveOp]:
+    """把 src -> dst（目标互不相同）排成可以依次执行的操作序列。
+    目标被另一个待移动的源占用时，先移走占用者；交换与环先把其中一个源移到临时名。"""
+    ops: List[MoveOp] = []
+    done: Set[Path] = set()
+    taken: Set[Path] = set(moves) | set(moves.values())
+    for start in moves:
+        if start in done:
+            continue
+        # 沿着“目标正被另一个源占用”的关系走到链尾或回到链上
+        chain: List[Path] = []
+        index: Dict[Path, int] = {}
+        node = start
+        while node in moves and node not in done and node not in index:
+            index[node] = len(chain)
+            chain.append(node)
+            node = moves[node]
+        done.update(chain)
+        if node in index:
+            # 目标互不相同，所以环一定从 chain 的开头开始
+            last = chain[-1]
+            tmp = _swap_name(last, taken)
+            ops.append(MoveOp(last, tmp))
+            ops.extend(MoveOp(src, moves[src]) for src in reversed(chain[:-1]))
+            ops.append(MoveOp(tmp, moves[last]))
+        else:
+            ops.extend(MoveOp(src, moves[src]) for src in reversed(chain))
+    return ops
+
+
+def plan_moves(planned) -> List[MoveOp]:
+    """在移动任何文件之前建立完整的移动图：一篇文章的 md 与资源文件夹作为一个整体，
+    目标重复、目标被不移动的文件占用、或目标位于另一个正在移动的目录内时，整篇文章跳过。
+    其余移动按依赖排序，交换与环借助临时名完成。"""
+    units = {}  # md -> [(src, dst), ...]
+    for md, new_md, orig_res, new_res in planned:
+        pairs = []
+        if new_md:
+            pairs.append((md, new_md))
+        if orig_res and new_res:
+            pairs.append((orig_res, new_res))
+        if pairs:
+            units[md] = pairs
+
+    while True:
+        moves = {src: dst for pairs in units.values() for src, dst in pairs}
+        owner = {src: md for md, pairs in units.items() for src, _ in pairs}
+        by_target: Dict[Path, List[Path]] = {}
+        for src, dst in moves.items():
+            by_target.setdefault(dst, []).append(src)
+        moving_dirs = {p for src, dst in moves.items() if src.is_dir() for p in (src, dst)}
+        bad: Dict[Path, str] = {}
+        for src, dst in moves.items():
+            if len(by_target[dst]) > 1:
+                reason = f"目标冲突：{dst}（共 {len(by_target[dst])} 个来源）"
+            elif (dst.exists() or dst.is_symlink()) and dst not in moves:
+                reason = f"目标已存在：{dst}"
+            elif any(parent in moving_dirs for parent in dst.parents) or \
+                    any(parent in moving_dirs for parent in src.parents):
+                reason = f"路径位于另一个正在移动的目录内：{src} -> {dst}"
+            else:
+                continue
+            bad.setdefault(owner[src], reason)
+        if not bad:
+            break
+        # 跳过的文章留在原处，可能让其他文章的目标变为“已存在”，重新检查直到稳定
+        for md, reason in bad.items():
+            print(f"跳过移动（{reason}）：{md}")
+            del units[md]
+    return order_moves(moves)
+
+
+def remove_empty_dirs(dirs, posts_dir: Path) -> None:
+    """移动完成后删除变空的源目录（不超出 posts_dir）。"""
+    for d in sorted(set(dirs), key=lambda p: len(p.parts), reverse=True):
+        while d != posts_dir and posts_dir in d.parents:
+            try:
+                d.rmdir()
+            except OSError:
+                break
+            d = d.parent
+
+
+def apply_plan(planned, journal: MoveJournal, posts_dir: Path) -> None:
+    ops = plan_moves(planned)
+    # 统计时不计入移到临时名的那一步
+    is_dir = {}
+    for op in ops:
+        is_dir[op.dst] = is_dir.pop(op.src) if op.src in is_dir else op.src.is_dir()
+    dir_count = sum(1 for d in is_dir.values() if d)
+    try:
+        with instrument.phase('write'):
+            journal.execute(ops)
+    except (OSError, JournalError) as e:
+        print(f"错误：{e}")
+        print(f"已完成的移动记录在 {journal.path}，可使用 --resume 继续或 --rollback 撤销。")
+        sys.exit(1)
+
+    remove_empty_dirs([op.src.parent for op in ops], posts_dir)
+    print(f"\n完成：文件重命名 {len(is_dir) - dir_count} 个，文件夹重命名 {dir_count} 个。")
+
+
+def confirm(args) -> bool:
+    if args.yes:
+        return True
+    ans = input('确认要执行以上重命名操作吗？输入 y 确认：')
+    if ans.lower() != 'y':
+        print('取消。')
+        return False
+    return True
+
+
 def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('--posts-dir', '-d', default=None,
                         help='posts 目录路径，默认相对于项目：<root>/source/_posts')
     parser.add_argument('--apply', action='store_true', help='执行重命名（否则只做预览）')
     parser.add_argument('--yes', action='store_true', help='在 --apply 时跳过确认')
+    parser.add_argument('--plan-out', default=None, help='把计划写入 JSON 文件，不执行移动')
+    parser.add_argument('--apply-plan', default=None, help='执行 --plan-out 写出的计划文件')
+    parser.add_argument('--resume', action='store_true', help='继续执行日志中未完成的移动')
+    parser.add_argument('--rollback', action='store_true', help='撤销日志中已完成的移动')
+    parser.add_argument('--journal', default=str(DEFAULT_JOURNAL), help='移动日志路径')
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN,
+                        help=f'目标路径模式（相对 posts 目录，不含 .md），默认 {DEFAULT_PATTERN}')
+    parser.add_argument('--recursive', '-R', action='store_true',
+                        help='重新检查子目录中的文章，而不只是 posts 根目录下的')
+    add_jobs_argument(parser)
+    incremental.add_arguments(parser)
+    instrument.add_arguments(parser)
     args = parser.parse_args(argv)
+    with instrument.session(args, PLAN_TOOL):
+        run(args)
+
+
+def run(args):
+    journal = MoveJournal(Path(args.journal))
+    if args.resume or args.rollback:
+        try:
+            if args.resume:
+                print(f"\n完成：继续执行了 {journal.resume()} 个移动。")
+            else:
+                print(f"\n完成：撤销了 {journal.rollback()} 个移动。")
+        except (OSError, JournalError) as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+        return
+    if journal.exists():
+        print(f"错误：存在未完成的移动日志 {journal.path}，请先使用 --resume 或 --rollback。")
+        sys.exit(2)
+
+    if args.apply_plan:
+        try:
+            posts_dir, entries = read_plan(args.apply_plan, PLAN_TOOL)
+        except PlanError as e:
+            print(f"错误：{e}")
+            sys.exit(2)
+        planned = entries_to_plan(entries, posts_dir)
+        print(f"计划共 {len(entries)} 条，可执行 {len(planned)} 条。\n")
+        print_plan(planned, posts_dir)
+        if planned and confirm(args):
+            apply_plan(planned, journal, posts_dir)
+        return
 
     script_dir = Path(__file__).resolve().parent
     default_posts = script_dir.parent / 'source' / '_posts'
@@ -106,79 +371,72 @@ def main(argv=None):
         print(f"错误：posts 目录不存在：{posts_dir}")
         sys.exit(2)
 
-    md_files = sorted([p for p in posts_dir.iterdir() if p.is_file() and p.suffix.lower() == '.md'])
+    since = incremental.resolve_since(args.since, PLAN_TOOL, args.since_state)
+    with instrument.phase('scan'):
+        if since:
+            # 非递归时只有还在 posts 根目录下的文章需要移动
+            try:
+                changed = incremental.changed_posts(posts_dir, since)
+            except ValueError as e:
+                print(f"错误：{e}")
+                sys.exit(2)
+            md_files = sorted(p for p in changed if args.recursive or p.parent == posts_dir)
+        else:
+            md_files = find_posts(posts_dir, args.recursive)
     if not md_files:
-        print("未找到任何 .md 文件（在 %s）" % posts_dir)
+        if since:
+            print(f"自 {since} 以来 {posts_dir} 根目录下没有变化的 .md 文件")
+            if args.apply:
+                incremental.record(PLAN_TOOL, posts_dir, args.since_state)
+        else:
+            print("未找到任何 .md 文件（在 %s）" % posts_dir)
         return
 
     planned = []  # tuples (orig_md, new_md_or_None, orig_res_dir_if_exists, new_res_dir_or_None)
-    for md in md_files:
-        new_md, new_res = compute_new_names(md, posts_dir)
-        orig_res = md.with_name(md.stem)
-        planned.append((md, new_md, orig_res if orig_res.exists() and orig_res.is_dir() else None, new_res))
+    with PostCatalog() as catalog:
+        if not since:
+            catalog.prune(posts_dir)
+        # 先并发解析所有文件头部，之后 compute_new_names 只会命中缓存
+        with instrument.phase('parse'):
+            catalog.scan(md_files, args.jobs)
+        with instrument.phase('plan'):
+            names = map_ordered(lambda md: compute_new_names(md, posts_dir, catalog, args.pattern),
+                                md_files, args.jobs)
+        for md, (new_md, new_res) in zip(md_files, names):
+            orig_res = md.with_name(md.stem)
+            planned.append((md, new_md, orig_res if orig_res.exists() and orig_res.is_dir() else None, new_res))
+        if args.plan_out:
+            entries = plan_to_entries(planned, posts_dir, catalog)
 
     rename_file_count = sum(1 for a,b,c,d in planned if b is not None)
     rename_dir_count = sum(1 for a,b,c,d in planned if d is not None)
 
     print(f"共扫描 {len(md_files)} 个 md 文件。计划重命名文件：{rename_file_count} 个，资源文件夹：{rename_dir_count} 个。\n")
 
-    for md, new_md, orig_res, new_res in planned:
-        if new_md is None and new_res is None:
-            print(f"跳过: {md} （无法解析 date 或已是期望位置）")
-            continue
-        print('---')
-        [md, new_md, orig_res, new_res] = [p and p.relative_to(posts_dir) 
-                                           for p in (md, new_md, orig_res, new_res)]
-        print(f"原文件: {md}  ")
-        if new_md:
-            print(f"  目标文件: {new_md}")
-        else:
-            print("  目标文件: 无变更")
-        if orig_res and new_res:
-            print(f"  资源文件夹: {orig_res} -> 目标: {new_res}")
-        elif orig_res:
-            print(f"  资源文件夹: {orig_res} -> 目标: 无变更")
-        else:
-            print("  资源文件夹: 无")
+    if args.recursive:
+        # 递归时大部分文章已在期望位置，只列出需要移动的
+        in_place = sum(1 for a,b,c,d in planned if b is None and d is None)
+        print_plan([t for t in planned if t[1] is not None or t[3] is not None], posts_dir)
+        print(f"\n另有 {in_place} 篇文章已在期望位置或无法按模式生成路径。")
+    else:
+        print_plan(planned, posts_dir)
+
+    if args.plan_out:
+        write_plan(args.plan_out, PLAN_TOOL, posts_dir, entries)
+        print(f"\n计划已写入 {args.plan_out}，使用 --apply-plan 执行。")
+        return
 
     if not args.apply:
         print('\n这是预览（dry-run）。要实际执行重命名，请使用 --apply 参数。')
         return
 
-    if args.apply and not args.yes:
-        ans = input('确认要执行以上重命名操作吗？输入 y 确认：')
-        if ans.lower() != 'y':
-            print('取消。')
-            return
+    if not confirm(args):
+        return
 
     # 执行重命名
-    file_renamed = 0
-    dir_renamed = 0
-    for md, new_md, orig_res, new_res in planned:
-        try:
-            if new_md:
-                # 确保目标目录存在
-                new_md.parent.mkdir(parents=True, exist_ok=True)
-                if new_md.exists():
-                    print(f"跳过文件移动（目标已存在）：{md} -> {new_md}")
-                else:
-                    md.rename(new_md)
-                    print(f"移动文件：{md} -> {new_md}")
-                    file_renamed += 1
-            if orig_res and new_res:
-                # 确保目标目录存在
-                new_res_parent = new_res.parent
-                new_res_parent.mkdir(parents=True, exist_ok=True)
-                if new_res.exists():
-                    print(f"跳过文件夹移动（目标已存在）：{orig_res} -> {new_res}")
-                else:
-                    orig_res.rename(new_res)
-                    print(f"移动文件夹：{orig_res} -> {new_res}")
-                    dir_renamed += 1
-        except Exception as e:
-            print(f"错误处理 {md.name}：{e}")
-
-    print(f"\n完成：文件重命名 {file_renamed} 个，文件夹重命名 {dir_renamed} 个。")
+    apply_plan(planned, journal, posts_dir)
+    if args.since is not None:
+        incremental.record(PLAN_TOOL, posts_dir, args.since_state)
 
 
 if __name__ == '__main__':
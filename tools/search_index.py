@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+为站内搜索生成按词项前缀分片的倒排索引，查询时只需要读取查询词所在的分片。
+
+站点目前仍然使用 hexo-generator-searchdb 生成的 search.xml（NexT 的 local_search 只会加载它），
+还没有按分片加载的前端代码，所以索引默认写在 tools/.cache/search/，不进入 source/，也不会被部署。
+
+用法：
+    python tools/search_index.py           # 增量更新 tools/.cache/search/ 下的索引
+    python tools/search_index.py --full    # 全部重建
+
+支持选项：
+    --posts-dir 路径   指定 posts 目录，默认相对于项目：<root>/source/_posts
+    --output 目录      索引目录，默认 tools/.cache/search
+    --shard-bits N     非 ASCII 词项按首字符码位右移 N 位分片，默认 6（每片覆盖 64 个码位）
+    --full             忽略缓存与现有索引，全部重建
+    --jobs N           并发分词的进程数，0 表示按 CPU 核心数
+    --stats [文件]     结束时输出 JSON 统计报告
+    --profile [文件]   用 cProfile 记录本次运行并导出结果
+
+分词：
+ - 文本先做 NFKC 规范化并转为小写，忽略 HTML 标签、链接 URL 与 `{% %}` 标签语法
+ - 连续的汉字、假名、谚文切成重叠的二元组（只有一个字时保留单字），其余文字按单词切分，丢弃单个字母
+ - 每篇文章的词项权重 = 正文出现次数 + 标题出现次数 × 10 + 标签 / 分类出现次数 × 5
+
+输出：
+ - meta.json：{"version", "shard_bits", "docs": [[id, 标题, URL, 日期] 或 null, ...], "shards": [分片名, ...]}
+   docs 的下标就是文章编号，已有文章的编号在增量更新中保持不变，删除的文章留下 null 供之后复用
+ - <分片名>.json：{词项: [编号, 权重, 编号, 权重, ...]}，按权重从高到低
+ - 分片名：首字符是 ASCII 字母或数字时就是这个字符，否则为 "u" + 十六进制的 (码位 >> shard_bits)
+
+增量：每篇文章的词项按内容哈希缓存在 tools/.cache/search_index.json，并记录对应的输出目录。只有内容变化、
+新增或删除的文章所涉及的词项（新旧两个版本）所在的分片会重新生成，其余分片文件不会被改写。
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import re
+import sys
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import instrument
+from front_matter import DEFAULT_CACHE_DIR, PostCatalog, walk_posts
+from parallel import add_jobs_argument, map_ordered
+from wordcount import CJK_CHARS, CJK_RE, MARKUP_RE
+
+SEARCH_CACHE = DEFAULT_CACHE_DIR / 'search_index.json'
+DEFAULT_OUTPUT = DEFAULT_CACHE_DIR / 'search'
+INDEX_VERSION = 1
+TITLE_WEIGHT = 10
+TAG_WEIGHT = 5
+MAX_WORD_LEN = 32
+TOKEN_RE = re.compile(rf"[{CJK_CHARS}]+|[^\W{CJK_CHARS}_]+")
+ASCII_KEY_RE = re.compile(r"[a-z0-9]")
+
+
+def tokenize(text: str) -> Iterable[str]:
+    text = unicodedata.normalize('NFKC', MARKUP_RE.sub(' ', text)).lower()
+    for m in TOKEN_RE.finditer(text):
+        tok = m.group()
+        if CJK_RE.match(tok):
+            if len(tok) == 1:
+                yield tok
+            else:
+                for i in range(len(tok) - 1):
+                    yield tok[i:i + 2]
+        elif (len(tok) > 1 or tok.isdigit()) and len(tok) <= MAX_WORD_LEN:
+            yield tok
+
+
+def post_terms(item: Tuple[str, int, str, List[str]]) -> Dict[str, int]:
+    """在工作进程中执行：返回文章的 {词项: 权重}。"""
+    path, body_offset, title, tags = item
+    with open(path, 'rb') as f:
+        f.seek(body_offset)
+        body = f.read().decode('utf-8', errors='replace')
+    weights = Counter(tokenize(body))
+    for tok in tokenize(title):
+        weights[tok] += TITLE_WEIGHT
+    for tag in tags:
+        for tok in tokenize(tag):
+            weights[tok] += TAG_WEIGHT
+    return dict(weights)
+
+
+def shard_key(term: str, shard_bits: int) -> str:
+    c = term[0]
+    if ASCII_KEY_RE.match(c):
+        return c
+    return f"u{ord(c) >> shard_bits:x}"
+
+
+def dump(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def write_if_changed(path: Path, text: str) -> bool:
+    if path.exists() and path.read_text(encoding='utf-8') == text:
+        return False
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(text, encoding='utf-8')
+    tmp.replace(path)
+    instrument.count('writes')
+    return True
+
+
+def assign_numbers(previous: List[Optional[list]], ids: List[str]) -> Dict[str, int]:
+    """沿用旧编号；新文章优先填入被删除文章留下的空位，没有空位时追加。"""
+    current = set(ids)
+    numbers = {doc[0]: n for n, doc in enumerate(previous) if doc and doc[0] in current}
+    free = [n for n, doc in enumerate(previous) if not doc or doc[0] not in current]
+    next_number = len(previous)
+    for post_id in ids:
+        if post_id not in numbers:
+            if free:
+                numbers[post_id] = free.pop(0)
+            else:
+                numbers[post_id] = next_number
+                next_number += 1
+    return numbers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts-dir', '-d', default=None,
+                        help='posts 目录路径，默认相对于项目：<root>/source/_posts')
+    parser.add_argument('--output', '-o', default=None, help='索引目录，默认 tools/.cache/search')
+    parser.add_argument('--shard-bits', type=int, default=6, help='非 ASCII 词项分片的码位右移位数')
+    parser.add_argument('--full', action='store_true', help='全部重建')
+    add_jobs_argument(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    with instrument.session(args, 'search_index'):
+        run(args)
+
+
+def run(args):
+    script_dir = Path(__file__).resolve().parent
+    repo_root = script_dir.parent
+    default_posts = repo_root / 'source' / '_posts'
+    posts_dir = Path(args.posts_dir).resolve() if args.posts_dir else default_posts.resolve()
+    out_dir = Path(args.output).resolve() if args.output else DEFAULT_OUTPUT
+    if not posts_dir.is_dir():
+        print(f"错误：posts 目录不存在：{posts_dir}")
+        sys.exit(2)
+
+    # 文章：id -> (内容哈希, 路径, 正文偏移, 标题, 标签与分类, 日期)
+    posts: Dict[str, Tuple[str, str, int, str, List[str], str]] = {}
+    with PostCatalog() as catalog:
+        catalog.prune(posts_dir)
+        with instrument.phase('scan'):
+            for p, info, err in catalog.iter_scan(walk_posts(posts_dir), args.jobs):
+                if err is not None:
+                    print(f"读取文件失败，跳过：{p}，原因：{err}")
+                    continue
+                if not info.has_fm or not info.id:
+                    print(f"跳过（没有 id）：{Path(p).relative_to(posts_dir)}")
+                    continue
+                if info.id in posts:
+                    print(f"警告：id 重复，只索引第一篇：{info.id}，{Path(p).relative_to(posts_dir)}")
+                    continue
+                posts[info.id] = (catalog.content_hash(p), info.path, info.body_offset, info.title or '',
+                                  info.tags + info.categories, info.date or '')
+
+    settings = {'version': INDEX_VERSION, 'shard_bits': args.shard_bits}
+    meta_path = out_dir / 'meta.json'
+    try:
+        cache = json.loads(SEARCH_CACHE.read_text(encoding='utf-8'))
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        # 缓存记录的是写入哪个目录时的状态，换了 --output 目录就不能沿用
+        full = args.full or cache.get('settings') != settings or cache.get('out_dir') != str(out_dir) or \
+            {k: meta.get(k) for k in settings} != settings
+    except (OSError, ValueError):
+        cache, meta, full = {}, {}, True
+    terms: Dict[str, Dict[str, int]] = cache.get('terms', {})
+    previous: Dict[str, str] = {} if full else cache.get('posts', {})
+    # 旧版本的词项不在缓存中时无法确定受影响的分片，只能全部重建
+    if any(sha1 not in terms for sha1 in previous.values()):
+        full, previous = True, {}
+
+    stale = sorted({v[0]: (v[1], v[2], v[3], v[4]) for v in posts.values() if v[0] not in terms}.items())
+    instrument.count('search_cache_hits', len(posts) - len(stale))
+    with instrument.phase('tokenize'):
+        tokenized = map_ordered(post_terms, [item for _, item in stale], args.jobs, processes=True)
+    for (sha1, _), weights in zip(stale, tokenized):
+        terms[sha1] = weights
+    instrument.count('files_read', len(stale))
+
+    with instrument.phase('plan'):
+        changed = [pid for pid in set(posts) | set(previous)
+                   if previous.get(pid) != (posts[pid][0] if pid in posts else None)]
+        existing_shards = set(meta.get('shards', [])) if not full else set()
+        affected: Optional[Set[str]] = None if full else set()  # None 表示全部
+        if affected is not None:
+            for pid in changed:
+                for sha1 in (previous.get(pid), posts[pid][0] if pid in posts else None):
+                    if sha1:
+                        affected.update(shard_key(t, args.shard_bits) for t in terms[sha1])
+        ids = sorted(posts, key=lambda pid: (posts[pid][5], pid))
+        numbers = assign_numbers([] if full else meta.get('docs', []), ids)
+
+        shards: Dict[str, Dict[str, List[Tuple[int, int]]]] = {}
+        all_keys: Set[str] = set()
+        for pid in ids:
+            n = numbers[pid]
+            for term, weight in terms[posts[pid][0]].items():
+                key = shard_key(term, args.shard_bits)
+                all_keys.add(key)
+                if affected is None or key in affected:
+                    shards.setdefault(key, {}).setdefault(term, []).append((n, weight))
+
+    print(f"索引 {len(posts)} 篇文章，变化 {len(changed)} 篇，"
+          f"{'全部重建' if affected is None else f'需要重新生成 {len(affected)} 个分片'}"
+          f"（共 {len(all_keys)} 个分片）。")
+
+    with instrument.phase('write'):
+        out_dir.mkdir(parents=True, exist_ok=True)
+        written = 0
+        for key, postings in shards.items():
+            body = {term: [x for n, w in sorted(plist, key=lambda nw: (-nw[1], nw[0])) for x in (n, w)]
+                    for term, plist in sorted(postings.items())}
+            written += write_if_changed(out_dir / f"{key}.json", dump(body))
+        # 不再有任何词项的分片
+        on_disk = {p.stem for p in out_dir.glob('*.json') if p.name != 'meta.json'}
+        for key in sorted((existing_shards | on_disk) - all_keys):
+            (out_dir / f"{key}.json").unlink(missing_ok=True)
+            instrument.count('shards_removed')
+        docs: List[Optional[list]] = [None] * (max(numbers.values(), default=-1) + 1)
+        for pid in ids:
+            _, _, _, title, _, date = posts[pid]
+            docs[numbers[pid]] = [pid, title, f"/posts/{pid}/", date[:10]]
+        meta = dict(settings, docs=docs, shards=sorted(all_keys))
+        written += write_if_changed(meta_path, dump(meta))
+
+    used = {v[0] for v in posts.values()}
+    SEARCH_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    SEARCH_CACHE.write_text(json.dumps({'settings': settings,
+                                        'out_dir': str(out_dir),
+                                        'posts': {pid: v[0] for pid, v in posts.items()},
+                                        'terms': {k: v for k, v in terms.items() if k in used}},
+                                       ensure_ascii=False), encoding='utf-8')
+    print(f"完成：写入 {written} 个文件。")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,40 +5,47 @@ show git commits touching the file and let the user pick one to set `updated`.
 
 Usage:
   python tools/update_posts_updated.py [--preview] [--posts-dir PATH]
+  python tools/update_posts_updated.py --auto [--policy NAME ...] [--preview]
+  python tools/update_posts_updated.py --watch [--debounce SEC] [--poll]
 
 --preview: don't modify files, only show choices
 --posts-dir: path to posts folder (default: source/_posts)
+--auto: don't prompt, pick the newest commit accepted by every --policy
+--watch: keep running; when a post's body changes on disk, set `updated` to its mtime
+    and warn about missing or duplicate `id`. Uses inotify, or polling with --poll
+--debounce SEC: wait until a file has been quiet this long before handling it (default 1)
+--no-history-cache: ignore the commit history cached from the last run (keyed by HEAD)
+--prefetch K: while a prompt is open, prepare the next K files' diffs in the background
+    (default 3, 0 = off); --prefetch-diffs N sets how many commits per file (default 3)
+--since [REV]: only look at posts changed since REV (committed or not); without REV,
+    since the HEAD recorded by the last non-preview run (tools/.cache/since_state.json)
+--jobs N: parallel workers for reading posts and running git (0 = all cores)
+--stats [FILE]: print a JSON report (phases, files, bytes, git calls) when done
+--profile [FILE]: run under cProfile and dump the results
+--policy: commit selection policy for --auto, may be repeated (default: latest)
+    latest          skip commits that only renamed the file
+    body            skip commits that only touched the front matter
+    no-mass-rename  skip commits renaming at least --mass-rename-threshold files
 
 This script uses simple print/input for interaction.
 """
 import argparse
+import hashlib
+import json
 import os
 import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 
-
-def find_front_matter(text):
-    # Return (start_idx, end_idx, front_matter_text)
-    # start_idx and end_idx are indices in text where the '---' lines start and end (inclusive of separators)
-    m = re.match(r"\s*---\s*\n", text)
-    if not m:
-        return None
-    start = m.start()
-    # find the next line that is /^---\s*$/
-    lines = text.splitlines(keepends=True)
-    # first line is the opening '---'
-    end_line = None
-    for i in range(1, len(lines)):
-        if re.match(r"^---\s*$", lines[i]):
-            end_line = i
-            break
-    if end_line is None:
-        return None
-    # compute char indices
-    fm_text = ''.join(lines[0:end_line+1])
-    # start index is 0 (we only support fm at top)
-    return (0, len(fm_text), fm_text)
+import incremental
+import instrument
+from git_pool import GitPool, GitPoolError, get_pool
+from front_matter import (DEFAULT_CACHE_DIR, PostCatalog, edit_front_matter, find_front_matter,
+                          parse_front_matter, patch_header, read_header)
+from parallel import add_jobs_argument, map_ordered
+from watch import Debouncer, PollingWatcher, make_watcher
 
 
 def has_updated(fm_text):
@@ -46,79 +53,301 @@ def has_updated(fm_text):
     return re.search(r"^\s*updated\s*:\s*", fm_text, flags=re.MULTILINE) is not None
 
 
-def insert_updated(fm_text, updated_val):
-    # Try to insert updated after the date: line if present, otherwise after the opening --- line
-    lines = fm_text.splitlines()
-    inserted = False
-    for i, line in enumerate(lines):
-        if re.match(r"^\s*date\s*:\s*", line):
-            # insert after this line
-            lines.insert(i+1, f"updated: {updated_val}")
-            inserted = True
-            break
-    if not inserted:
-        # find first line that's '---' and insert after it
-        for i, line in enumerate(lines):
-            if re.match(r"^---\s*$", line):
-                lines.insert(i+1, f"updated: {updated_val}")
-                inserted = True
-                break
-    if not inserted:
-        # fallback: append before final closing '---' if present
-        if len(lines) >= 2:
-            lines.insert(-1, f"updated: {updated_val}")
-        else:
-            lines.append(f"updated: {updated_val}")
-    return '\n'.join(lines) + '\n'
+def set_updated(fm_text, updated_val):
+    # replace an existing `updated:` line, otherwise insert one after the date: line
+    # (or after the opening --- line when there is no date)
+    return edit_front_matter(fm_text, {'updated': updated_val})[0]
+
+
+TOOL = 'update_posts_updated'
+HISTORY_CACHE = os.path.join(str(DEFAULT_CACHE_DIR), 'history.json')
+HISTORY_CACHE_VERSION = 3
+
+# repo_root -> build_history_index(repo_root), filled on first use
+_history_cache = {}
 
 
 def git_commits_for_file(repo_root, file_path):
-    # Returns list of dicts: {hash, time_iso, body}
-    # Use git log --follow with custom separators
-    rel_path = os.path.relpath(file_path, repo_root)
+    # Returns list of dicts: {hash, time_iso, body, ...}, newest first.
+    # The whole history is indexed once per run instead of one `git log --follow` per file.
+    rel_path = os.path.relpath(file_path, repo_root).replace(os.sep, '/')
+    if repo_root not in _history_cache:
+        _history_cache[repo_root] = build_history_index(repo_root)
+    return _history_cache[repo_root].get(rel_path, [])
+
+
+def build_history_index(repo_root, paths=None):
+    # Walk the whole history once with `git log --name-status -M` and return
+    # a dict: rel_path (as of HEAD, '/' separated) -> list of commits (newest first).
+    # Renames are followed backwards, so a file's list also contains the commits
+    # made under its older names, like `git log --follow` would.
+    return select_paths(walk_history(repo_root)[0], paths)
+
+
+def select_paths(index, paths):
+    # Keep the files (by their current name) under any of paths. The log itself is
+    # not limited by a pathspec: that would hide renames from outside of paths,
+    # e.g. a post published from source/_drafts.
+    if not paths:
+        return index
+    prefixes = tuple(p.rstrip('/') + '/' for p in paths)
+    return {k: v for k, v in index.items() if k.startswith(prefixes) or k + '/' in prefixes}
+
+
+def walk_history(repo_root, rev_range=None):
+    # Returns (index, alias) for the commits in rev_range (default: all of HEAD).
+    # alias maps each path renamed inside the range to its name at the range's end.
     cmd = [
-        'git', 'log', '--follow', '--pretty=format:%H%x1f%cI%x1f%B%x1e', '--', rel_path
+        'git', '-c', 'core.quotePath=false', 'log', '--name-status', '-M',
+        '--pretty=format:%x1e%H%x1f%cI%x1f%B%x1f',
     ]
+    if rev_range:
+        cmd.append(rev_range)
     try:
-        out = subprocess.check_output(cmd, cwd=repo_root)
+        out = instrument.check_output(cmd, cwd=repo_root)
     except subprocess.CalledProcessError:
-        return []
+        return {}, {}
     raw = out.decode('utf-8', errors='replace')
-    if not raw:
-        return []
-    parts = raw.strip('\x1e').split('\x1e')
-    commits = []
-    for p in parts:
-        fields = p.split('\x1f')
-        if len(fields) >= 3:
-            h, t, body = fields[0], fields[1], fields[2]
-            commits.append({'hash': h.strip(), 'time': t, 'body': body.strip()})
-    return commits
-
-
-def show_commit_diff(repo_root, commit_hash, file_path):
-    rel_path = os.path.relpath(file_path, repo_root)
-    cmd = ['git', 'show', commit_hash, '--', rel_path]
+    index = {}
+    # old path -> the path it was renamed to later in history
+    alias = {}
+    for record in raw.split('\x1e'):
+        fields = record.split('\x1f')
+        if len(fields) < 4:
+            continue
+        h, t, body, changes = fields[0], fields[1], fields[2], fields[3]
+        entries = [line.split('\t') for line in changes.splitlines()]
+        entries = [parts for parts in entries if len(parts) >= 2]
+        renames = sum(1 for parts in entries if parts[0].startswith('R'))
+        for parts in entries:
+            status = parts[0]
+            path = parts[-1]
+            current = alias.get(path, path)
+            # per-path copy: status and path names differ between files of one commit
+            index.setdefault(current, []).append({
+                'hash': h.strip(), 'time': t, 'body': body.strip(),
+                'status': status, 'path': path, 'old_path': parts[1],
+                'renames': renames,
+            })
+            if status.startswith('R') and len(parts) == 3:
+                alias[parts[1]] = current
+    return index, alias
+
+
+def git_head(repo_root):
     try:
-        out = subprocess.check_output(cmd, cwd=repo_root)
-        print(out.decode('utf-8', errors='replace'))
-    except subprocess.CalledProcessError as e:
-        print('Failed to get diff:', e)
+        return instrument.check_output(['git', 'rev-parse', '--verify', '-q', 'HEAD'], cwd=repo_root,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except subprocess.CalledProcessError:
+        return None
 
 
-def show_commit_full(repo_root, commit_hash):
-    cmd = ['git', 'show', '--no-patch', '--pretty=format:%H%n%ci%n%s%n%n%b', commit_hash]
+def is_ancestor(repo_root, old, new):
     try:
-        out = subprocess.check_output(cmd, cwd=repo_root)
-        print(out.decode('utf-8', errors='replace'))
-    except subprocess.CalledProcessError as e:
-        print('Failed to get commit info:', e)
+        instrument.check_output(['git', 'merge-base', '--is-ancestor', old, new], cwd=repo_root,
+                                stderr=subprocess.DEVNULL)
+        return True
+    except subprocess.CalledProcessError:
+        return False
 
 
-def get_remote_origin_url(repo_root):
+def evict_missing(repo_root, index, head):
+    # Drop the entries of paths that are not in the tree of head (deleted files).
+    # The work tree is not consulted: the result is cached under head, and a file
+    # missing there only for a while (an uncommitted move) must keep its history.
     try:
-        out = subprocess.check_output(['git', 'remote', 'get-url', 'origin'], cwd=repo_root)
-        return out.decode().strip()
+        out = instrument.check_output(['git', 'ls-tree', '-r', '-z', '--name-only', head], cwd=repo_root)
+    except subprocess.CalledProcessError:
+        return index
+    tracked = set(out.decode('utf-8', errors='replace').split('\0'))
+    return {p: c for p, c in index.items() if p in tracked}
+
+
+def load_history(repo_root, paths=None, cache_path=HISTORY_CACHE):
+    # build_history_index() with an on-disk cache keyed by HEAD. When HEAD moved forward
+    # only old_head..HEAD is walked and merged in front of the cached lists; after a
+    # rebase the index is rebuilt. The cache holds every path, paths only selects what
+    # is returned. Paths that are not in HEAD any more are dropped before caching.
+    head = git_head(repo_root)
+    if head is None or cache_path is None:
+        return build_history_index(repo_root, paths)
+    cache = {}
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        pass
+    usable = (cache.get('version') == HISTORY_CACHE_VERSION
+              and cache.get('repo_root') == repo_root)
+    old_head = cache.get('head') if usable else None
+    if old_head == head:
+        instrument.count('history_cache_hits')
+        return select_paths(cache['index'], paths)
+    elif old_head and is_ancestor(repo_root, old_head, head):
+        new, alias = walk_history(repo_root, f'{old_head}..{head}')
+        index = new
+        for path, commits in cache['index'].items():
+            current = alias.get(path, path)
+            index[current] = index.get(current, []) + commits
+        instrument.count('history_cache_extended')
+    else:
+        index = build_history_index(repo_root)
+    index = evict_missing(repo_root, index, head)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp = cache_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': HISTORY_CACHE_VERSION, 'repo_root': repo_root,
+                   'head': head, 'index': index}, f, ensure_ascii=False)
+    os.replace(tmp, cache_path)
+    return select_paths(index, paths)
+
+
+def git_show_blob(repo_root, rev, rel_path):
+    # Return the text of rel_path at rev, or None if it doesn't exist there
+    return get_pool(repo_root).blob_text(rev, rel_path)
+
+
+def strip_front_matter(text):
+    fm = find_front_matter(text)
+    if not fm:
+        return text
+    return text[fm[1]:]
+
+
+# Selection policies for --auto. Each takes (repo_root, commit, opts) where commit
+# is an entry of build_history_index() and returns True if the commit may be picked.
+def policy_latest(repo_root, commit, opts):
+    # a pure rename (R100) doesn't change the content
+    return commit.get('status') != 'R100'
+
+
+def policy_body(repo_root, commit, opts):
+    if commit.get('status') == 'R100':
+        return False
+    new = git_show_blob(repo_root, commit['hash'], commit['path'])
+    old = git_show_blob(repo_root, commit['hash'] + '^', commit['old_path'])
+    if new is None or old is None:
+        # added, deleted or root commit
+        return True
+    return strip_front_matter(new) != strip_front_matter(old)
+
+
+def policy_no_mass_rename(repo_root, commit, opts):
+    return commit.get('renames', 0) < opts.get('mass_rename_threshold', 10)
+
+
+POLICIES = {
+    'latest': policy_latest,
+    'body': policy_body,
+    'no-mass-rename': policy_no_mass_rename,
+}
+
+
+def select_commit(repo_root, commits, policies, opts=None):
+    # Return the newest commit accepted by all policies, or None
+    opts = opts or {}
+    funcs = [POLICIES[name] for name in policies]
+    for c in commits:
+        if all(f(repo_root, c, opts) for f in funcs):
+            return c
+    return None
+
+
+def select_commit_job(job):
+    # picklable wrapper for running select_commit on a process pool
+    repo_root, commits, policies, opts = job
+    if not commits:
+        return None
+    return select_commit(repo_root, commits, policies, opts)
+
+
+# The functions below are called from the Choice> prompt. They go through the
+# long-lived git processes in git_pool, so an action doesn't start a new git.
+def commit_diff_text(repo_root, commit_hash, file_path, old_path=None, pool=None):
+    # file_path is the path in that commit; old_path is its name before a rename
+    rel_path = os.path.relpath(file_path, repo_root).replace(os.sep, '/')
+    pool = pool or get_pool(repo_root)
+    try:
+        info = pool.commit(commit_hash)
+        if info is None:
+            return f'Failed to get diff: unknown commit {commit_hash}'
+        patch = pool.file_patch(info.hash, [rel_path, old_path or rel_path])
+    except GitPoolError as e:
+        return f'Failed to get diff: {e}'
+    return f"commit {info.hash}\nDate:   {info.committer_date}\n\n    {info.subject}\n\n{patch}"
+
+
+def commit_full_text(repo_root, commit_hash, pool=None):
+    try:
+        info = (pool or get_pool(repo_root)).commit(commit_hash)
+    except GitPoolError as e:
+        return f'Failed to get commit info: {e}'
+    if info is None:
+        return f'Failed to get commit info: unknown commit {commit_hash}'
+    return f"{info.hash}\n{info.committer_date}\n{info.subject}\n\n{info.body}"
+
+
+def show_commit_diff(repo_root, commit_hash, file_path, old_path=None):
+    print(commit_diff_text(repo_root, commit_hash, file_path, old_path))
+
+
+def show_commit_full(repo_root, commit_hash):
+    print(commit_full_text(repo_root, commit_hash))
+
+
+def commit_file_path(repo_root, commit, filepath):
+    # history entries know the file's name in that commit
+    return os.path.join(repo_root, commit['path']) if 'path' in commit else filepath
+
+
+class ReviewPrefetcher:
+    # While the user answers the prompt for one file, a background thread prepares
+    # the `v` / `m` output of the first `diffs` commits of the next `ahead` files.
+    # It has its own git processes, so it never holds up the foreground pool.
+    def __init__(self, repo_root, files, ahead=3, diffs=3):
+        self.repo_root = repo_root
+        self.files = files  # list of (filepath, commits)
+        self.ahead = ahead
+        self.diffs = diffs
+        self.pool = GitPool(repo_root)
+        self.executor = ThreadPoolExecutor(max_workers=1) if ahead > 0 and diffs > 0 else None
+        self.futures = {}
+
+    def _prepare(self, filepath, commits):
+        texts = {}
+        for c in commits[:self.diffs]:
+            path = commit_file_path(self.repo_root, c, filepath)
+            texts[('v', c['hash'])] = commit_diff_text(
+                self.repo_root, c['hash'], path, c.get('old_path'), pool=self.pool)
+            texts[('m', c['hash'])] = commit_full_text(self.repo_root, c['hash'], pool=self.pool)
+        return texts
+
+    def get(self, index):
+        # Return the prepared texts for files[index] (possibly empty) and queue the next ones
+        if self.executor is None:
+            return {}
+        for i in range(index, min(index + 1 + self.ahead, len(self.files))):
+            if i not in self.futures:
+                self.futures[i] = self.executor.submit(self._prepare, *self.files[i])
+        future = self.futures.pop(index)
+        if future.cancel():
+            # not started yet: the prompt falls back to the foreground pool
+            return {}
+        # running or done: wait for it, recomputing would only leave the worker busy
+        # with a result nobody reads and hold up the later prefetches
+        return future.result()
+
+    def close(self):
+        # Cancel what hasn't started and wait for the running task, so the thread is no
+        # longer using the git processes when the pool is closed
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        self.pool.close()
+
+
+def get_remote_url(repo_root):
+    try:
+        return get_pool(repo_root).remote_url()
     except Exception:
         return None
 
@@ -139,7 +368,7 @@ def commit_web_url_from_remote(remote_url, commit_hash):
 
 
 def open_commit_in_browser(repo_root, commit_hash):
-    remote = get_remote_origin_url(repo_root)
+    remote = get_remote_url(repo_root)
     web = commit_web_url_from_remote(remote, commit_hash)
     if web is None:
         print('Could not determine remote URL to open on GitHub')
@@ -166,24 +395,58 @@ def format_commit_preview(commit, max_lines=3):
 def find_repo_root(start_path):
     # run git rev-parse --show-toplevel
     try:
-        out = subprocess.check_output(['git', 'rev-parse', '--show-toplevel'], cwd=start_path)
+        out = instrument.check_output(['git', 'rev-parse', '--show-toplevel'], cwd=start_path)
         return out.decode().strip()
     except Exception:
         return start_path
 
 
-def process_file(repo_root, filepath, preview_only=False):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        text = f.read()
-    fm = find_front_matter(text)
-    if not fm:
+def format_updated(time_iso):
+    # parse commit time (ISO) and format to `YYYY-MM-DD HH:MM:SS`
+    try:
+        dt = datetime.fromisoformat(time_iso)
+        return dt.strftime('%Y-%m-%d %H:%M:%S')
+    except Exception:
+        return time_iso
+
+
+def write_updated(filepath, header, updated_val):
+    # one read and one write: only the header bytes are replaced, the body is copied as is
+    patch_header(filepath, None, header.body_offset,
+                 lambda raw: edit_front_matter(raw, {'updated': updated_val}))
+
+
+def process_file_auto(repo_root, filepath, commits, chosen, preview_only=False):
+    # Non-interactive variant of process_file, chosen is the result of select_commit.
+    # Returns (status, updated_val) where status is one of
+    # 'updated', 'no-front-matter', 'has-updated', 'no-history', 'no-match'.
+    header = read_header(filepath)
+    if not header:
+        return ('no-front-matter', None)
+    if has_updated(header.raw):
+        return ('has-updated', None)
+    if not commits:
+        return ('no-history', None)
+    if chosen is None:
+        return ('no-match', None)
+    updated_val = format_updated(chosen['time'])
+    if not preview_only:
+        write_updated(filepath, header, updated_val)
+    return ('updated', updated_val)
+
+
+def process_file(repo_root, filepath, preview_only=False, commits=None, prefetched=None):
+    # prefetched: {('v' or 'm', hash): text} prepared by ReviewPrefetcher
+    prefetched = prefetched or {}
+    header = read_header(filepath)
+    if not header:
         print(f"Skipping {filepath}: no front matter found")
         return False
-    start, end, fm_text = fm
-    if has_updated(fm_text):
+    if has_updated(header.raw):
         print(f"Skipping {filepath}: 'updated' already present")
         return False
-    commits = git_commits_for_file(repo_root, filepath)
+    if commits is None:
+        commits = git_commits_for_file(repo_root, filepath)
     if not commits:
         print(f"No git history found for {filepath}")
         return False
@@ -219,10 +482,14 @@ def process_file(repo_root, filepath, preview_only=False):
             for a in actions:
                 if a.lower() == 'v':
                     print('\n--- diff for commit', chosen['hash'], '---')
-                    show_commit_diff(repo_root, chosen['hash'], filepath)
+                    text = prefetched.get(('v', chosen['hash']))
+                    if text is None:
+                        path = commit_file_path(repo_root, chosen, filepath)
+                        text = commit_diff_text(repo_root, chosen['hash'], path, chosen.get('old_path'))
+                    print(text)
                 elif a.lower() == 'm':
                     print('\n--- full commit info ---')
-                    show_commit_full(repo_root, chosen['hash'])
+                    print(prefetched.get(('m', chosen['hash'])) or commit_full_text(repo_root, chosen['hash']))
                 elif a.lower() == 'o':
                     open_commit_in_browser(repo_root, chosen['hash'])
                 else:
@@ -230,32 +497,171 @@ def process_file(repo_root, filepath, preview_only=False):
             # after actions, continue prompting
             continue
         # no actions: treat as selection
-        # parse chosen['time'] (ISO) and format to `YYYY-MM-DD HH:MM:SS`
-        try:
-            dt = datetime.fromisoformat(chosen['time'])
-            updated_val = dt.strftime('%Y-%m-%d %H:%M:%S')
-        except Exception:
-            updated_val = chosen['time']
+        updated_val = format_updated(chosen['time'])
         print(f"Selected time: {updated_val}")
         if preview_only:
             print('(preview mode) Not writing file')
             return True
-        # write back: replace fm_text with inserted
-        new_fm = insert_updated(fm_text, updated_val)
-        new_text = new_fm + text[end:]
-        # write file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(new_text)
+        write_updated(filepath, header, updated_val)
         print(f"Wrote updated to {filepath}")
         return True
 
 
+def run_auto(repo_root, md_files, history, args, already_updated=()):
+    policies = args.policy or ['latest']
+    opts = {'mass_rename_threshold': args.mass_rename_threshold}
+    print('Policies:', ', '.join(policies))
+    results = {'has-updated': list(already_updated)}
+    file_commits = [history.get(os.path.relpath(fp, repo_root).replace(os.sep, '/'), [])
+                    for fp in md_files]
+    # policy checks run git, spread them over a process pool; results keep md_files order.
+    # git calls made inside pool workers are not included in --stats counters
+    with instrument.phase('plan'):
+        selected = map_ordered(select_commit_job,
+                               [(repo_root, commits, policies, opts) for commits in file_commits],
+                               args.jobs, processes=True)
+    for fp, commits, chosen in zip(md_files, file_commits, selected):
+        with instrument.phase('write'):
+            status, updated_val = process_file_auto(
+                repo_root, fp, commits, chosen, preview_only=args.preview)
+        results.setdefault(status, []).append(fp)
+        if status == 'updated':
+            print(f"{'Would set' if args.preview else 'Set'} updated: {updated_val} in {fp}")
+        elif status in ('no-history', 'no-match'):
+            print(f"Skipping {fp}: {status}")
+
+    print('\nSummary:')
+    for status in ('updated', 'has-updated', 'no-front-matter', 'no-history', 'no-match'):
+        print(f"  {status}: {len(results.get(status, []))}")
+    if args.preview:
+        print('(preview mode) No files were written')
+
+
+def body_digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def forget_post(filepath, bodies, id_owner, post_ids):
+    # The post was deleted or moved away: release its id so later runs don't report a conflict
+    bodies.pop(filepath, None)
+    old_id = post_ids.pop(filepath, None)
+    if old_id is not None and id_owner.get(old_id) == filepath:
+        del id_owner[old_id]
+
+
+def refresh_post(repo_root, filepath, bodies, id_owner, post_ids, preview_only=False):
+    # Handle one changed post in --watch mode. `bodies` maps path -> last seen body
+    # digest, `id_owner` maps id -> path and `post_ids` is its reverse. Only this file
+    # is read, so the cost of an event doesn't depend on the number of posts.
+    try:
+        header = read_header(filepath)
+    except OSError:
+        return
+    if not header:
+        return
+    fields = parse_front_matter(header.content)
+    post_id = fields.get('id')
+    old_id = post_ids.get(filepath)
+    if old_id is not None and old_id != post_id and id_owner.get(old_id) == filepath:
+        # the id was changed: the old one is free again
+        del id_owner[old_id]
+    if not isinstance(post_id, str) or not post_id:
+        post_ids.pop(filepath, None)
+        print(f"Warning: {filepath} has no 'id'")
+    else:
+        post_ids[filepath] = post_id
+        owner = id_owner.setdefault(post_id, filepath)
+        if owner != filepath and os.path.exists(owner):
+            print(f"Warning: id '{post_id}' of {filepath} is already used by {owner}")
+        else:
+            id_owner[post_id] = filepath
+
+    body = header.read_body()
+    digest = body_digest(body)
+    last = bodies.get(filepath)
+    if last is None:
+        # first event for this file: compare against the committed version
+        rel = os.path.relpath(filepath, repo_root).replace(os.sep, '/')
+        committed = git_show_blob(repo_root, 'HEAD', rel)
+        last = body_digest(strip_front_matter(committed)) if committed is not None else None
+    bodies[filepath] = digest
+    if digest == last:
+        # front matter only, or our own write
+        return
+    updated_val = datetime.fromtimestamp(os.stat(filepath).st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+    if preview_only:
+        print(f"(preview mode) Would set updated: {updated_val} in {filepath}")
+        return
+    new_fm = set_updated(header.raw, updated_val)
+    if new_fm == header.raw:
+        return
+    with open(filepath, 'w', encoding='utf-8', newline='') as f:
+        f.write(new_fm + body)
+    instrument.count('writes')
+    print(f"Set updated: {updated_val} in {filepath}")
+
+
+def watch_posts(repo_root, posts_dir, args):
+    # id index from the catalog, so startup doesn't read every post
+    id_owner = {}
+    post_ids = {}
+    with PostCatalog() as catalog:
+        catalog.prune(posts_dir)
+        md_files = []
+        for root, _, files in os.walk(posts_dir):
+            md_files.extend(os.path.join(root, fn) for fn in files if fn.lower().endswith('.md'))
+        for fp, info, err in catalog.scan(sorted(md_files), args.jobs):
+            if info is not None and info.id:
+                post_ids[fp] = info.id
+                id_owner.setdefault(info.id, fp)
+
+    watcher = PollingWatcher(posts_dir) if args.poll else make_watcher(posts_dir)
+    kind = 'polling' if isinstance(watcher, PollingWatcher) else 'inotify'
+    print(f"Watching {posts_dir} ({kind}), Ctrl-C to stop")
+    debouncer = Debouncer(args.debounce)
+    bodies = {}
+    try:
+        while True:
+            debouncer.add(watcher.changes(debouncer.timeout(1.0)))
+            for fp in debouncer.ready():
+                if os.path.exists(fp):
+                    refresh_post(repo_root, fp, bodies, id_owner, post_ids, preview_only=args.preview)
+                else:
+                    forget_post(fp, bodies, id_owner, post_ids)
+    except KeyboardInterrupt:
+        print('\nStopped watching')
+    finally:
+        watcher.close()
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--preview', action='store_true', help='Do not write files; only preview')
     parser.add_argument('--posts-dir', default=os.path.join('source', '_posts'), help='Path to posts dir')
+    parser.add_argument('--auto', action='store_true', help='Pick commits by --policy instead of prompting')
+    parser.add_argument('--policy', action='append', choices=sorted(POLICIES),
+                        help='Commit selection policy for --auto, may be repeated (default: latest)')
+    parser.add_argument('--mass-rename-threshold', type=int, default=10,
+                        help='Commits renaming at least this many files count as mass renames')
+    parser.add_argument('--watch', action='store_true', help='Keep `updated` current while posts are edited')
+    parser.add_argument('--debounce', type=float, default=1.0,
+                        help='Seconds a file must stay unchanged before --watch handles it')
+    parser.add_argument('--poll', action='store_true', help='Use polling instead of inotify for --watch')
+    parser.add_argument('--no-history-cache', action='store_true',
+                        help='Walk the whole git history instead of using tools/.cache/history.json')
+    parser.add_argument('--prefetch', type=int, default=3, metavar='K',
+                        help='Prepare diffs for the next K files in the background while prompting (0 = off)')
+    parser.add_argument('--prefetch-diffs', type=int, default=3, metavar='N',
+                        help='Number of commits per file whose diff and message are prefetched')
+    add_jobs_argument(parser, 'Parallel workers for reading posts and running git (0 = all cores)')
+    incremental.add_arguments(parser)
+    instrument.add_arguments(parser)
     args = parser.parse_args()
+    with instrument.session(args, TOOL):
+        run(args)
 
+
+def run(args):
     repo_root = find_repo_root(os.getcwd())
     posts_dir = os.path.join(repo_root, args.posts_dir) if not os.path.isabs(args.posts_dir) else args.posts_dir
 
@@ -263,24 +669,72 @@ def main():
         print(f"Posts directory not found: {posts_dir}")
         return
 
-    # walk .md files
+    if args.watch:
+        watch_posts(repo_root, posts_dir, args)
+        return
+
+    since = incremental.resolve_since(args.since, TOOL, args.since_state)
+    # walk .md files, or with --since ask git which posts changed
     md_files = []
-    for root, _, files in os.walk(posts_dir):
-        for fn in files:
-            if fn.lower().endswith('.md'):
-                md_files.append(os.path.join(root, fn))
+    with instrument.phase('scan'):
+        if since:
+            try:
+                md_files = [str(p) for p in incremental.changed_posts(Path(posts_dir), since)]
+            except ValueError as e:
+                print(e)
+                return
+        else:
+            for root, _, files in os.walk(posts_dir):
+                for fn in files:
+                    if fn.lower().endswith('.md'):
+                        md_files.append(os.path.join(root, fn))
 
     if not md_files:
-        print('No markdown files found under', posts_dir)
+        print('No markdown files found under', posts_dir, f'(changed since {since})' if since else '')
+        if since and not args.preview:
+            incremental.record(TOOL, Path(posts_dir), args.since_state)
         return
 
-    print(f'Found {len(md_files)} markdown files under {posts_dir}')
+    print(f'Found {len(md_files)} markdown files under {posts_dir}' + (f' changed since {since}' if since else ''))
+    # cached front matter lets us skip posts that already have `updated` without reading them
+    with instrument.phase('parse'), PostCatalog() as catalog:
+        if not since:
+            catalog.prune(posts_dir)
+        pending = []
+        already_updated = []
+        for fp, info, err in catalog.scan(sorted(md_files), args.jobs):
+            if info is not None and info.get('updated') is not None:
+                print(f"Skipping {fp}: 'updated' already present")
+                already_updated.append(fp)
+                continue
+            pending.append(fp)
+    md_files = pending
+    # one pass over the history instead of one `git log --follow` per file,
+    # and only over the new commits when the cache from the last run is still valid
+    with instrument.phase('git'):
+        history = load_history(repo_root, [os.path.relpath(posts_dir, repo_root).replace(os.sep, '/')],
+                               None if args.no_history_cache else HISTORY_CACHE)
+    if args.auto:
+        run_auto(repo_root, sorted(md_files), history, args, already_updated)
+        if args.since is not None and not args.preview:
+            incremental.record(TOOL, Path(posts_dir), args.since_state)
+        return
     modified_count = 0
-    for fp in sorted(md_files):
-        changed = process_file(repo_root, fp, preview_only=args.preview)
-        if changed:
-            modified_count += 1
+    files = [(fp, history.get(os.path.relpath(fp, repo_root).replace(os.sep, '/'), []))
+             for fp in sorted(md_files)]
+    prefetcher = ReviewPrefetcher(repo_root, files, args.prefetch, args.prefetch_diffs)
+    try:
+        with instrument.phase('review'):
+            for i, (fp, commits) in enumerate(files):
+                changed = process_file(repo_root, fp, preview_only=args.preview,
+                                       commits=commits, prefetched=prefetcher.get(i))
+                if changed:
+                    modified_count += 1
+    finally:
+        prefetcher.close()
     print('\nDone. Modified files:', modified_count)
+    if args.since is not None and not args.preview:
+        incremental.record(TOOL, Path(posts_dir), args.since_state)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监视 posts 目录下 Markdown 文件的变化。
+
+ - Linux 上通过 ctypes 直接使用 inotify，每个目录一个 watch，新建的子目录会自动加入
+ - 其他平台或 inotify 不可用时退回轮询（按 mtime + size 比较）
+ - `Debouncer`：同一文件在 quiet 秒内的多次保存只处理一次
+
+两种 watcher 都提供 `changes(timeout)`，返回这段时间内被写入、新建、移入、删除或移出的 .md 文件路径，
+调用方按路径是否还存在区分。
+"""
+
+from __future__ import annotations
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MOVED_FROM | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_markdown(path: str) -> bool:
+    return path.lower().endswith('.md')
+
+
+class InotifyWatcher:
+    def __init__(self, root: str):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.root = root
+        self._dirs: Dict[int, str] = {}
+        self._add_tree(root)
+
+    def _add(self, path: str) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed: {path}')
+        self._dirs[wd] = path
+
+    def _add_tree(self, top: str) -> List[str]:
+        # 返回树中已有的 md 文件，新目录被移入或创建时其中的文件也算作变化
+        found = []
+        for dirpath, _, files in os.walk(top):
+            self._add(dirpath)
+            found.extend(os.path.join(dirpath, fn) for fn in files if is_markdown(fn))
+        return found
+
+    def changes(self, timeout: float) -> Set[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changed: Set[str] = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出，只能全量重新扫描
+                changed.update(self._add_tree(self.root))
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            parent = self._dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.update(self._add_tree(path))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE) and is_markdown(name):
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, root: str, interval: float = 1.0):
+        self.root = root
+        self.interval = interval
+        self._state = self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        state = {}
+        for dirpath, _, files in os.walk(self.root):
+            for fn in files:
+                if is_markdown(fn):
+                    p = os.path.join(dirpath, fn)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    state[p] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def changes(self, timeout: float) -> Set[str]:
+        time.sleep(min(timeout, self.interval))
+        new = self._snapshot()
+        changed = {p for p, sig in new.items() if self._state.get(p) != sig}
+        changed.update(p for p in self._state if p not in new)
+        self._state = new
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def make_watcher(root: str, poll_interval: float = 1.0, force_polling: bool = False):
+    """优先使用 inotify，失败时退回轮询。"""
+    if not force_polling and hasattr(select, 'select') and os.name == 'posix':
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, poll_interval)
+
+
+class Debouncer:
+    """记录每个路径最后一次变化的时间，安静 quiet 秒后才交给调用方处理。"""
+
+    def __init__(self, quiet: float):
+        self.quiet = quiet
+        self._pending: Dict[str, float] = {}
+
+    def add(self, paths: Iterable[str]) -> None:
+        now = time.monotonic()
+        for p in paths:
+            self._pending[p] = now
+
+    def ready(self) -> List[str]:
+        now = time.monotonic()
+        done = sorted(p for p, t in self._pending.items() if now - t >= self.quiet)
+        for p in done:
+            del self._pending[p]
+        return done
+
+    def timeout(self, default: float) -> float:
+        """距离下一个路径可处理还要等多久，没有待处理路径时返回 default。"""
+        if not self._pending:
+            return default
+        now = time.monotonic()
+        return max(0.0, min(self.quiet - (now - t) for t in self._pending.values()))
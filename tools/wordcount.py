@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预先统计每篇文章的字数与阅读时间，写入 `source/_data/wordcount.json`，
+由 `scripts/wordcount.js` 提供 NexT 的 symbols_count_time 所用的 helper，生成时不再逐篇统计正文。
+
+用法：
+    python tools/wordcount.py            # 更新 source/_data/wordcount.json
+    python tools/wordcount.py --check    # 只检查数据文件是否需要更新，需要时退出码为 1
+    python tools/wordcount.py --jobs 0   # 并行统计
+
+支持选项：
+    --posts-dir 路径  指定 posts 目录，默认相对于项目：<root>/source/_posts
+    --output 路径     数据文件，默认 <root>/source/_data/wordcount.json
+    --check           不写入，数据文件与统计结果不一致时退出码为 1（用于 CI）
+    --jobs N          并发统计的进程数，0 表示按 CPU 核心数
+    --stats [文件]    结束时输出 JSON 统计报告
+    --profile [文件]  用 cProfile 记录本次运行并导出结果
+
+统计规则（只统计正文，不含 front-matter）：
+ - 汉字、假名、谚文每个字符算一个字（cjk）
+ - 其余文字按单词计（words），数字与下划线连写算一个词
+ - 忽略 HTML 标签、Markdown 链接与图片的 URL、`{% %}` 标签语法
+数据文件以文章源文件相对 source/ 的路径（即 Hexo 的 post.source）为键记录 [cjk, words, 内容哈希]，
+内容哈希按 Hexo 读入源文件的方式计算（去掉 BOM，换行统一为 \n）。scripts/wordcount.js 只采用哈希与
+文章当前内容一致的记录，改过但还没重新运行本脚本的文章在生成时现场统计，不会显示过时的数字。
+字数为 cjk + words，阅读时间由 Hexo 端按 (cjk + words × awl) / (awl × wpm) 分钟计算，
+awl 与 wpm 可在 _config.yml 的 symbols_count_time 中设置。
+
+每篇文章的统计结果按内容哈希缓存在 tools/.cache/wordcount.json，内容未变的文章不会重新统计；
+文章内容哈希本身由 PostCatalog 按 stat 缓存，未修改的文件不会重新读取。
+"""
+
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import instrument
+from front_matter import DEFAULT_CACHE_DIR, PostCatalog, walk_posts
+from parallel import add_jobs_argument, map_ordered
+
+WORDCOUNT_CACHE = DEFAULT_CACHE_DIR / 'wordcount.json'
+WORDCOUNT_CACHE_VERSION = 2
+# 假名、CJK 扩展 A、CJK 统一汉字、兼容汉字、谚文音节
+CJK_CHARS = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+CJK_RE = re.compile(f"[{CJK_CHARS}]")
+WORD_RE = re.compile(rf"[^\W{CJK_CHARS}]+")
+# 不算作正文的部分：HTML 标签与注释、链接/图片的 URL、Hexo 标签
+MARKUP_RE = re.compile(r"<!--.*?-->|<[^>\n]+>|\]\([^)\n]*\)|\{%.*?%\}", re.DOTALL)
+
+
+def count_text(text: str) -> Tuple[int, int]:
+    """返回 (cjk, words)。"""
+    text = MARKUP_RE.sub(' ', text)
+    return (len(CJK_RE.findall(text)), len(WORD_RE.findall(text)))
+
+
+def raw_digest(data: bytes) -> str:
+    """与 scripts/wordcount.js 的 digest 一致：Hexo 读入的源文件文本（去掉 BOM，CRLF 换为 LF）的 sha1 前 16 位。"""
+    text = data.decode('utf-8', errors='replace')
+    if text.startswith('\ufeff'):
+        text = text[1:]
+    return hashlib.sha1(text.replace('\r\n', '\n').encode('utf-8')).hexdigest()[:16]
+
+
+def count_post(item: Tuple[str, int]) -> Tuple[int, int, str]:
+    """在工作进程中执行：统计 body_offset 之后的正文，并计算整个源文件的 raw_digest。"""
+    path, body_offset = item
+    with open(path, 'rb') as f:
+        data = f.read()
+    return count_text(data[body_offset:].decode('utf-8', errors='replace')) + (raw_digest(data),)
+
+
+def load_cache() -> Dict[str, List[Union[int, str]]]:
+    try:
+        cache = json.loads(WORDCOUNT_CACHE.read_text(encoding='utf-8'))
+        if cache.get('version') == WORDCOUNT_CACHE_VERSION:
+            return cache['counts']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts-dir', '-d', default=None,
+                        help='posts 目录路径，默认相对于项目：<root>/source/_posts')
+    parser.add_argument('--output', '-o', default=None, help='数据文件，默认 <root>/source/_data/wordcount.json')
+    parser.add_argument('--check', action='store_true', help='只检查数据文件是否需要更新')
+    add_jobs_argument(parser)
+    instrument.add_arguments(parser)
+    args = parser.parse_args(argv)
+    with instrument.session(args, 'wordcount'):
+        code = run(args)
+    sys.exit(code)
+
+
+def run(args) -> int:
+    script_dir = Path(__file__).resolve().parent
+    repo_root = script_dir.parent
+    default_posts = repo_root / 'source' / '_posts'
+    posts_dir = Path(args.posts_dir).resolve() if args.posts_dir else default_posts.resolve()
+    output = Path(args.output).resolve() if args.output else repo_root / 'source' / '_data' / 'wordcount.json'
+    if not posts_dir.is_dir():
+        print(f"错误：posts 目录不存在：{posts_dir}")
+        return 2
+
+    cache = load_cache()
+    # (post.source, 内容哈希, 路径, 正文偏移)
+    posts: List[Tuple[str, str, str, int]] = []
+    source_dir = posts_dir.parent
+    with PostCatalog() as catalog:
+        catalog.prune(posts_dir)
+        with instrument.phase('scan'):
+            for p, info, err in catalog.iter_scan(walk_posts(posts_dir), args.jobs):
+                if err is not None:
+                    print(f"读取文件失败，跳过：{p}，原因：{err}")
+                    continue
+                posts.append((Path(p).relative_to(source_dir).as_posix(), catalog.content_hash(p),
+                              info.path, info.body_offset))
+
+    stale = {sha1: (path, body_offset) for _, sha1, path, body_offset in posts if sha1 not in cache}
+    instrument.count('wordcount_cache_hits', len(posts) - len(stale))
+    with instrument.phase('count'):
+        counted = map_ordered(count_post, list(stale.values()), args.jobs, processes=True)
+    for sha1, counts in zip(stale, counted):
+        cache[sha1] = list(counts)
+    instrument.count('files_read', len(stale))
+
+    data = {source: cache[sha1] for source, sha1, _, _ in posts}
+
+    used = {sha1 for _, sha1, _, _ in posts}
+    if stale or len(cache) != len(used):
+        WORDCOUNT_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        WORDCOUNT_CACHE.write_text(json.dumps({'version': WORDCOUNT_CACHE_VERSION,
+                                               'counts': {k: v for k, v in cache.items() if k in used}}),
+                                   encoding='utf-8')
+
+    # 每篇文章一行，方便查看差异
+    text = '{\n' + ',\n'.join(f"  {json.dumps(k, ensure_ascii=False)}: [{v[0]}, {v[1]}, \"{v[2]}\"]"
+                               for k, v in sorted(data.items())) + '\n}\n'
+    cjk = sum(v[0] for v in data.values())
+    words = sum(v[1] for v in data.values())
+    print(f"统计了 {len(data)} 篇文章（重新统计 {len(stale)} 篇）：{cjk} 字，{words} 词。")
+    current = output.read_text(encoding='utf-8') if output.exists() else None
+    if current == text:
+        print(f"{output.name} 无需更新。")
+        return 0
+    if args.check:
+        print(f"{output.name} 需要更新，请运行 python tools/wordcount.py。")
+        return 1
+    with instrument.phase('write'):
+        output.parent.mkdir(parents=True, exist_ok=True)
+        tmp = output.with_name(output.name + '.tmp')
+        tmp.write_text(text, encoding='utf-8')
+        tmp.replace(output)
+        instrument.count('writes')
+    print(f"已写入 {output}。")
+    return 0
+
+
+if __name__ == '__main__':
+    main()